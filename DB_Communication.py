@@ -1,6 +1,18 @@
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from psycopg2 import sql
 import json
+import io
+import csv
+import datetime
 import pandas as pd
+import numpy as np
+from DB_Connection_Pool import ConnectionPool
+from DB_Schema_Catalog import SchemaCatalog
+from DB_Statement_Registry import StatementRegistry
+from DB_Lookup_Cache import LookupCache, ChangeListener
+import threading
 """
     This python file is used to implement the connection to the database.
     The credentials for the database are read from a JSON file, found in : ./data/db_config.json
@@ -14,6 +26,7 @@ import pandas as pd
 """
 
 # dictionary containing the relation of a table to its schema
+# (defaults for the initial structure, reloaded from the database by reload_schema_metadata)
 table_schema_relation = {
     "PERs": "data",
     "ROAs": "data",
@@ -35,28 +48,129 @@ table_schema_relation = {
     "sectors": "param"
 }
 
+# dictionary containing the value column(s) of each table in the data schema (reloaded like table_schema_relation)
+data_table_value_columns = {
+    "PERs": ["PE_ratio"],
+    "ROAs": ["roa"],
+    "assetTurnovers": ["asset_turnover"],
+    "cashflows": ["cashflow"],
+    "dividendReturns": ["dividend_return"],
+    "dividends": ["dividend"],
+    "estimations": ["profit_per_share", "dividend"],
+    "grossMargins": ["gross_margin"],
+    "leverages": ["debt_to_equity_ratio"],
+    "liquidities": ["current_ratio"],
+    "profits": ["profit"],
+    "sharePrices": ["share_price"]
+}
 
-def connect_to_db():
+# columns of the tables in the data schema which are not value columns
+data_table_key_columns = ("ID", "share_ID", "year", "valid_from", "valid_to")
+
+# valid_to of the current version of a row, older versions end when their successor starts (valid_from)
+VALID_TO_OPEN_END = datetime.datetime(9999, 12, 31, 23, 59, 59)
+
+# data tables without a year column, their values are valid for a period of time instead (valid_from/valid_to)
+data_tables_without_year = ("sharePrices",)
+
+# derived data tables and the statements recomputing them from their source tables (see refresh_derived_ratios)
+derived_ratio_statements = {
+    "PERs": "refresh_PERs",
+    "dividendReturns": "refresh_dividendReturns"
+}
+
+# data tables the derived ratios are computed from, their changes are queued by triggers (see migration 0003)
+derived_ratio_source_tables = ("dividends", "estimations", "sharePrices")
+
+# key of the advisory lock, concurrent refreshes of the derived ratios would create the same versions twice
+DERIVED_RATIO_LOCK_KEY = 7265747
+
+# dictionary containing the statement, column names and dtypes and the queried tables of each lookup table
+# (see get_lookup_table)
+lookup_table_definitions = {
+    "sectors": ("get_all_sectors", {"ID": "int32", "sector_name": "category"}, ("sectors",)),
+    "countries": ("get_all_countries", {"ID": "int32", "country_name": "category"}, ("countries",)),
+    "categories": ("get_all_categories", {"ID": "int32", "category_name": "category"}, ("categories",)),
+    "currencies": ("get_all_currencies", {"ID": "int32", "currency_name": "category"}, ("currencies",)),
+    "shares": ("get_all_shares", {"ID": "int32", "company_name": "category"}, ("shares", "companies"))
+}
+
+# default number of rows sent to the database per batch by the bulk loader
+BULK_INSERT_BATCH_SIZE = 5000
+
+# loads a chunk of share prices into the staging table of the connection (see merge_share_prices)
+SHARE_PRICE_STAGING_COPY = 'COPY pg_temp.share_price_staging ("share_ID", valid_from, share_price) ' \
+                           'FROM STDIN WITH (FORMAT csv)'
+
+# entries of public.data_change_log are kept this long, local copies refreshed less often are transferred completely
+CHANGE_LOG_RETENTION = datetime.timedelta(days=30)
+
+
+# let psycopg2 pass numpy integers (e.g. IDs taken from data frames) as plain numbers
+for each_numpy_type in (np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64):
+    psycopg2.extensions.register_adapter(each_numpy_type, psycopg2.extensions.AsIs)
+
+# cached content of the config JSON, read only once (see read_db_config)
+_dict_db_params = None
+
+# connection pool shared by the whole application (see create_connection_pool)
+_connection_pool = None
+
+# registry of all statements found in ./data/sql/, loaded once at startup
+statement_registry = StatementRegistry('./data/sql/')
+
+# process-wide cache of lookup tables, invalidated by the change listener (see get_cached_lookup_table)
+lookup_cache = LookupCache(ttl=600.0)
+
+# thread listening for table change notifications of the database (see start_change_listener)
+_change_listener = None
+
+# schema catalogs per database, key is the dsn of the connection (see get_schema_catalog)
+_schema_catalogs = {}
+_schema_catalogs_lock = threading.Lock()
+
+
+def read_db_config(reload=False):
     """
-    Establish the connection to the  PostgreSQL data base specified in the json file
-    :return: in case of a successful connection, the connection to the database otherwise None
+    Read the database parameters from the config JSON, the file is only read on the first call
+    :param reload: force re-reading the file, e.g. after the configuration has been changed
+    :return: dictionary with the keys db_name, user, host and password
     """
 
-    dict_db_params = None
+    global _dict_db_params
 
-    # read the cofig JSON and load it as JSON
-    with open('./data/db_config.json', encoding='utf-8') as F:
-        dict_db_params = json.load(F)
+    if _dict_db_params is None or reload:
 
-    try:
+        # read the cofig JSON and load it as JSON
+        with open('./data/db_config.json', encoding='utf-8') as F:
+            _dict_db_params = json.load(F)
 
-        conn = psycopg2.connect("dbname='" + dict_db_params["db_name"] + "' user='" + dict_db_params["user"]
-                                + "' host='" + dict_db_params["host"] + "' password='" +  dict_db_params["password"] + "'")
+    return _dict_db_params
 
-        return conn
 
-    except BaseException:
-        return None
+def create_connection_params(db_name, host, user, password):
+    """
+    Create the keyword arguments for psycopg2.connect, so psycopg2 takes care of quoting the values
+    :param db_name: name of database
+    :param host: name of host
+    :param user: name of user
+    :param password: password
+    :return: dictionary of connection parameters
+    """
+
+    return {"dbname": db_name, "host": host, "user": user, "password": password}
+
+
+def connect_to_db():
+    """
+    Establish the connection to the  PostgreSQL data base specified in the json file
+    :return: in case of a successful connection, the connection to the database otherwise None
+    """
+
+    dict_db_params = read_db_config()
+
+    return connect_to_db_with_params(dict_db_params["db_name"], dict_db_params["host"],
+                                     dict_db_params["user"], dict_db_params["password"])
 
 
 def connect_to_db_with_params(db_name, host, user, password):
@@ -71,53 +185,177 @@ def connect_to_db_with_params(db_name, host, user, password):
 
     try:
 
-        conn = psycopg2.connect("dbname='" + db_name + "' user='" + user + "' host='"
-                                + host + "' password='" + password + "'")
+        conn = psycopg2.connect(**create_connection_params(db_name, host, user, password))
         conn.set_client_encoding('UTF-8')
         return conn
     except BaseException:
         return None
 
 
+def create_connection_pool(db_name=None, host=None, user=None, password=None, min_size=1, max_size=5,
+                           listen_for_changes=False):
+    """
+    Create a pool of connections to the database and register it as the application's pool
+    Parameters which are not given are taken from the config file
+    :param db_name: name of database
+    :param host: name of host
+    :param user: name of user
+    :param password: password
+    :param min_size: number of connections kept open all the time
+    :param max_size: maximum number of connections open at the same time
+    :param listen_for_changes: start a listener invalidating the lookup cache on changes in the database
+    :return: in case of a successful connection, the connection pool otherwise None
+    """
+
+    global _connection_pool
+
+    if None in (db_name, host, user, password):
+        dict_db_params = read_db_config()
+
+        db_name = dict_db_params["db_name"] if db_name is None else db_name
+        host = dict_db_params["host"] if host is None else host
+        user = dict_db_params["user"] if user is None else user
+        password = dict_db_params["password"] if password is None else password
+
+    try:
+        pool = ConnectionPool(create_connection_params(db_name, host, user, password),
+                              min_size=max(min_size, 1), max_size=max_size)
+    except BaseException:
+        return None
+
+    # replace the previous pool, its borrowed connections are closed as soon as they are returned
+    if _connection_pool is not None:
+        _connection_pool.close_all()
+
+    _connection_pool = pool
+
+    # cached lookups of the previous database are not valid anymore
+    lookup_cache.invalidate_all()
+
+    # take the structure from the database itself, migrations might have changed it
+    try:
+        with pool.cursor() as sql_cursor:
+            reload_schema_metadata(sql_cursor)
+    except psycopg2.Error:
+        # e.g. a database which is not initialized yet, the defaults are kept
+        pass
+
+    if listen_for_changes:
+        start_change_listener(pool)
+
+    return pool
+
+
+def get_connection_pool():
+    """
+    :return: the connection pool created by create_connection_pool or None if there is none yet
+    """
+    return _connection_pool
+
+
+def start_change_listener(pool):
+    """
+    Start listening for table change notifications of the pool's database, a running listener gets stopped
+    :param pool: ConnectionPool of the database
+    :return: None
+    """
+
+    global _change_listener
+
+    stop_change_listener()
+
+    _change_listener = ChangeListener(pool.connection_params, lookup_cache)
+    _change_listener.start()
+
+
+def stop_change_listener():
+    """
+    Stop the running change listener, if there is one
+    :return: None
+    """
+
+    global _change_listener
+
+    if _change_listener is not None:
+        _change_listener.stop()
+        _change_listener = None
+
+
 def get_db_name():
     """
     :return: name of the currently used db
     """
-    # read the cofig JSON and load it as JSON
-    with open('./data/db_config.json', encoding='utf-8') as F:
-        dict_db_params = json.load(F)
 
-    return dict_db_params["db_name"]
+    return read_db_config()["db_name"]
+
+
+def get_statement_statistics():
+    """
+    Get the hit and timing counters of all statements executed via the statement registry
+    :return: data frame with one row per statement, sorted by total time descending
+    """
+
+    return pd.DataFrame(statement_registry.get_statistics(),
+                        columns=['name', 'hits', 'prepared_hits', 'total_time', 'mean_time', 'max_time',
+                                 'is_preparable'])
+
+
+def get_schema_catalog(db_connection):
+    """
+    Get the schema catalog of the database the connection points to, it is created only once per database
+    :param db_connection: psycopg2 connection
+    :return: SchemaCatalog instance (loaded lazily on first access)
+    """
+
+    with _schema_catalogs_lock:
+
+        if db_connection.dsn not in _schema_catalogs:
+            _schema_catalogs[db_connection.dsn] = SchemaCatalog(create_insert_into_statement,
+                                                                 statement_registry.get_query("get_schema_catalog"))
+
+        return _schema_catalogs[db_connection.dsn]
+
+
+def reload_schema_metadata(sql_cursor):
+    """
+    Reload the column metadata, table_schema_relation and data_table_value_columns from the database
+    The dictionaries are updated in place, so modules which imported them see the new structure as well
+    :param sql_cursor: psycopg2 cursor
+    :return: None
+    """
+
+    schema_catalog = get_schema_catalog(sql_cursor.connection)
+    schema_catalog.refresh(sql_cursor)
+
+    dict_table_schemas = schema_catalog.get_table_schemas()
+
+    # an empty database has no structure to take over
+    if not dict_table_schemas:
+        return
+
+    table_schema_relation.clear()
+    table_schema_relation.update(dict_table_schemas)
+
+    data_table_value_columns.clear()
+    for table_name, schema_name in sorted(dict_table_schemas.items()):
+        if schema_name == "data":
+            data_table_value_columns[table_name] = [column_name for column_name
+                                                    in schema_catalog.get_column_names(table_name)
+                                                    if column_name not in data_table_key_columns]
 
 
 def get_column_names_from_db_table(sql_cursor, table_name):
     """
-    Scrape the column names from a database to a list
+    Get the column names of a table from the schema catalog
     :param sql_cursor: psycopg cursor
     :param table_name: name of table to get the column names from
     :return: a list with table column names
     """
 
-    # read the required sql statement from the corresponding file
-    sql_query_table_names = open('./data/sql/get_column_names_for_table.sql', 'r').read()
-
-    # append the table tame
     if table_name == 'liquiditys':
-        sql_query_table_names += " '" + "liquidities" + "'"
-    else:
-        sql_query_table_names += " '" + table_name + "'"
-
-    # execute sql query and fetch the results
-    sql_cursor.execute(sql_query_table_names)
-    table_column_names = sql_cursor.fetchall()
-
-    list_column_names = list()
-
-    # append each result to the list
-    for each_name in table_column_names:
-        list_column_names.append(each_name[0])
+        table_name = 'liquidities'
 
-    return list_column_names
+    return get_schema_catalog(sql_cursor.connection).get_column_names(table_name, sql_cursor)
 
 
 def create_insert_into_statement_for_df(df, table_name):
@@ -156,11 +394,8 @@ def get_total_number_of_shares(sql_cursor):
     :return: number of shares in db
     """
 
-    # read in query string from corresponding file
-    sql_query = open('./data/sql/get_total_number_of_shares.sql', 'r').read()
-
     # execute query
-    sql_cursor.execute(sql_query)
+    statement_registry.execute(sql_cursor, "get_total_number_of_shares")
 
     # get first entry of response
     number_of_shares = sql_cursor.fetchall()[0][0]
@@ -168,82 +403,108 @@ def get_total_number_of_shares(sql_cursor):
     return number_of_shares
 
 
-def get_all_sectors(sql_cursor):
+def fetch_as_data_frame(sql_cursor, columns=None, dtypes=None, as_records=False):
     """
-    query all sectors and their ID
-    :param sql_cursor: current database cursor
-    :return: returns all sectors and their ID as data frame
+    Turn the result of the last query executed on the cursor into a data frame in one vectorized construction
+    :param sql_cursor: cursor a query has been executed on
+    :param columns: list of column names, defaults to the column names of the query
+    :param dtypes: optional dictionary column name -> dtype (e.g. int32, category)
+    :param as_records: return a numpy record array instead of a data frame
+    :return: data frame (or numpy record array) of the query result
     """
-    # TODO: get all zu einer Funktion zusammenfassen
 
-    sql_query = 'SELECT * FROM param.sectors ORDER BY sector_name ASC'
+    if columns is None:
+        columns = [each_description[0] for each_description in sql_cursor.description]
 
-    sql_cursor.execute(sql_query)
+    df_result = pd.DataFrame.from_records(sql_cursor.fetchall(), columns=columns)
 
-    df_sectors = pd.DataFrame(columns=['ID', 'sector_name'])
+    if dtypes:
+        df_result = df_result.astype(dtypes)
 
-    # loop over all entries of the response
-    for each_line in sql_cursor.fetchall():
+    if as_records:
+        return df_result.to_records(index=False)
+
+    return df_result
 
-        # separate into ID and name
-        key, value = each_line
 
-        # create row in data frame for each value pair
-        df_sectors = df_sectors.append({'ID':key, 'sector_name': value}, ignore_index=True)
+def query_as_data_frame(sql_cursor, statement_name, params=None, identifiers=None, columns=None, dtypes=None,
+                        as_records=False):
+    """
+    Execute a statement of the registry and return its result as data frame
+    :param sql_cursor: current database cursor
+    :param statement_name: name of the statement in the statement registry
+    :param params: sequence of parameters for the statement
+    :param identifiers: dictionary of identifiers to be composed into the statement
+    :param columns: list of column names, defaults to the column names of the query
+    :param dtypes: optional dictionary column name -> dtype (e.g. int32, category)
+    :param as_records: return a numpy record array instead of a data frame
+    :return: data frame (or numpy record array) of the query result
+    """
 
-    return df_sectors
+    statement_registry.execute(sql_cursor, statement_name, params, identifiers=identifiers)
 
+    return fetch_as_data_frame(sql_cursor, columns=columns, dtypes=dtypes, as_records=as_records)
 
-def get_all_countries(sql_cursor):
+
+def get_lookup_table(sql_cursor, table_name, as_records=False):
     """
-    query all countries and their ID
+    query all entries of a lookup table (IDs and names), as defined in lookup_table_definitions
     :param sql_cursor: current database cursor
-    :return: returns all countries and their ID as data frame
+    :param table_name: name of the lookup table (sectors, countries, categories, currencies or shares)
+    :param as_records: return a numpy record array instead of a data frame
+    :return: all IDs and names as data frame
     """
-    # TODO: get_all_* zu einer Funktion zusammenfassen
 
-    sql_query = 'SELECT "ID", country_name FROM param.countries ORDER BY country_name ASC'
+    statement_name, dict_dtypes, list_queried_tables = lookup_table_definitions[table_name]
 
-    sql_cursor.execute(sql_query)
+    return query_as_data_frame(sql_cursor, statement_name, columns=list(dict_dtypes.keys()), dtypes=dict_dtypes,
+                               as_records=as_records)
 
-    df_countries = pd.DataFrame(columns=['ID', 'country_name'])
 
-    # loop over all entries of the response
-    for each_line in sql_cursor.fetchall():
-
-        # separate into ID and name
-        key, value = each_line
+def get_cached_lookup_table(db_pool, table_name):
+    """
+    Get a lookup table from the process-wide cache, query it only in case it is not cached or has changed
+    The returned data frame is shared, so it must not be modified
+    :param db_pool: ConnectionPool used in case the table has to be queried
+    :param table_name: name of the lookup table (sectors, countries, categories, currencies or shares)
+    :return: all IDs and names as data frame
+    """
 
-        # create row in data frame for each value pair
-        df_countries = df_countries.append({'ID': key, 'country_name': value}, ignore_index=True)
+    def load_lookup_table():
+        with db_pool.cursor() as sql_cursor:
+            return get_lookup_table(sql_cursor, table_name)
 
-    return df_countries
+    return lookup_cache.get(table_name, load_lookup_table, lookup_table_definitions[table_name][2])
 
 
-def get_all_categories(sql_cursor):
+def get_all_sectors(sql_cursor):
     """
-    query all categories and their ID
+    query all sectors and their ID
     :param sql_cursor: current database cursor
-    :return: returns all categories and their ID as data frame
+    :return: returns all sectors and their ID as data frame
     """
-    # TODO: get_all_* zu einer Funktion zusammenfassen
 
-    sql_query = 'SELECT "ID", category_name FROM param.categories ORDER BY category_name ASC'
+    return get_lookup_table(sql_cursor, "sectors")
 
-    sql_cursor.execute(sql_query)
 
-    df_categories = pd.DataFrame(columns=['ID', 'category_name'])
+def get_all_countries(sql_cursor):
+    """
+    query all countries and their ID
+    :param sql_cursor: current database cursor
+    :return: returns all countries and their ID as data frame
+    """
 
-    # loop over all entries of the response
-    for each_line in sql_cursor.fetchall():
+    return get_lookup_table(sql_cursor, "countries")
 
-        # separate into ID and name
-        key, value = each_line
 
-        # create row in data frame for each value pair
-        df_categories = df_categories.append({'ID': key,'category_name': value}, ignore_index=True)
+def get_all_categories(sql_cursor):
+    """
+    query all categories and their ID
+    :param sql_cursor: current database cursor
+    :return: returns all categories and their ID as data frame
+    """
 
-    return df_categories
+    return get_lookup_table(sql_cursor, "categories")
 
 
 def get_all_currencies(sql_cursor):
@@ -252,24 +513,8 @@ def get_all_currencies(sql_cursor):
     :param sql_cursor: current database cursor
     :return: returns all currencies and their ID as data frame
     """
-    # TODO: get_all_* zu einer Funktion zusammenfassen
 
-    sql_query = 'SELECT "ID", currency_name FROM param.currencies ORDER BY currency_name ASC'
-
-    sql_cursor.execute(sql_query)
-
-    df_currencies = pd.DataFrame(columns=['ID', 'currency_name'])
-
-    # loop over all entries of the response
-    for each_line in sql_cursor.fetchall():
-
-        # separate into ID and name
-        key, value = each_line
-
-        # create row in data frame for each value pair
-        df_currencies = df_currencies.append({'ID': key, 'currency_name': value}, ignore_index=True)
-
-    return df_currencies
+    return get_lookup_table(sql_cursor, "currencies")
 
 
 def get_all_isin(sql_cursor):
@@ -278,59 +523,84 @@ def get_all_isin(sql_cursor):
     :param sql_cursor: current database cursor
     :return: returns all isin as list
     """
-    # TODO: get_all_* zu einer Funktion zusammenfassen
 
-    sql_query = 'SELECT shares FROM entities.shares'
+    statement_registry.execute(sql_cursor, "get_all_isin")
 
-    sql_cursor.execute(sql_query)
+    return [each_line[0] for each_line in sql_cursor.fetchall()]
 
-    list_isin = []
 
-    for each_line in sql_cursor.fetchall():
+def does_isin_exist(sql_cursor, isin):
+    """
+    Check whether a share with the given ISIN exists, the lookup uses the unique index on the ISIN
+    :param sql_cursor: current database cursor
+    :param isin: ISIN to be checked
+    :return: True or False
+    """
 
-        # append each entry to list
-        list_isin.append(each_line[0])
+    statement_registry.execute(sql_cursor, "does_isin_exist", (isin,))
 
-    return list_isin
+    return sql_cursor.fetchone()[0]
 
 
-def get_all_shares(sql_cursor):
+def get_existing_isins(sql_cursor, isins, batch_size=10000):
     """
-    query all shares
+    Check a large number of ISINs for existence, each batch is checked in one query via an array parameter
     :param sql_cursor: current database cursor
-    :return: returns all shares and their ID as data frame
+    :param isins: iterable of ISINs to be checked
+    :param batch_size: maximum number of ISINs per query
+    :return: set of the given ISINs which exist in the database
     """
-    # TODO: get_all_* zu einer Funktion zusammenfassen
 
-    sql_query = open('./data/sql/get_all_shares.sql', 'r').read()
+    list_isins = list(isins)
+    set_existing_isins = set()
 
-    sql_cursor.execute(sql_query)
+    for start in range(0, len(list_isins), batch_size):
+        statement_registry.execute(sql_cursor, "get_existing_isins", (list_isins[start:start + batch_size],))
+        set_existing_isins.update(each_line[0] for each_line in sql_cursor.fetchall())
 
-    df_shares = pd.DataFrame(columns=['ID', 'company_name'])
+    return set_existing_isins
 
-    for each_line in sql_cursor.fetchall():
 
-        key, value = each_line
+def get_share_ids_for_isins(sql_cursor, isins, batch_size=10000):
+    """
+    Resolve a large number of ISINs to the IDs of their shares, each batch is resolved in one query
+    :param sql_cursor: current database cursor
+    :param isins: iterable of ISINs
+    :param batch_size: maximum number of ISINs per query
+    :return: dictionary ISIN -> share ID, unknown ISINs are missing
+    """
+
+    list_isins = list(isins)
+    dict_share_ids = {}
+
+    for start in range(0, len(list_isins), batch_size):
+        statement_registry.execute(sql_cursor, "get_share_ids_for_isins", (list_isins[start:start + batch_size],))
+        dict_share_ids.update(sql_cursor.fetchall())
 
-        df_shares = df_shares.append({'ID': key, 'company_name': value}, ignore_index=True)
+    return dict_share_ids
+
+
+def get_all_shares(sql_cursor):
+    """
+    query all shares
+    :param sql_cursor: current database cursor
+    :return: returns all shares and their ID as data frame
+    """
 
-    return df_shares
+    return get_lookup_table(sql_cursor, "shares")
 
 
 def get_years_for_specific_share(sql_cursor, table, share_id):
     """
-    Get all years which already exist for the given share_id in the given table
+    Get all years which already exist (in their current version) for the given share_id in the given table
     :param sql_cursor:  current database cursor
     :param table: database table to be queried
     :param share_id: share_id to be queried
     :return: list of existing years
     """
 
-    sql_query = 'SELECT tab.year FROM entities.shares share ' \
-                'INNER JOIN data."' + table + '" tab on tab."share_ID" = share."ID" ' \
-                'WHERE share."ID" = ' + str(share_id)
-
-    sql_cursor.execute(sql_query)
+    statement_registry.execute(sql_cursor, "get_years_for_specific_share", (int(share_id), VALID_TO_OPEN_END),
+                               identifiers={"table": (table_schema_relation[table], table)})
 
     list_years = []
 
@@ -346,47 +616,24 @@ def get_profits_for_specific_share(sql_cursor, share_id):
     Get all existing profit values and years for the given share
     :param sql_cursor: current sql cursor
     :param share_id: id of share to be queried
-    :return:
+    :return: list of tuples (year, profit)
     """
 
-    sql_query = 'SELECT tab.year, tab.profit FROM entities.shares share ' \
-                'INNER JOIN data.profits tab on tab."share_ID" = share."ID" ' \
-                'WHERE share."ID" = ' + str(share_id)
-
-    sql_cursor.execute(sql_query)
-
-    list_profits = []
-
-    for each_line in sql_cursor.fetchall():
-
-        list_profits.append(each_line)
-
-    return list_profits
+    return get_data_for_specific_share(sql_cursor, share_id, "profits")
 
 
 def get_data_for_specific_share(sql_cursor, share_id, table_name):
     """
-    Get all existing profit values and years for the given share
+    Get the current values and years for the given share
     :param sql_cursor: current sql cursor
     :param share_id: id of share to be queried
     :param table_name: name of the corresponding db table
-    :return:
+    :return: list of tuples (year, value)
     """
-    if table_name == 'leverages':
-        sql_query = 'SELECT tab.year, tab.' + '	debt_to_equity_ratio' + ' FROM entities.shares share ' \
-                    'INNER JOIN data."' + table_name + '" tab on tab."share_ID" = share."ID" ' \
-                    'WHERE share."ID" = ' + str(share_id)
 
-    if table_name == 'liquidities':
-        sql_query = 'SELECT tab.year, tab.' + '	current_ratio' + ' FROM entities.shares share ' \
-                    'INNER JOIN data."' + table_name + '" tab on tab."share_ID" = share."ID" ' \
-                    'WHERE share."ID" = ' + str(share_id)
-    else:
-        sql_query = 'SELECT tab.year, tab.' + table_name[:-1] + ' FROM entities.shares share ' \
-                    'INNER JOIN data."' + table_name + '" tab on tab."share_ID" = share."ID" ' \
-                    'WHERE share."ID" = ' + str(share_id)
-
-    sql_cursor.execute(sql_query)
+    statement_registry.execute(sql_cursor, "get_data_for_specific_share", (int(share_id), VALID_TO_OPEN_END),
+                               identifiers={"table": (table_schema_relation[table_name], table_name),
+                                            "value_column": data_table_value_columns[table_name][0]})
 
     list_data = []
 
@@ -397,12 +644,126 @@ def get_data_for_specific_share(sql_cursor, share_id, table_name):
     return list_data
 
 
-def create_insert_into_statement(table_name, column_names, returning=False):
+def create_as_of_query_parts(share_ids, table_names, as_of=None, year_from=None, year_to=None):
+    """
+    Create the parts of the as-of query (see get_data_as_of), one part per value column of each table
+    :param share_ids: iterable of share ids to be queried
+    :param table_names: iterable of data tables
+    :param as_of: point in time, None for the current versions
+    :param year_from: first year to be queried (inclusive), all years in case of None
+    :param year_to: last year to be queried (inclusive), all years in case of None
+    :return: tuple (list of parts (statement name, params, identifiers), list of (table, value column) per part)
+    """
+
+    list_share_ids = [int(each_id) for each_id in share_ids]
+    year_from = -2147483648 if year_from is None else int(year_from)
+    year_to = 2147483647 if year_to is None else int(year_to)
+
+    # the current version ends at the open end, this equality is cheaper than the range condition
+    if as_of is None:
+        statement_name = "get_current_data"
+        params_validity = (VALID_TO_OPEN_END,)
+    else:
+        statement_name = "get_data_as_of"
+        as_of = pd.Timestamp(as_of).to_pydatetime()
+        params_validity = (as_of, as_of)
+
+    list_parts = []
+    list_columns = []
+
+    for each_table in table_names:
+
+        if each_table not in data_table_value_columns:
+            raise ValueError("Table " + str(each_table) + " is not a data table")
+
+        if each_table in data_tables_without_year:
+            part_statement_name = statement_name + "_without_year"
+            params_year = ()
+        else:
+            part_statement_name = statement_name
+            params_year = (year_from, year_to)
+
+        for each_column in data_table_value_columns[each_table]:
+            list_parts.append((part_statement_name,
+                               (len(list_columns), list_share_ids) + params_year + params_validity,
+                               {"table": (table_schema_relation[each_table], each_table), "value_column": each_column}))
+            list_columns.append((each_table, each_column))
+
+    return list_parts, list_columns
+
+
+def create_as_of_data_frame(list_rows, list_columns):
+    """
+    Pivot the rows of the as-of query into one column per table and value column
+    :param list_rows: rows (value position, share_ID, year, value) of the query
+    :param list_columns: list of (table, value column) per value position
+    :return: data frame indexed by (share_ID, year) with one column (table, value column) per value
+    """
+
+    df_rows = pd.DataFrame.from_records(list_rows, columns=["value_position", "share_ID", "year", "value"])
+
+    # values of tables without year have no year, a nullable integer keeps the other years integers
+    df_rows["year"] = df_rows["year"].astype("Int64")
+
+    df_data = df_rows.set_index(["share_ID", "year", "value_position"])["value"].astype("float64") \
+        .unstack("value_position").reindex(columns=range(len(list_columns)))
+
+    df_data.columns = pd.MultiIndex.from_tuples(list_columns)
+
+    if not df_data.index.get_level_values("year").hasnans:
+        df_data.index = df_data.index.set_levels(df_data.index.levels[1].astype("int64"), level="year")
+
+    return df_data.sort_index()
+
+
+def get_data_as_of(sql_cursor, share_ids, table_names=None, as_of=None, year_from=None, year_to=None):
+    """
+    Get the values of several data tables for several shares as known at a point in time, all tables are queried
+    with one statement. For each share and year the version valid at as_of (valid_from <= as_of < valid_to) is
+    returned, for tables without year (sharePrices) the value valid at as_of per share
+    :param sql_cursor: current sql cursor
+    :param share_ids: iterable of share ids to be queried
+    :param table_names: iterable of data tables (e.g. profits, ROAs), all data tables in case of None
+    :param as_of: point in time (datetime or string), None for the current versions
+    :param year_from: first year to be queried (inclusive), all years in case of None
+    :param year_to: last year to be queried (inclusive), all years in case of None
+    :return: data frame indexed by (share_ID, year) with one column (table, value column) per value,
+             values of tables without year are found in the rows with year <NA>
+    """
+
+    list_tables = sorted(data_table_value_columns) if table_names is None else list(table_names)
+
+    list_parts, list_columns = create_as_of_query_parts(share_ids, list_tables, as_of, year_from, year_to)
+
+    if not list_parts:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=["share_ID", "year"]))
+
+    statement_registry.execute_union(sql_cursor, list_parts)
+
+    return create_as_of_data_frame(sql_cursor.fetchall(), list_columns)
+
+
+def get_data_for_shares(sql_cursor, share_ids, table_names, year_from=None, year_to=None):
+    """
+    Get the current values of several data tables for several shares, see get_data_as_of
+    :param sql_cursor: current sql cursor
+    :param share_ids: iterable of share ids to be queried
+    :param table_names: iterable of data tables (e.g. profits, ROAs)
+    :param year_from: first year to be queried (inclusive), all years in case of None
+    :param year_to: last year to be queried (inclusive), all years in case of None
+    :return: data frame indexed by (share_ID, year) with one column (table, value column) per value
+    """
+
+    return get_data_as_of(sql_cursor, share_ids, table_names, None, year_from, year_to)
+
+
+def create_insert_into_statement(table_name, column_names, returning=False, on_conflict_constraint=None):
     """
     Creates the special form of a INSERT statement required by psycopg2
     :param table_name: name of table which receives inserts
     :param column_names: list of all column names integrated in the query
     :param returning: indicates whether a returning clause should be included
+    :param on_conflict_constraint: name of a unique constraint, rows violating it are skipped instead of failing
     :return: sql statement as a string
     """
 
@@ -427,6 +788,9 @@ def create_insert_into_statement(table_name, column_names, returning=False):
     # append series placeholder for each column
     query_string += " VALUES(" + "%s, " * (len(column_names) - 1) + "%s)"
 
+    if on_conflict_constraint is not None:
+        query_string += ' ON CONFLICT ON CONSTRAINT "' + on_conflict_constraint + '" DO NOTHING'
+
     if returning:
         query_string += ' RETURNING "ID"'
 
@@ -445,17 +809,15 @@ def insert_company(db_connection, company_name, country, sector):
 
     sql_cursor = db_connection.cursor()
 
-    column_names = get_column_names_from_db_table(sql_cursor, "companies")
-
-    # remove ID as this is generated automatically by the database
-    column_names.remove("ID")
-
-    # create insert statement with returning clause
-    query = create_insert_into_statement("companies", column_names, returning=True)
+    # get insert statement with returning clause (ID is generated automatically by the database)
+    query = get_schema_catalog(db_connection).get_insert_statement("companies", returning=True, sql_cursor=sql_cursor)
 
     sql_cursor.execute(query, (company_name, country, sector))
     db_connection.commit()
 
+    # do not wait for the notification of the database, the own change has to be visible right away
+    lookup_cache.invalidate_table("companies")
+
     # process returned key
     idx_new_row = sql_cursor.fetchone()[0]
 
@@ -474,52 +836,375 @@ def insert_share(db_connection, values):
     try:
         sql_cursor = db_connection.cursor()
 
-        column_names = get_column_names_from_db_table(sql_cursor, "shares")
-
-        # remove ID as this is generated automatically by the database
-        column_names.remove("ID")
-
-        query = create_insert_into_statement("shares", column_names)
+        # get insert statement without ID, as this is generated automatically by the database
+        # an existing ISIN is detected by the unique index within the same statement
+        query = get_schema_catalog(db_connection).get_insert_statement("shares", returning=True,
+                                                                       on_conflict_constraint="companies_isin_unique",
+                                                                       sql_cursor=sql_cursor)
         sql_cursor.execute(query, (values["company_id"], values["isin"], values["category_id"],
                                    values["comment"], values["currency_id"]))
 
+        # no row is returned in case the insert has been skipped due to the conflict
+        if sql_cursor.fetchone() is None:
+            error_message = "The ISIN " + str(values["isin"]) + " does already exist."
+
         db_connection.commit()
 
+        lookup_cache.invalidate_table("shares")
+
     except BaseException as e:
         error_message = e
 
     return error_message
 
 
-def insert_into_data_table(db_connection, table_name, values):
+def get_table_name_for_insert_type(insert_type):
+    """
+    Translate the insert type used by the GUI (e.g. profit, liquidity) into the name of the data table
+    :param insert_type: singular name of the data type
+    :return: name of the corresponding table
+    """
 
-    error_message = None
-    try:
+    if insert_type == "liquidity":
+        return "liquidities"
 
-        sql_cursor = db_connection.cursor()
+    return insert_type + "s"
 
-        column_names = get_column_names_from_db_table(sql_cursor, table_name + "s")
 
-        # remove ID as this is generated automatically by the database
-        column_names.remove("ID")
+def _iterate_row_batches(values, batch_size):
+    """
+    Split column-oriented input into batches of row tuples
+    :param values: dictionary of equally long lists (column name -> values) or data frame
+    :param batch_size: maximum number of rows per batch
+    :return: generator of lists of row tuples
+    """
 
-        query = create_insert_into_statement(table_name + "s", column_names)
-        print(query)
+    if isinstance(values, pd.DataFrame):
+        for start in range(0, values.shape[0], batch_size):
+            yield list(values.iloc[start:start + batch_size].itertuples(index=False, name=None))
 
-        # special case for profit page due to different column order
-        if table_name == "profit":
-            for i in range(len(values["year"])):
-                sql_cursor.execute(query, (values["year"][i], values["share_ID"][i], values[table_name][i],
-                                           values["valid_from"][i], values["valid_to"][i]))
-        else:
-            for i in range(len(values["year"])):
+    else:
+        list_columns = list(values.values())
+        number_of_rows = len(list_columns[0]) if list_columns else 0
+
+        if any(len(each_column) != number_of_rows for each_column in list_columns):
+            raise ValueError("All columns have to contain the same number of values")
+
+        for start in range(0, number_of_rows, batch_size):
+            yield list(zip(*[each_column[start:start + batch_size] for each_column in list_columns]))
+
+
+def bulk_insert_into_data_table(db_connection, table_name, values, batch_size=BULK_INSERT_BATCH_SIZE,
+                                method="copy", commit=True):
+    """
+    Stream column-oriented data batch-wise into a table, each batch is sent in one round trip and committed
+    In case a batch fails, all previous batches remain committed
+    :param db_connection: psycopg2 connection to database
+    :param table_name: name of the table receiving the rows (e.g. profits)
+    :param values: dictionary of equally long lists (column name -> values) or data frame,
+                   keys/columns have to match the column names of the table
+    :param batch_size: maximum number of rows per batch and commit
+    :param method: "copy" to use COPY FROM STDIN, "values" to use multi-row INSERT ... VALUES
+    :param commit: commit every batch, otherwise all batches remain in the open transaction of the caller
+    :return: number of inserted rows
+    """
+
+    if method not in ("copy", "values"):
+        raise ValueError("Unknown bulk insert method " + str(method))
+
+    column_names = list(values.columns) if isinstance(values, pd.DataFrame) else list(values.keys())
+
+    table_identifier = sql.Identifier(table_schema_relation[table_name], table_name)
+    column_identifiers = sql.SQL(", ").join(map(sql.Identifier, column_names))
 
-                sql_cursor.execute(query, (values["share_ID"][i], values["year"][i], values[table_name][i],
-                                           values["valid_from"][i], values["valid_to"][i]))
+    if method == "copy":
+        query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(table_identifier, column_identifiers)
+    else:
+        query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(table_identifier, column_identifiers)
+
+    number_of_rows = 0
+
+    with db_connection.cursor() as sql_cursor:
+
+        for list_rows in _iterate_row_batches(values, batch_size):
+
+            if method == "copy":
+                # serialize the batch as csv, empty unquoted fields are interpreted as NULL
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="\n").writerows(list_rows)
+                buffer.seek(0)
+
+                sql_cursor.copy_expert(query, buffer)
+            else:
+                psycopg2.extras.execute_values(sql_cursor, query, list_rows, page_size=batch_size)
+
+            if commit:
+                db_connection.commit()
+            number_of_rows += len(list_rows)
+
+    return number_of_rows
+
+
+def insert_into_data_table(db_connection, table_name, values, batch_size=BULK_INSERT_BATCH_SIZE):
+    """
+    Performs the insert of yearly values into a data table, the values and the derived ratios depending on them are
+    written in one transaction
+    :param db_connection: psycopg2 connection to database
+    :param table_name: insert type (e.g. profit, liquidity), the values are written to the corresponding table
+    :param values: dictionary of lists with the keys year, share_ID, valid_from, valid_to and the insert type
+    :param batch_size: maximum number of rows per batch
+    :return: error message
+    """
+
+    error_message = None
+    try:
+
+        data_table = get_table_name_for_insert_type(table_name)
+
+        # map the values to the columns of the table, the insert type holds the actual data value
+        dict_columns = {"share_ID": values["share_ID"],
+                        "year": values["year"],
+                        data_table_value_columns[data_table][0]: values[table_name],
+                        "valid_from": values["valid_from"],
+                        "valid_to": values["valid_to"]}
+
+        bulk_insert_into_data_table(db_connection, data_table, dict_columns, batch_size=batch_size, commit=False)
+
+        # the derived ratios are updated within the same transaction, an error rolls back the inserted values too
+        if data_table in derived_ratio_source_tables:
+            with db_connection.cursor() as sql_cursor:
+                process_derived_ratio_queue(sql_cursor)
 
         db_connection.commit()
 
     except BaseException as e:
+        db_connection.rollback()
         error_message = str(e)
 
     return error_message
+
+
+def create_update_values(table_name, values):
+    """
+    Check the values of a versioned update and serialize them as JSON array of rows (see update_data_tables)
+    :param table_name: name of the data table (e.g. profits)
+    :param values: dictionary of equally long lists or data frame with the columns share_ID, year (not for tables
+                   without year) and all value columns of the table
+    :return: tuple (JSON array as string, number of rows)
+    """
+
+    if table_name not in data_table_value_columns:
+        raise ValueError("Table " + str(table_name) + " is not a data table")
+
+    list_key_columns = ["share_ID"] if table_name in data_tables_without_year else ["share_ID", "year"]
+    list_value_columns = data_table_value_columns[table_name]
+
+    df_values = values if isinstance(values, pd.DataFrame) else pd.DataFrame(values)
+
+    list_missing_columns = [each_column for each_column in list_key_columns + list_value_columns
+                            if each_column not in df_values.columns]
+    if list_missing_columns:
+        raise ValueError("Missing columns for " + table_name + ": " + ", ".join(list_missing_columns))
+
+    df_values = df_values[list_key_columns + list_value_columns]
+
+    if df_values.isna().any(axis=None):
+        raise ValueError("Missing values for " + table_name)
+
+    # a share (and year) can only get one new version per update
+    if df_values.duplicated(subset=list_key_columns).any():
+        raise ValueError("Several values for the same " + " and ".join(list_key_columns) + " in " + table_name)
+
+    # tolist provides python numbers, which can be serialized as JSON
+    list_columns = [df_values[each_column].astype("int64").tolist() for each_column in list_key_columns] + \
+                   [df_values[each_column].astype("float64").tolist() for each_column in list_value_columns]
+
+    list_names = list_key_columns + list_value_columns
+
+    return json.dumps([dict(zip(list_names, each_row)) for each_row in zip(*list_columns)]), len(df_values)
+
+
+def update_data_tables(db_connection, dict_values, valid_from=None):
+    """
+    Versioned update of several data tables in one transaction. For every given share (and year) the current
+    version is closed (valid_to = valid_from) and the new value is inserted as current version, new shares/years
+    are inserted right away. Each table is updated by one statement, independent of the number of values
+    :param db_connection: psycopg2 connection to database
+    :param dict_values: dictionary table name -> values as accepted by create_update_values
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :return: dictionary table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    valid_from = datetime.datetime.now().replace(microsecond=0) if valid_from is None \
+        else pd.Timestamp(valid_from).to_pydatetime()
+
+    # check all values before anything is sent to the database
+    dict_json_values = {table_name: create_update_values(table_name, values)[0]
+                        for table_name, values in dict_values.items()}
+
+    dict_results = {}
+
+    try:
+        with db_connection.cursor() as sql_cursor:
+
+            for table_name, json_values in dict_json_values.items():
+
+                statement_name = "update_data_without_year" if table_name in data_tables_without_year \
+                    else "update_data"
+
+                statement_registry.execute(sql_cursor, statement_name,
+                                           (json_values, valid_from, VALID_TO_OPEN_END, valid_from,
+                                            VALID_TO_OPEN_END),
+                                           identifiers={"table": (table_schema_relation[table_name], table_name),
+                                                        "value_columns": data_table_value_columns[table_name]})
+
+                dict_results[table_name] = sql_cursor.fetchone()
+
+            # the derived ratios are updated within the same transaction, so they never show outdated values
+            if any(table_name in derived_ratio_source_tables for table_name in dict_json_values):
+                process_derived_ratio_queue(sql_cursor, valid_from)
+
+        db_connection.commit()
+
+    except BaseException:
+        db_connection.rollback()
+        raise
+
+    return dict_results
+
+
+def update_data_table(db_connection, table_name, values, valid_from=None):
+    """
+    Versioned update of a single data table, see update_data_tables
+    :param db_connection: psycopg2 connection to database
+    :param table_name: name of the data table (e.g. profits)
+    :param values: values as accepted by create_update_values
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :return: tuple (number of closed versions, number of new versions)
+    """
+
+    return update_data_tables(db_connection, {table_name: values}, valid_from)[table_name]
+
+
+def merge_share_prices(db_connection, list_prices):
+    """
+    Merge share prices into the price histories in one transaction. The prices are copied into a staging table and
+    merged by one statement: a price is valid from its date until the date of the next price of the share. A changed
+    price of an existing date closes the existing version and is inserted as a new version, so the previous price
+    is kept. The derived ratios are queued by the triggers of sharePrices, but not refreshed (see
+    refresh_derived_ratios)
+    :param db_connection: psycopg2 connection to database
+    :param list_prices: list of tuples (share_ID, date as datetime, share price), at most one price per share and
+                        date
+    :return: tuple (number of closed or shortened versions, number of new versions)
+    """
+
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(list_prices)
+    buffer.seek(0)
+
+    try:
+        with db_connection.cursor() as sql_cursor:
+            statement_registry.execute(sql_cursor, "create_share_price_staging")
+            sql_cursor.copy_expert(SHARE_PRICE_STAGING_COPY, buffer)
+
+            # the statistics of the staging table are unknown to the planner
+            sql_cursor.execute("ANALYZE pg_temp.share_price_staging")
+
+            statement_registry.execute(sql_cursor, "merge_share_prices", (VALID_TO_OPEN_END,))
+            result = sql_cursor.fetchone()
+
+        # the staging table is emptied by the commit
+        db_connection.commit()
+
+    except BaseException:
+        db_connection.rollback()
+        raise
+
+    return result
+
+
+def process_derived_ratio_queue(sql_cursor, valid_from=None, full=False):
+    """
+    Recompute the derived ratios of all queued share-years, the queue is emptied
+    Values which changed get a new version, values which cannot be computed anymore are closed. The caller has to
+    commit the transaction, in case of a rollback the share-years remain queued
+    :param sql_cursor: psycopg2 cursor
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :param full: recompute the ratios of all shares instead of the queued share-years
+    :return: dictionary derived table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    valid_from = datetime.datetime.now().replace(microsecond=0) if valid_from is None \
+        else pd.Timestamp(valid_from).to_pydatetime()
+
+    # released by the end of the transaction
+    sql_cursor.execute("SELECT pg_advisory_xact_lock(%s)", (DERIVED_RATIO_LOCK_KEY,))
+
+    if full:
+        statement_registry.execute(sql_cursor, "queue_all_shares_for_derived_ratios")
+
+    statement_registry.execute(sql_cursor, "claim_derived_ratio_queue")
+    set_queued = set(sql_cursor.fetchall())
+
+    if not set_queued:
+        return {table_name: (0, 0) for table_name in derived_ratio_statements}
+
+    # a share queued with all years covers its single years
+    set_all_years = {share_id for share_id, year in set_queued if year is None}
+    list_queued = [(share_id, year) for share_id, year in set_queued if year is None or share_id not in set_all_years]
+
+    share_ids = [share_id for share_id, year in list_queued]
+    years = [year for share_id, year in list_queued]
+
+    dict_results = {}
+
+    for table_name, statement_name in derived_ratio_statements.items():
+        statement_registry.execute(sql_cursor, statement_name, (share_ids, years, valid_from, VALID_TO_OPEN_END))
+        dict_results[table_name] = sql_cursor.fetchone()
+
+    return dict_results
+
+
+def refresh_derived_ratios(db_connection, valid_from=None, full=False):
+    """
+    Recompute the derived ratios (PERs, dividendReturns) of all queued share-years in one transaction
+    :param db_connection: psycopg2 connection to database
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :param full: recompute the ratios of all shares instead of the queued share-years
+    :return: dictionary derived table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    try:
+        with db_connection.cursor() as sql_cursor:
+            dict_results = process_derived_ratio_queue(sql_cursor, valid_from, full)
+
+        db_connection.commit()
+
+    except BaseException:
+        db_connection.rollback()
+        raise
+
+    return dict_results
+
+
+def prune_data_change_log(db_connection, retention=CHANGE_LOG_RETENTION):
+    """
+    Remove the entries of the change log older than the retention period (see DB_Snapshot_Cache)
+    :param db_connection: psycopg2 connection to database
+    :param retention: timedelta the entries are kept
+    :return: number of removed entries
+    """
+
+    try:
+        with db_connection.cursor() as sql_cursor:
+            statement_registry.execute(sql_cursor, "prune_data_change_log", (retention,))
+            result = sql_cursor.fetchone()
+
+        db_connection.commit()
+
+    except BaseException:
+        db_connection.rollback()
+        raise
+
+    return 0 if result is None else result[0]
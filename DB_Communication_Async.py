@@ -0,0 +1,688 @@
+import asyncio
+import datetime
+from contextlib import asynccontextmanager
+import asyncpg
+import pandas as pd
+import DB_Communication
+from DB_Communication import (table_schema_relation, data_table_value_columns, lookup_table_definitions,
+                              statement_registry, lookup_cache, get_table_name_for_insert_type, _iterate_row_batches,
+                              create_as_of_query_parts, create_as_of_data_frame, create_update_values,
+                              data_tables_without_year, derived_ratio_statements, derived_ratio_source_tables,
+                              BULK_INSERT_BATCH_SIZE, VALID_TO_OPEN_END, DERIVED_RATIO_LOCK_KEY)
+from DB_Schema_Catalog import SchemaCatalog
+from DB_Statement_Registry import convert_placeholders
+"""
+    This python file implements an asyncio counterpart of the read and write functions of DB_Communication,
+    based on asyncpg and its own pool of connections. Many share queries can wait on their round trips
+    concurrently while only a few connections are used.
+    The statements of ./data/sql/ are shared with DB_Communication and the results have the same shape
+    (lists of tuples, data frames). asyncpg prepares and caches statements per connection on its own.
+
+    e.g.
+        pool = await create_async_pool()
+        list_results = await asyncio.gather(*[get_data_for_specific_share(pool, each_id, "profits")
+                                              for each_id in list_share_ids])
+"""
+
+# async pool shared by the whole application (see create_async_pool)
+_async_pool = None
+
+# schema catalog of the database of the async pool, filled via asyncpg (see get_async_schema_catalog)
+_schema_catalog = None
+
+# statements rendered for asyncpg, key is (statement name, identifiers) (see get_statement)
+_rendered_statements = {}
+
+
+async def create_async_pool(db_name=None, host=None, user=None, password=None, min_size=1, max_size=10):
+    """
+    Create a pool of asyncpg connections and register it as the application's async pool
+    Parameters which are not given are taken from the config file
+    :param db_name: name of database
+    :param host: name of host
+    :param user: name of user
+    :param password: password
+    :param min_size: number of connections kept open all the time
+    :param max_size: maximum number of connections open at the same time
+    :return: in case of a successful connection, the asyncpg pool otherwise None
+    """
+
+    global _async_pool, _schema_catalog
+
+    if None in (db_name, host, user, password):
+        dict_db_params = DB_Communication.read_db_config()
+
+        db_name = dict_db_params["db_name"] if db_name is None else db_name
+        host = dict_db_params["host"] if host is None else host
+        user = dict_db_params["user"] if user is None else user
+        password = dict_db_params["password"] if password is None else password
+
+    try:
+        pool = await asyncpg.create_pool(database=db_name, host=host, user=user, password=password,
+                                         min_size=max(min_size, 1), max_size=max_size)
+    except (asyncpg.PostgresError, OSError, asyncio.TimeoutError):
+        return None
+
+    # replace the previous pool, connections in use are closed as soon as they are released
+    if _async_pool is not None:
+        await _async_pool.close()
+
+    _async_pool = pool
+    _schema_catalog = None
+
+    return pool
+
+
+def get_async_pool():
+    """
+    :return: the pool created by create_async_pool or None if there is none yet
+    """
+    return _async_pool
+
+
+async def close_async_pool():
+    """
+    Close the application's async pool, if there is one
+    :return: None
+    """
+
+    global _async_pool
+
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+@asynccontextmanager
+async def acquire_connection(db_connection):
+    """
+    Context manager providing a connection, either the given one or one borrowed from the given pool
+    :param db_connection: asyncpg connection or pool
+    :return: asyncpg connection
+    """
+
+    if isinstance(db_connection, asyncpg.Pool):
+        async with db_connection.acquire() as conn:
+            yield conn
+    else:
+        yield db_connection
+
+
+def quote_identifier(value):
+    """
+    Quote an identifier, see DB_Statement_Registry.compose_identifier for the accepted values
+    :param value: string, tuple of strings (qualified name) or list of strings (comma separated list)
+    :return: quoted identifier as string
+    """
+
+    if isinstance(value, tuple):
+        return ".".join(map(quote_identifier, value))
+
+    if isinstance(value, list):
+        return ", ".join(map(quote_identifier, value))
+
+    return '"' + value.replace('"', '""') + '"'
+
+
+def get_statement(name, identifiers=None):
+    """
+    Get a statement of the registry with the identifiers composed into it and $n placeholders as used by asyncpg
+    :param name: name of the registered statement
+    :param identifiers: dictionary placeholder -> identifier (see quote_identifier)
+    :return: query as string
+    """
+
+    key = (name, tuple(sorted((key, str(value)) for key, value in (identifiers or {}).items())))
+
+    if key not in _rendered_statements:
+
+        query = statement_registry.get_query(name)
+
+        if identifiers:
+            query = query.format(**{key: quote_identifier(value) for key, value in identifiers.items()})
+
+        _rendered_statements[key] = convert_placeholders(query)[0]
+
+    return _rendered_statements[key]
+
+
+def get_union_statement(list_parts):
+    """
+    Combine several statements of the registry by UNION ALL, see StatementRegistry.execute_union
+    :param list_parts: list of tuples (name of registered statement, params, identifiers)
+    :return: tuple (query as string, list of all parameters)
+    """
+
+    key = tuple((name, tuple(sorted((key, str(value)) for key, value in (identifiers or {}).items())))
+                for name, params, identifiers in list_parts)
+
+    if key not in _rendered_statements:
+
+        list_queries = []
+
+        for name, params, identifiers in list_parts:
+            query = statement_registry.get_query(name)
+
+            if identifiers:
+                query = query.format(**{key: quote_identifier(value) for key, value in identifiers.items()})
+
+            list_queries.append("(" + query + ")")
+
+        # the placeholders are numbered across all parts
+        _rendered_statements[key] = convert_placeholders(" UNION ALL ".join(list_queries))[0]
+
+    return _rendered_statements[key], [each_param for name, params, identifiers in list_parts for each_param in params]
+
+
+async def get_async_schema_catalog(db_connection):
+    """
+    Get the schema catalog of the async pool's database, it is loaded on first access
+    :param db_connection: asyncpg connection or pool
+    :return: loaded SchemaCatalog instance
+    """
+
+    global _schema_catalog
+
+    if _schema_catalog is None:
+        _schema_catalog = SchemaCatalog(DB_Communication.create_insert_into_statement,
+                                        statement_registry.get_query("get_schema_catalog"))
+
+    if not _schema_catalog.is_loaded():
+        async with acquire_connection(db_connection) as conn:
+            _schema_catalog.load_rows(await conn.fetch(_schema_catalog.catalog_query))
+
+    return _schema_catalog
+
+
+async def fetch_all(db_connection, statement_name, params=(), identifiers=None):
+    """
+    Execute a statement of the registry and fetch all rows
+    :param db_connection: asyncpg connection or pool
+    :param statement_name: name of the statement in the statement registry
+    :param params: sequence of parameters for the statement
+    :param identifiers: dictionary of identifiers to be composed into the statement
+    :return: list of tuples
+    """
+
+    async with acquire_connection(db_connection) as conn:
+        list_records = await conn.fetch(get_statement(statement_name, identifiers), *params)
+
+    return [tuple(each_record) for each_record in list_records]
+
+
+async def query_as_data_frame(db_connection, statement_name, params=(), identifiers=None, columns=None,
+                              dtypes=None, as_records=False):
+    """
+    Execute a statement of the registry and return its result as data frame
+    :param db_connection: asyncpg connection or pool
+    :param statement_name: name of the statement in the statement registry
+    :param params: sequence of parameters for the statement
+    :param identifiers: dictionary of identifiers to be composed into the statement
+    :param columns: list of column names, defaults to the column names of the query
+    :param dtypes: optional dictionary column name -> dtype (e.g. int32, category)
+    :param as_records: return a numpy record array instead of a data frame
+    :return: data frame (or numpy record array) of the query result
+    """
+
+    async with acquire_connection(db_connection) as conn:
+
+        # the prepared statement provides the column names even for empty results
+        statement = await conn.prepare(get_statement(statement_name, identifiers))
+        list_records = await statement.fetch(*params)
+
+        if columns is None:
+            columns = [each_attribute.name for each_attribute in statement.get_attributes()]
+
+    df_result = pd.DataFrame.from_records([tuple(each_record) for each_record in list_records], columns=columns)
+
+    if dtypes:
+        df_result = df_result.astype(dtypes)
+
+    if as_records:
+        return df_result.to_records(index=False)
+
+    return df_result
+
+
+async def get_total_number_of_shares(db_connection):
+    """
+    returns the total number of shares in the database
+    :param db_connection: asyncpg connection or pool
+    :return: number of shares in db
+    """
+
+    return (await fetch_all(db_connection, "get_total_number_of_shares"))[0][0]
+
+
+async def get_lookup_table(db_connection, table_name, as_records=False):
+    """
+    query all entries of a lookup table (IDs and names), as defined in DB_Communication.lookup_table_definitions
+    :param db_connection: asyncpg connection or pool
+    :param table_name: name of the lookup table (sectors, countries, categories, currencies or shares)
+    :param as_records: return a numpy record array instead of a data frame
+    :return: all IDs and names as data frame
+    """
+
+    statement_name, dict_dtypes, list_queried_tables = lookup_table_definitions[table_name]
+
+    return await query_as_data_frame(db_connection, statement_name, columns=list(dict_dtypes.keys()),
+                                     dtypes=dict_dtypes, as_records=as_records)
+
+
+async def get_all_sectors(db_connection):
+    return await get_lookup_table(db_connection, "sectors")
+
+
+async def get_all_countries(db_connection):
+    return await get_lookup_table(db_connection, "countries")
+
+
+async def get_all_categories(db_connection):
+    return await get_lookup_table(db_connection, "categories")
+
+
+async def get_all_currencies(db_connection):
+    return await get_lookup_table(db_connection, "currencies")
+
+
+async def get_all_shares(db_connection):
+    return await get_lookup_table(db_connection, "shares")
+
+
+async def get_all_isin(db_connection):
+    """
+    query all isin
+    :param db_connection: asyncpg connection or pool
+    :return: returns all isin as list
+    """
+
+    return [each_line[0] for each_line in await fetch_all(db_connection, "get_all_isin")]
+
+
+async def does_isin_exist(db_connection, isin):
+    """
+    Check whether a share with the given ISIN exists, the lookup uses the unique index on the ISIN
+    :param db_connection: asyncpg connection or pool
+    :param isin: ISIN to be checked
+    :return: True or False
+    """
+
+    return (await fetch_all(db_connection, "does_isin_exist", (isin,)))[0][0]
+
+
+async def get_existing_isins(db_connection, isins, batch_size=10000):
+    """
+    Check a large number of ISINs for existence, the batches are queried concurrently in case a pool is given
+    :param db_connection: asyncpg connection or pool
+    :param isins: iterable of ISINs to be checked
+    :param batch_size: maximum number of ISINs per query
+    :return: set of the given ISINs which exist in the database
+    """
+
+    list_isins = list(isins)
+
+    list_results = await _gather_on(db_connection, [
+        (lambda conn, batch=list_isins[start:start + batch_size]: fetch_all(conn, "get_existing_isins", (batch,)))
+        for start in range(0, len(list_isins), batch_size)])
+
+    return {each_line[0] for list_lines in list_results for each_line in list_lines}
+
+
+async def get_share_ids_for_isins(db_connection, isins, batch_size=10000):
+    """
+    Resolve a large number of ISINs to the IDs of their shares, the batches are queried concurrently in case a pool
+    is given
+    :param db_connection: asyncpg connection or pool
+    :param isins: iterable of ISINs
+    :param batch_size: maximum number of ISINs per query
+    :return: dictionary ISIN -> share ID, unknown ISINs are missing
+    """
+
+    list_isins = list(isins)
+
+    list_results = await _gather_on(db_connection, [
+        (lambda conn, batch=list_isins[start:start + batch_size]: fetch_all(conn, "get_share_ids_for_isins", (batch,)))
+        for start in range(0, len(list_isins), batch_size)])
+
+    return dict(each_line for list_lines in list_results for each_line in list_lines)
+
+
+async def _gather_on(db_connection, list_functions):
+    """
+    Run coroutine functions concurrently on a pool, or one after the other on a single connection
+    (a connection cannot execute several queries at the same time)
+    :param db_connection: asyncpg connection or pool
+    :param list_functions: list of functions taking the connection or pool and returning a coroutine
+    :return: list of results in the order of the functions
+    """
+
+    if isinstance(db_connection, asyncpg.Pool):
+        return await asyncio.gather(*[each_function(db_connection) for each_function in list_functions])
+
+    return [await each_function(db_connection) for each_function in list_functions]
+
+
+async def get_years_for_specific_share(db_connection, table, share_id):
+    """
+    Get all years which already exist (in their current version) for the given share_id in the given table
+    :param db_connection: asyncpg connection or pool
+    :param table: database table to be queried
+    :param share_id: share_id to be queried
+    :return: list of existing years
+    """
+
+    list_lines = await fetch_all(db_connection, "get_years_for_specific_share", (int(share_id), VALID_TO_OPEN_END),
+                                 identifiers={"table": (table_schema_relation[table], table)})
+
+    return [each_line[0] for each_line in list_lines]
+
+
+async def get_profits_for_specific_share(db_connection, share_id):
+    """
+    Get all existing profit values and years for the given share
+    :param db_connection: asyncpg connection or pool
+    :param share_id: id of share to be queried
+    :return: list of tuples (year, profit)
+    """
+
+    return await get_data_for_specific_share(db_connection, share_id, "profits")
+
+
+async def get_data_for_specific_share(db_connection, share_id, table_name):
+    """
+    Get the current values and years for the given share
+    :param db_connection: asyncpg connection or pool
+    :param share_id: id of share to be queried
+    :param table_name: name of the corresponding db table
+    :return: list of tuples (year, value)
+    """
+
+    return await fetch_all(db_connection, "get_data_for_specific_share", (int(share_id), VALID_TO_OPEN_END),
+                           identifiers={"table": (table_schema_relation[table_name], table_name),
+                                        "value_column": data_table_value_columns[table_name][0]})
+
+
+async def get_data_as_of(db_connection, share_ids, table_names=None, as_of=None, year_from=None, year_to=None):
+    """
+    Get the values of several data tables for several shares as known at a point in time, all tables are queried
+    with one statement. See DB_Communication.get_data_as_of
+    :param db_connection: asyncpg connection or pool
+    :param share_ids: iterable of share ids to be queried
+    :param table_names: iterable of data tables (e.g. profits, ROAs), all data tables in case of None
+    :param as_of: point in time (datetime or string), None for the current versions
+    :param year_from: first year to be queried (inclusive), all years in case of None
+    :param year_to: last year to be queried (inclusive), all years in case of None
+    :return: data frame indexed by (share_ID, year) with one column (table, value column) per value,
+             values of tables without year are found in the rows with year <NA>
+    """
+
+    list_tables = sorted(data_table_value_columns) if table_names is None else list(table_names)
+
+    list_parts, list_columns = create_as_of_query_parts(share_ids, list_tables, as_of, year_from, year_to)
+
+    if not list_parts:
+        return pd.DataFrame(index=pd.MultiIndex.from_arrays([[], []], names=["share_ID", "year"]))
+
+    query, list_params = get_union_statement(list_parts)
+
+    async with acquire_connection(db_connection) as conn:
+        list_records = await conn.fetch(query, *list_params)
+
+    return create_as_of_data_frame([tuple(each_record) for each_record in list_records], list_columns)
+
+
+async def get_data_for_shares(db_connection, share_ids, table_names, year_from=None, year_to=None):
+    """
+    Get the current values of several data tables for several shares, see get_data_as_of
+    :param db_connection: asyncpg connection or pool
+    :param share_ids: iterable of share ids to be queried
+    :param table_names: iterable of data tables (e.g. profits, ROAs)
+    :param year_from: first year to be queried (inclusive), all years in case of None
+    :param year_to: last year to be queried (inclusive), all years in case of None
+    :return: data frame indexed by (share_ID, year) with one column (table, value column) per value
+    """
+
+    return await get_data_as_of(db_connection, share_ids, table_names, None, year_from, year_to)
+
+
+async def insert_company(db_connection, company_name, country, sector):
+    """
+    Performs INSERT statement for a company
+    :param db_connection: asyncpg connection or pool
+    :param company_name: name of the company as string
+    :param country: id of country (serves as foreign key)
+    :param sector: id of sector (serves as foreign key)
+    :return: id of the created company entry
+    """
+
+    catalog = await get_async_schema_catalog(db_connection)
+    query = convert_placeholders(catalog.get_insert_statement("companies", returning=True))[0]
+
+    async with acquire_connection(db_connection) as conn:
+        idx_new_row = await conn.fetchval(query, company_name, int(country), int(sector))
+
+    # do not wait for the notification of the database, the own change has to be visible right away
+    lookup_cache.invalidate_table("companies")
+
+    return idx_new_row
+
+
+async def insert_share(db_connection, values):
+    """
+    Performs insert statement of a share
+    :param db_connection: asyncpg connection or pool
+    :param values: dictionary of values to be integrated in the statement
+    :return: error message
+    """
+
+    error_message = None
+    try:
+        catalog = await get_async_schema_catalog(db_connection)
+
+        # an existing ISIN is detected by the unique index within the same statement
+        query = convert_placeholders(catalog.get_insert_statement("shares", returning=True,
+                                                                  on_conflict_constraint="companies_isin_unique"))[0]
+
+        async with acquire_connection(db_connection) as conn:
+            idx_new_row = await conn.fetchval(query, int(values["company_id"]), values["isin"],
+                                              int(values["category_id"]), values["comment"],
+                                              int(values["currency_id"]))
+
+        # no row is returned in case the insert has been skipped due to the conflict
+        if idx_new_row is None:
+            error_message = "The ISIN " + str(values["isin"]) + " does already exist."
+
+        lookup_cache.invalidate_table("shares")
+
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, ValueError, KeyError) as e:
+        error_message = e
+
+    return error_message
+
+
+async def bulk_insert_into_data_table(db_connection, table_name, values, batch_size=BULK_INSERT_BATCH_SIZE,
+                                      method="copy"):
+    """
+    Stream column-oriented data batch-wise into a table, each batch is sent in one round trip and committed
+    In case a batch fails, all previous batches remain committed
+    asyncpg transfers the values in binary format, so they have to be of the matching Python type
+    (e.g. int for year, datetime for valid_from)
+    :param db_connection: asyncpg connection or pool
+    :param table_name: name of the table receiving the rows (e.g. profits)
+    :param values: dictionary of equally long lists (column name -> values) or data frame,
+                   keys/columns have to match the column names of the table
+    :param batch_size: maximum number of rows per batch and commit
+    :param method: "copy" to use COPY FROM STDIN, "values" to use a batched INSERT ... VALUES
+    :return: number of inserted rows
+    """
+
+    if method not in ("copy", "values"):
+        raise ValueError("Unknown bulk insert method " + str(method))
+
+    column_names = list(values.columns) if isinstance(values, pd.DataFrame) else list(values.keys())
+    schema_name = table_schema_relation[table_name]
+
+    query = ("INSERT INTO " + quote_identifier((schema_name, table_name)) + " (" + quote_identifier(column_names) +
+             ") VALUES (" + ", ".join("$" + str(i) for i in range(1, len(column_names) + 1)) + ")")
+
+    number_of_rows = 0
+
+    async with acquire_connection(db_connection) as conn:
+
+        for list_rows in _iterate_row_batches(values, batch_size):
+
+            # numpy scalars (e.g. taken from data frames) are not known to asyncpg
+            list_rows = [tuple(each_value.item() if hasattr(each_value, "item") else each_value
+                               for each_value in each_row) for each_row in list_rows]
+
+            # each batch is a transaction of its own
+            if method == "copy":
+                await conn.copy_records_to_table(table_name, records=list_rows, columns=column_names,
+                                                 schema_name=schema_name)
+            else:
+                async with conn.transaction():
+                    await conn.executemany(query, list_rows)
+
+            number_of_rows += len(list_rows)
+
+    return number_of_rows
+
+
+async def insert_into_data_table(db_connection, table_name, values, batch_size=BULK_INSERT_BATCH_SIZE):
+    """
+    Performs the insert of yearly values into a data table, the values and the derived ratios depending on them are
+    written in one transaction
+    :param db_connection: asyncpg connection or pool
+    :param table_name: insert type (e.g. profit, liquidity), the values are written to the corresponding table
+    :param values: dictionary of lists with the keys year, share_ID, valid_from, valid_to and the insert type
+    :param batch_size: maximum number of rows per batch
+    :return: error message
+    """
+
+    error_message = None
+    try:
+
+        data_table = get_table_name_for_insert_type(table_name)
+
+        # map the values to the columns of the table, the insert type holds the actual data value
+        dict_columns = {"share_ID": values["share_ID"],
+                        "year": values["year"],
+                        data_table_value_columns[data_table][0]: values[table_name],
+                        "valid_from": values["valid_from"],
+                        "valid_to": values["valid_to"]}
+
+        # the transactions of the batches become savepoints of the enclosing transaction
+        async with acquire_connection(db_connection) as conn, conn.transaction():
+
+            await bulk_insert_into_data_table(conn, data_table, dict_columns, batch_size=batch_size)
+
+            if data_table in derived_ratio_source_tables:
+                await process_derived_ratio_queue(conn)
+
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, asyncpg.DataError, ValueError, KeyError,
+            TypeError) as e:
+        error_message = str(e)
+
+    return error_message
+
+
+async def update_data_tables(db_connection, dict_values, valid_from=None):
+    """
+    Versioned update of several data tables in one transaction, see DB_Communication.update_data_tables
+    :param db_connection: asyncpg connection or pool
+    :param dict_values: dictionary table name -> values as accepted by DB_Communication.create_update_values
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :return: dictionary table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    valid_from = datetime.datetime.now().replace(microsecond=0) if valid_from is None \
+        else pd.Timestamp(valid_from).to_pydatetime()
+
+    # check all values before anything is sent to the database
+    dict_json_values = {table_name: create_update_values(table_name, values)[0]
+                        for table_name, values in dict_values.items()}
+
+    dict_results = {}
+
+    async with acquire_connection(db_connection) as conn, conn.transaction():
+
+        for table_name, json_values in dict_json_values.items():
+
+            statement_name = "update_data_without_year" if table_name in data_tables_without_year else "update_data"
+
+            query = get_statement(statement_name, {"table": (table_schema_relation[table_name], table_name),
+                                                   "value_columns": data_table_value_columns[table_name]})
+
+            dict_results[table_name] = tuple(await conn.fetchrow(query, json_values, valid_from, VALID_TO_OPEN_END,
+                                                                 valid_from, VALID_TO_OPEN_END))
+
+        # the derived ratios are updated within the same transaction, so they never show outdated values
+        if any(table_name in derived_ratio_source_tables for table_name in dict_json_values):
+            await process_derived_ratio_queue(conn, valid_from)
+
+    return dict_results
+
+
+async def update_data_table(db_connection, table_name, values, valid_from=None):
+    """
+    Versioned update of a single data table, see update_data_tables
+    :param db_connection: asyncpg connection or pool
+    :param table_name: name of the data table (e.g. profits)
+    :param values: values as accepted by DB_Communication.create_update_values
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :return: tuple (number of closed versions, number of new versions)
+    """
+
+    return (await update_data_tables(db_connection, {table_name: values}, valid_from))[table_name]
+
+
+async def process_derived_ratio_queue(conn, valid_from=None, full=False):
+    """
+    Recompute the derived ratios of all queued share-years, see DB_Communication.process_derived_ratio_queue
+    :param conn: asyncpg connection within a transaction
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :param full: recompute the ratios of all shares instead of the queued share-years
+    :return: dictionary derived table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    valid_from = datetime.datetime.now().replace(microsecond=0) if valid_from is None \
+        else pd.Timestamp(valid_from).to_pydatetime()
+
+    # released by the end of the transaction
+    await conn.execute("SELECT pg_advisory_xact_lock($1)", DERIVED_RATIO_LOCK_KEY)
+
+    if full:
+        await conn.execute(get_statement("queue_all_shares_for_derived_ratios"))
+
+    set_queued = {tuple(each_record) for each_record in await conn.fetch(get_statement("claim_derived_ratio_queue"))}
+
+    if not set_queued:
+        return {table_name: (0, 0) for table_name in derived_ratio_statements}
+
+    # a share queued with all years covers its single years
+    set_all_years = {share_id for share_id, year in set_queued if year is None}
+    list_queued = [(share_id, year) for share_id, year in set_queued if year is None or share_id not in set_all_years]
+
+    share_ids = [share_id for share_id, year in list_queued]
+    years = [year for share_id, year in list_queued]
+
+    dict_results = {}
+
+    for table_name, statement_name in derived_ratio_statements.items():
+        dict_results[table_name] = tuple(await conn.fetchrow(get_statement(statement_name), share_ids, years,
+                                                             valid_from, VALID_TO_OPEN_END))
+
+    return dict_results
+
+
+async def refresh_derived_ratios(db_connection, valid_from=None, full=False):
+    """
+    Recompute the derived ratios (PERs, dividendReturns) of all queued share-years in one transaction
+    :param db_connection: asyncpg connection or pool
+    :param valid_from: point in time the new versions are valid from, defaults to now
+    :param full: recompute the ratios of all shares instead of the queued share-years
+    :return: dictionary derived table name -> tuple (number of closed versions, number of new versions)
+    """
+
+    async with acquire_connection(db_connection) as conn, conn.transaction():
+        return await process_derived_ratio_queue(conn, valid_from, full)
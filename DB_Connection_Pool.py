@@ -0,0 +1,336 @@
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.extensions
+"""
+    This python file implements a thread-safe pool of reusable connections to the PostgreSQL database.
+    Connections are borrowed from the pool, checked for health on checkout and returned afterwards,
+    so the expensive connection setup to the database has to be paid only once per connection.
+"""
+
+
+class PoolError(psycopg2.Error):
+    """
+    Raised in case no connection can be provided by the pool
+    """
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections with min/max size, idle eviction and health checks on checkout
+    """
+
+    def __init__(self, connection_params, min_size=1, max_size=5, max_idle_time=300.0,
+                 health_check_interval=30.0, checkout_timeout=10.0):
+        """
+        Create the pool and open the minimum number of connections
+        :param connection_params: dictionary of keyword arguments passed to psycopg2.connect
+        :param min_size: number of connections which are kept open all the time
+        :param max_size: maximum number of connections open at the same time
+        :param max_idle_time: seconds after which an unused connection above min_size gets closed
+        :param health_check_interval: seconds a connection may idle before it gets pinged on checkout
+        :param checkout_timeout: default seconds to wait for a free connection before a PoolError is raised
+        """
+
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes have to satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self.connection_params = dict(connection_params)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        # list of tuples (connection, timestamp of return) for all connections ready to be borrowed
+        self._idle_connections = []
+
+        # set of ids of all connections currently borrowed
+        self._used_connections = set()
+
+        # number of open connections (idle and used)
+        self._number_of_connections = 0
+
+        self._closed = False
+        self._condition = threading.Condition(threading.RLock())
+
+        # open the minimum number of connections right away, so errors surface immediately
+        try:
+            for i in range(self.min_size):
+                self._idle_connections.append((self._connect(), time.monotonic()))
+                self._number_of_connections += 1
+        except BaseException:
+            self.close_all()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
+
+    def _connect(self):
+        """
+        Open a new connection to the database
+        :return: psycopg2 connection
+        """
+        conn = psycopg2.connect(**self.connection_params)
+        conn.set_client_encoding('UTF-8')
+
+        return conn
+
+    def _is_connection_healthy(self, conn, idle_since):
+        """
+        Check whether a connection can still be used
+        :param conn: psycopg2 connection to be checked
+        :param idle_since: timestamp (time.monotonic) the connection has been returned to the pool
+        :return: True or False, depending on the health of the connection
+        """
+
+        if conn.closed:
+            return False
+
+        # ping only connections that have been idle for a while, otherwise the check would cost a round trip each time
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+
+        try:
+            sql_cursor = conn.cursor()
+            sql_cursor.execute('SELECT 1')
+            sql_cursor.close()
+            conn.rollback()
+            return True
+
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        """
+        Close a connection and ignore any error (e.g. in case the server already dropped it)
+        :param conn: psycopg2 connection
+        :return: None
+        """
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def get_connection(self, timeout=None):
+        """
+        Borrow a healthy connection from the pool, open a new one if required and allowed
+        :param timeout: seconds to wait for a free connection, defaults to checkout_timeout
+        :return: psycopg2 connection
+        """
+
+        if timeout is None:
+            timeout = self.checkout_timeout
+
+        deadline = time.monotonic() + timeout
+
+        while True:
+
+            conn = None
+            idle_since = None
+
+            with self._condition:
+
+                while True:
+
+                    if self._closed:
+                        raise PoolError("The connection pool has been closed")
+
+                    # reuse the most recently returned connection first, as it is most likely to be alive
+                    if self._idle_connections:
+                        conn, idle_since = self._idle_connections.pop()
+                        break
+
+                    # reserve a slot for a new connection in case the maximum is not reached yet
+                    if self._number_of_connections < self.max_size:
+                        self._number_of_connections += 1
+                        break
+
+                    # wait until a connection gets returned
+                    remaining_time = deadline - time.monotonic()
+                    if remaining_time <= 0:
+                        raise PoolError("No connection available within " + str(timeout) + " seconds")
+
+                    self._condition.wait(remaining_time)
+
+            # network round trips (health check, connection setup) happen outside the lock
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    with self._condition:
+                        self._number_of_connections -= 1
+                        self._condition.notify()
+                    raise
+
+            elif not self._is_connection_healthy(conn, idle_since):
+                # replace dead connections silently
+                self._close_quietly(conn)
+                with self._condition:
+                    self._number_of_connections -= 1
+                continue
+
+            with self._condition:
+                self._used_connections.add(id(conn))
+
+            return conn
+
+    def put_connection(self, conn, discard=False):
+        """
+        Return a borrowed connection to the pool
+        :param conn: psycopg2 connection borrowed via get_connection
+        :param discard: close the connection instead of keeping it in the pool
+        :return: None
+        """
+
+        with self._condition:
+
+            if id(conn) not in self._used_connections:
+                raise PoolError("The connection does not belong to this pool")
+
+            self._used_connections.remove(id(conn))
+
+        # never keep connections with an open transaction, they would leak state to the next borrower
+        # the rollback needs a round trip to the server, so it is done without blocking the other threads
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._condition:
+
+            # the pool may have been closed during the rollback
+            discard = discard or conn.closed or self._closed
+
+            if discard:
+                self._number_of_connections -= 1
+            else:
+                self._idle_connections.append((conn, time.monotonic()))
+
+            list_evicted = self._remove_evictable_connections()
+
+            self._condition.notify()
+
+        if discard:
+            self._close_quietly(conn)
+
+        for each_conn in list_evicted:
+            self._close_quietly(each_conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager borrowing a connection and returning it afterwards
+        In case of an error inside the block, the transaction gets rolled back
+        :param timeout: seconds to wait for a free connection, defaults to checkout_timeout
+        :return: psycopg2 connection
+        """
+
+        conn = self.get_connection(timeout)
+        discard = False
+
+        try:
+            yield conn
+
+        except psycopg2.OperationalError:
+            # connection is most likely broken, do not return it to the pool
+            discard = True
+            raise
+
+        finally:
+            self.put_connection(conn, discard=discard)
+
+    @contextmanager
+    def cursor(self, timeout=None):
+        """
+        Context manager borrowing a connection and providing a cursor on it
+        :param timeout: seconds to wait for a free connection, defaults to checkout_timeout
+        :return: psycopg2 cursor
+        """
+
+        with self.connection(timeout) as conn:
+            sql_cursor = conn.cursor()
+            try:
+                yield sql_cursor
+            finally:
+                sql_cursor.close()
+
+    def _remove_evictable_connections(self):
+        """
+        Remove all connections idling longer than max_idle_time from the pool, while keeping at least min_size
+        connections open, the caller has to hold the lock and to close the removed connections after releasing it
+        :return: list of removed connections
+        """
+
+        now = time.monotonic()
+        list_evicted = []
+        list_remaining = []
+
+        # idle list is ordered by return time, so the oldest connections get evicted first
+        for conn, idle_since in self._idle_connections:
+
+            if (now - idle_since > self.max_idle_time and
+                    self._number_of_connections - len(list_evicted) > self.min_size):
+                list_evicted.append(conn)
+            else:
+                list_remaining.append((conn, idle_since))
+
+        self._idle_connections = list_remaining
+        self._number_of_connections -= len(list_evicted)
+
+        return list_evicted
+
+    def evict_idle_connections(self):
+        """
+        Close all connections idling longer than max_idle_time, while keeping at least min_size connections open
+        :return: number of closed connections
+        """
+
+        with self._condition:
+            list_evicted = self._remove_evictable_connections()
+
+        # closing sends a terminate message to the server, so it is done without blocking the other threads
+        for conn in list_evicted:
+            self._close_quietly(conn)
+
+        return len(list_evicted)
+
+    def close_all(self):
+        """
+        Close all idle connections and refuse further checkouts
+        Borrowed connections are closed as soon as they are returned
+        :return: None
+        """
+
+        with self._condition:
+            self._closed = True
+
+            list_idle = [conn for conn, idle_since in self._idle_connections]
+
+            self._number_of_connections -= len(self._idle_connections)
+            self._idle_connections = []
+
+            self._condition.notify_all()
+
+        for conn in list_idle:
+            self._close_quietly(conn)
+
+    def is_closed(self):
+        return self._closed
+
+    def get_status(self):
+        """
+        :return: dictionary with the number of open, idle and used connections
+        """
+        with self._condition:
+            return {"open": self._number_of_connections,
+                    "idle": len(self._idle_connections),
+                    "used": len(self._used_connections)}
@@ -0,0 +1,422 @@
+import bisect
+import datetime
+import functools
+import inspect
+import json
+import re
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+import DB_Communication
+"""
+    This python file implements the timing instrumentation of the database access.
+    While enabled, every function of DB_Communication and every statement executed through the statement registry
+    is wrapped: the latency (as histogram), the number of rows, the estimated bytes of the results and the errors are
+    recorded per function, per statement and per table. The wrappers are only installed while the instrumentation
+    is enabled, so it costs nothing when disabled.
+
+    e.g. enable()
+         ...
+         dump_json("./query_statistics.json")
+"""
+
+# upper bounds of the latency buckets in seconds, the last bucket takes all slower calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, float("inf"))
+
+# number of rows (or values) measured to estimate the size of a result
+SIZE_SAMPLE = 100
+
+# relations named in a statement, e.g. FROM "data"."ROAs" or JOIN entities.shares, only schema qualified names are
+# matched, so aliases of the queries (e.g. EXTRACT(YEAR FROM price.valid_from)) are not taken for tables
+TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+(?:ONLY\s+)?"?(?:data|entities|param|calc|public)"?\.'
+                           r'("[^"]+"|[A-Za-z_][A-Za-z_0-9]*)', re.IGNORECASE)
+
+
+class CallStatistics:
+    """
+    Counters and latency histogram of one function, statement or table
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, duration, rows=0, number_of_bytes=0, is_error=False):
+        self.calls += 1
+        self.errors += is_error
+        self.rows += max(rows, 0)
+        self.bytes += number_of_bytes
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+
+    def get_percentile(self, percentile):
+        """
+        :param percentile: number between 0 and 100
+        :return: upper bound of the bucket containing the percentile (the maximum for the last bucket)
+        """
+
+        if self.calls == 0:
+            return 0.0
+
+        threshold = self.calls * percentile / 100.0
+        number_of_calls = 0
+
+        for upper_bound, count in zip(LATENCY_BUCKETS, self.histogram):
+            number_of_calls += count
+            if number_of_calls >= threshold:
+                return min(upper_bound, self.max_time)
+
+        return self.max_time
+
+    def to_dict(self):
+        return {"calls": self.calls,
+                "errors": self.errors,
+                "rows": self.rows,
+                "bytes": self.bytes,
+                "total_time": self.total_time,
+                "mean_time": self.total_time / self.calls if self.calls else 0.0,
+                "p50_time": self.get_percentile(50),
+                "p95_time": self.get_percentile(95),
+                "max_time": self.max_time,
+                "histogram": [[upper_bound if upper_bound != float("inf") else None, count]
+                              for upper_bound, count in zip(LATENCY_BUCKETS, self.histogram)]}
+
+
+def estimate_size(value):
+    """
+    Estimate the size of a result in bytes, large results are measured by a sample of their rows
+    :param value: result of a function (data frame, array, list of rows, dictionary, ...)
+    :return: number of bytes
+    """
+
+    if value is None:
+        return 0
+
+    if isinstance(value, pd.DataFrame):
+        number_of_bytes = int(value.memory_usage(index=False, deep=False).sum())
+
+        # strings are referenced by object columns, their size is estimated by a sample
+        for column in value.columns[(value.dtypes == object).to_numpy()]:
+            sample = value[column].iloc[:SIZE_SAMPLE]
+            if len(sample):
+                number_of_bytes += int(sum(map(sys.getsizeof, sample)) * len(value) / len(sample))
+
+        return number_of_bytes
+
+    if isinstance(value, (np.ndarray, pd.Series)):
+        return int(value.nbytes)
+
+    if isinstance(value, (list, tuple, set)):
+        sample = list(value)[:SIZE_SAMPLE] if not isinstance(value, list) else value[:SIZE_SAMPLE]
+        if not sample:
+            return 0
+        return int(sum(estimate_size(each_value) if isinstance(each_value, (list, tuple)) and each_value is not value
+                       else sys.getsizeof(each_value) for each_value in sample) * len(value) / len(sample))
+
+    if isinstance(value, dict):
+        return sum(sys.getsizeof(key) + estimate_size(each_value) for key, each_value in value.items())
+
+    return sys.getsizeof(value)
+
+
+def get_table_names(query_string):
+    """
+    :param query_string: rendered query
+    :return: sorted list of the tables named in the query (without schema)
+    """
+    return sorted({match.strip('"') for match in TABLE_PATTERN.findall(query_string)})
+
+
+class Instrumentation:
+    """
+    Collects the statistics of the wrapped functions and statements
+    """
+
+    def __init__(self, module=DB_Communication, statement_registry=None):
+        """
+        :param module: module whose functions are wrapped
+        :param statement_registry: StatementRegistry whose statements are recorded, defaults to the module's
+        """
+
+        self.module = module
+        self.statement_registry = module.statement_registry if statement_registry is None else statement_registry
+
+        self.enabled = False
+        self.enabled_at = None
+
+        self._lock = threading.Lock()
+        self._functions = {}
+        self._statements = {}
+        self._tables = {}
+
+        # name of the statement -> tables named in it, the statements never change after their registration
+        self._statement_tables = {}
+
+        # original functions of the module, restored by disable
+        self._original_functions = {}
+
+        # calls of wrapped functions running in the current thread, only the outermost call attributes its bytes
+        # to the tables, so nested calls are not counted twice
+        self._local = threading.local()
+
+    def get_instrumented_functions(self):
+        """
+        :return: dictionary name -> function of all public functions defined in the module, except generators
+        """
+
+        # generators return before their statements run, private helpers are timed as part of their callers
+        return {name: function for name, function in inspect.getmembers(self.module, inspect.isfunction)
+                if function.__module__ == self.module.__name__ and not name.startswith("_")
+                and not inspect.isgeneratorfunction(function)}
+
+    def enable(self):
+        """
+        Install the wrappers, the statistics collected before are kept
+        :return: None
+        """
+
+        with self._lock:
+            if self.enabled:
+                return
+
+            self._original_functions = self.get_instrumented_functions()
+
+            for name, function in self._original_functions.items():
+                setattr(self.module, name, self.wrap_function(name, function))
+
+            # an attribute of the instance takes precedence over the method of the class
+            original_execute = self.statement_registry.execute
+            self.statement_registry.execute = self.wrap_execute(original_execute)
+
+            self.enabled = True
+            self.enabled_at = datetime.datetime.now()
+
+    def disable(self):
+        """
+        Restore the original functions, the statistics are kept
+        :return: None
+        """
+
+        with self._lock:
+            if not self.enabled:
+                return
+
+            for name, function in self._original_functions.items():
+                setattr(self.module, name, function)
+
+            del self.statement_registry.execute
+
+            self._original_functions = {}
+            self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._functions = {}
+            self._statements = {}
+            self._tables = {}
+
+    def _get_call_stack(self):
+        call_stack = getattr(self._local, "call_stack", None)
+
+        if call_stack is None:
+            call_stack = self._local.call_stack = []
+
+        return call_stack
+
+    def wrap_function(self, name, function):
+        """
+        :param name: name of the function in the module
+        :param function: original function
+        :return: function recording every call
+        """
+
+        @functools.wraps(function)
+        def instrumented_function(*args, **kwargs):
+
+            call_stack = self._get_call_stack()
+
+            # tables and rows of the statements executed during the call
+            call_tables = {}
+            call_stack.append(call_tables)
+
+            is_error = False
+            result = None
+            start_time = time.perf_counter()
+
+            try:
+                result = function(*args, **kwargs)
+                return result
+
+            except BaseException:
+                is_error = True
+                raise
+
+            finally:
+                duration = time.perf_counter() - start_time
+                call_stack.pop()
+
+                number_of_bytes = 0 if is_error else estimate_size(result)
+                number_of_rows = len(result) if isinstance(result, (pd.DataFrame, list, dict, set)) else 0
+
+                with self._lock:
+                    self._functions.setdefault(name, CallStatistics()).add(duration, number_of_rows,
+                                                                           number_of_bytes, is_error)
+
+                    # the bytes are attributed to the tables by their share of the rows
+                    if not call_stack and call_tables and number_of_bytes:
+                        total_rows = sum(call_tables.values())
+                        for table_name, table_rows in call_tables.items():
+                            share = table_rows / total_rows if total_rows else 1.0 / len(call_tables)
+                            self._tables.setdefault(table_name, CallStatistics()).bytes += \
+                                int(number_of_bytes * share)
+
+                # nested calls pass the statements on to the calling function
+                if call_stack:
+                    for table_name, table_rows in call_tables.items():
+                        call_stack[-1][table_name] = call_stack[-1].get(table_name, 0) + table_rows
+
+        return instrumented_function
+
+    def get_statement_tables(self, sql_cursor, name, identifiers):
+        """
+        :param sql_cursor: psycopg2 cursor used to render composed statements
+        :param name: name of the registered statement
+        :param identifiers: identifiers composed into the statement
+        :return: list of the tables named in the statement
+        """
+
+        key = (name, None if not identifiers else repr(sorted(identifiers.items())))
+
+        list_tables = self._statement_tables.get(key)
+
+        if list_tables is None:
+            list_tables = get_table_names(self.statement_registry.get_query_string(sql_cursor, name, identifiers))
+            self._statement_tables[key] = list_tables
+
+        return list_tables
+
+    def wrap_execute(self, execute):
+        """
+        :param execute: original execute method of the statement registry
+        :return: function recording every statement
+        """
+
+        @functools.wraps(execute)
+        def instrumented_execute(sql_cursor, name, params=None, identifiers=None):
+
+            is_error = False
+            start_time = time.perf_counter()
+
+            try:
+                return execute(sql_cursor, name, params, identifiers)
+
+            except BaseException:
+                is_error = True
+                raise
+
+            finally:
+                duration = time.perf_counter() - start_time
+
+                # the number of rows returned or changed, the result is not fetched yet
+                number_of_rows = 0 if is_error else sql_cursor.rowcount
+
+                try:
+                    list_tables = self.get_statement_tables(sql_cursor, name, identifiers)
+                except (KeyError, ValueError):
+                    list_tables = []
+
+                # same name as in the statistics of the statement registry
+                statement_name = name if not identifiers else \
+                    name + "[" + ",".join(key + "=" + str(value) for key, value in sorted(identifiers.items())) + "]"
+
+                with self._lock:
+                    self._statements.setdefault(statement_name, CallStatistics()).add(duration, number_of_rows,
+                                                                                      0, is_error)
+                    for table_name in list_tables:
+                        self._tables.setdefault(table_name, CallStatistics()).add(duration, number_of_rows, 0,
+                                                                                  is_error)
+
+                call_stack = self._get_call_stack()
+                if call_stack:
+                    for table_name in list_tables:
+                        call_stack[-1][table_name] = call_stack[-1].get(table_name, 0) + max(number_of_rows, 0)
+
+        return instrumented_execute
+
+    def get_statistics(self):
+        """
+        :return: dictionary with the statistics per function, statement and table (sorted by total time descending)
+        """
+
+        def to_sorted_dict(dict_statistics):
+            return {name: statistics.to_dict() for name, statistics
+                    in sorted(dict_statistics.items(), key=lambda x: x[1].total_time, reverse=True)}
+
+        with self._lock:
+            return {"enabled": self.enabled,
+                    "enabled_at": None if self.enabled_at is None else self.enabled_at.isoformat(),
+                    "created_at": datetime.datetime.now().isoformat(),
+                    "functions": to_sorted_dict(self._functions),
+                    "statements": to_sorted_dict(self._statements),
+                    "tables": to_sorted_dict(self._tables)}
+
+    def get_data_frame(self, kind="functions"):
+        """
+        :param kind: functions, statements or tables
+        :return: data frame with one row per function (statement, table) without the histograms
+        """
+
+        dict_statistics = self.get_statistics()[kind]
+
+        df_statistics = pd.DataFrame.from_records([dict(name=name, **statistics)
+                                                   for name, statistics in dict_statistics.items()],
+                                                  columns=["name", "calls", "errors", "rows", "bytes", "total_time",
+                                                           "mean_time", "p50_time", "p95_time", "max_time"])
+
+        return df_statistics
+
+    def dump_json(self, file_path):
+        """
+        Write the statistics including the histograms to a JSON file
+        :param file_path: path of the file
+        :return: None
+        """
+
+        with open(file_path, 'w', encoding='utf-8') as F:
+            json.dump(self.get_statistics(), F, indent=1)
+
+
+# instrumentation of DB_Communication, disabled by default
+instrumentation = Instrumentation()
+
+
+def enable():
+    instrumentation.enable()
+
+
+def disable():
+    instrumentation.disable()
+
+
+def is_enabled():
+    return instrumentation.enabled
+
+
+def reset():
+    instrumentation.reset()
+
+
+def get_statistics():
+    return instrumentation.get_statistics()
+
+
+def dump_json(file_path):
+    instrumentation.dump_json(file_path)
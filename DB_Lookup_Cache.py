@@ -0,0 +1,183 @@
+import select
+import threading
+import time
+from collections import OrderedDict
+import psycopg2
+import psycopg2.extensions
+"""
+    This python file implements a process-wide cache for lookup tables (param.* and entities.*).
+    Entries expire after a TTL and are evicted least recently used first. In addition, a listener thread
+    receives the notifications sent by the triggers of ./data/sql/migrations/0004_notify_table_changed.sql
+    and invalidates all entries depending on a changed table immediately.
+"""
+
+# channel used by the triggers to notify about changed tables, payload is schema.table
+NOTIFY_CHANNEL = "sharetool_table_changed"
+
+
+class LookupCache:
+    """
+    Thread-safe cache with TTL and LRU eviction, entries are invalidated by the tables they depend on
+    """
+
+    def __init__(self, ttl=600.0, max_entries=32):
+        """
+        :param ttl: seconds an entry stays valid, None disables the expiry
+        :param max_entries: maximum number of entries, the least recently used entry gets evicted first
+        """
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # key -> tuple (value, timestamp of expiry, set of tables the value depends on)
+        self._entries = OrderedDict()
+
+        # table name -> number of invalidations, allows to detect changes while a value is being loaded
+        self._table_versions = {}
+
+        # number of complete invalidations, changes the version of all tables (including tables never seen before)
+        self._generation = 0
+
+        self._lock = threading.Lock()
+
+    def get(self, key, loader, depends_on):
+        """
+        Get a value from the cache, load it in case it is missing or expired
+        :param key: key of the entry
+        :param loader: function without parameters returning the value
+        :param depends_on: iterable of table names, a change of one of them invalidates the entry
+        :return: cached or freshly loaded value
+        """
+
+        depends_on = frozenset(depends_on)
+
+        with self._lock:
+
+            if key in self._entries:
+                value, expires_at, tables = self._entries[key]
+
+                if expires_at is None or time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    return value
+
+                del self._entries[key]
+
+            versions_before = self._get_versions(depends_on)
+
+        # load outside the lock, so other entries stay accessible during the round trip
+        value = loader()
+
+        with self._lock:
+
+            # store the value only if none of its tables changed in the meantime, it might be stale otherwise
+            if self._get_versions(depends_on) == versions_before:
+                expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+                self._entries[key] = (value, expires_at, depends_on)
+                self._entries.move_to_end(key)
+
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return value
+
+    def _get_versions(self, table_names):
+        return tuple(self._get_version(each_table) for each_table in sorted(table_names))
+
+    def _get_version(self, table_name):
+        # both counters only increase, so their sum changes with every invalidation of the table
+        return self._generation + self._table_versions.get(table_name, 0)
+
+    def get_table_version(self, table_name):
+        """
+        :param table_name: name of table
+        :return: counter which increases with every invalidation of the table
+        """
+        with self._lock:
+            return self._get_version(table_name)
+
+    def invalidate_table(self, table_name):
+        """
+        Remove all entries depending on the given table
+        :param table_name: name of the changed table
+        :return: None
+        """
+
+        with self._lock:
+            self._table_versions[table_name] = self._table_versions.get(table_name, 0) + 1
+
+            for key in [key for key, entry in self._entries.items() if table_name in entry[2]]:
+                del self._entries[key]
+
+    def invalidate_all(self):
+        """
+        Remove all entries, e.g. in case notifications might have been missed
+        :return: None
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+class ChangeListener(threading.Thread):
+    """
+    Background thread listening for table change notifications of the database and invalidating the cache
+    """
+
+    def __init__(self, connection_params, cache, channel=NOTIFY_CHANNEL, poll_interval=1.0, retry_interval=5.0):
+        """
+        :param connection_params: dictionary of keyword arguments passed to psycopg2.connect
+        :param cache: LookupCache to be invalidated
+        :param channel: name of the notification channel
+        :param poll_interval: seconds between checks whether the listener has been stopped
+        :param retry_interval: seconds to wait before reconnecting after the connection got lost
+        """
+
+        super().__init__(name="ShareTool-ChangeListener", daemon=True)
+
+        self.connection_params = dict(connection_params)
+        self.cache = cache
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+
+        while not self._stop_event.is_set():
+
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.connection_params)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute("LISTEN " + self.channel)
+
+                # notifications sent while not listening are lost, so nothing cached before can be trusted
+                self.cache.invalidate_all()
+
+                while not self._stop_event.is_set():
+
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+
+                    conn.poll()
+
+                    while conn.notifies:
+                        notification = conn.notifies.pop(0)
+
+                        # payload is schema.table
+                        self.cache.invalidate_table(notification.payload.split('.')[-1])
+
+            except (psycopg2.Error, OSError):
+                self._stop_event.wait(self.retry_interval)
+
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
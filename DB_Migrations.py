@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+import psycopg2
+import DB_Communication
+"""
+    This python file implements incremental migrations of the database structure.
+    Migrations are .sql files in ./data/sql/migrations/, applied in the order of their names
+    (e.g. 0001_index_data_tables.sql). The checksum of every applied file is stored in public.schema_migrations,
+    so only new or changed files are executed. Each migration runs in its own transaction together with its
+    bookkeeping, a failing migration leaves neither changes nor a record behind. Changed files are executed
+    again, so migrations should be written repeatable (e.g. CREATE INDEX IF NOT EXISTS).
+
+    e.g. python DB_Migrations.py --dry-run
+"""
+
+# directory containing the migration files
+MIGRATIONS_DIRECTORY = './data/sql/migrations/'
+
+# key of the advisory lock, prevents two processes from migrating the same database at the same time
+MIGRATION_LOCK_KEY = 7265746
+
+# states of a migration in the plan
+MIGRATION_NEW = "new"
+MIGRATION_CHANGED = "changed"
+MIGRATION_APPLIED = "applied"
+
+
+def calculate_checksum(sql_text):
+    """
+    :param sql_text: content of a migration file
+    :return: sha256 of the content as hex string, independent of the line endings of the checkout
+    """
+
+    return hashlib.sha256(sql_text.replace('\r\n', '\n').encode('utf-8')).hexdigest()
+
+
+def read_migration_files(directory=MIGRATIONS_DIRECTORY):
+    """
+    :param directory: directory containing the migration files
+    :return: list of tuples (name, sql text) in order of the names, empty in case the directory does not exist
+    """
+
+    if not os.path.isdir(directory):
+        return []
+
+    list_migrations = []
+
+    for each_file in sorted(os.listdir(directory)):
+        if each_file.endswith('.sql'):
+            with open(os.path.join(directory, each_file), 'r', encoding='utf-8') as sql_file:
+                list_migrations.append((each_file, sql_file.read()))
+
+    return list_migrations
+
+
+def get_applied_migrations(sql_cursor):
+    """
+    Read the bookkeeping table, it gets created in case it does not exist yet
+    :param sql_cursor: psycopg2 cursor
+    :return: dictionary name -> tuple (checksum, applied_at, execution time in seconds)
+    """
+
+    DB_Communication.statement_registry.execute(sql_cursor, "create_schema_migrations")
+    DB_Communication.statement_registry.execute(sql_cursor, "get_schema_migrations")
+
+    return {name: (checksum, applied_at, execution_time)
+            for name, checksum, applied_at, execution_time in sql_cursor.fetchall()}
+
+
+def create_migration_plan(sql_cursor, directory=MIGRATIONS_DIRECTORY):
+    """
+    Compare the migration files with the migrations applied to the database
+    :param sql_cursor: psycopg2 cursor
+    :param directory: directory containing the migration files
+    :return: list of tuples (name, sql text, checksum, state, execution time of the last application or None)
+    """
+
+    dict_applied = get_applied_migrations(sql_cursor)
+
+    list_plan = []
+
+    for name, sql_text in read_migration_files(directory):
+
+        checksum = calculate_checksum(sql_text)
+        applied_checksum, applied_at, execution_time = dict_applied.get(name, (None, None, None))
+
+        if applied_checksum is None:
+            state = MIGRATION_NEW
+        elif applied_checksum != checksum:
+            state = MIGRATION_CHANGED
+        else:
+            state = MIGRATION_APPLIED
+
+        list_plan.append((name, sql_text, checksum, state, execution_time))
+
+    return list_plan
+
+
+def print_migration_plan(list_plan, file=sys.stdout):
+    """
+    Print the state of every migration, with the duration of its last application
+    :param list_plan: plan as created by create_migration_plan
+    :param file: stream the plan is written to
+    :return: None
+    """
+
+    for name, sql_text, checksum, state, execution_time in list_plan:
+        print("{:<8} {:<50} {} {:>12}".format(
+            state, name, checksum[:12],
+            "" if execution_time is None else "{:.1f} ms".format(execution_time * 1000)), file=file)
+
+    number_pending = sum(state != MIGRATION_APPLIED for name, sql_text, checksum, state, execution_time in list_plan)
+    print(str(number_pending) + " of " + str(len(list_plan)) + " migrations pending", file=file)
+
+
+def apply_migrations(db_connection, directory=MIGRATIONS_DIRECTORY, dry_run=False, file=sys.stdout):
+    """
+    Apply all new and changed migrations, each in its own transaction
+    :param db_connection: psycopg2 connection
+    :param directory: directory containing the migration files
+    :param dry_run: only print the plan, nothing is executed
+    :param file: stream the plan and the timings are written to
+    :return: list of tuples (name, execution time in seconds) of the applied migrations
+    """
+
+    list_applied = []
+
+    with db_connection.cursor() as sql_cursor:
+
+        # held for the session, the migrations are committed one by one while it is held
+        sql_cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+
+        try:
+            list_plan = create_migration_plan(sql_cursor, directory)
+            db_connection.commit()
+
+            print_migration_plan(list_plan, file)
+
+            if dry_run:
+                return list_applied
+
+            for name, sql_text, checksum, state, execution_time in list_plan:
+
+                if state == MIGRATION_APPLIED:
+                    continue
+
+                try:
+                    start_time = time.perf_counter()
+                    sql_cursor.execute(sql_text)
+                    execution_time = time.perf_counter() - start_time
+
+                    DB_Communication.statement_registry.execute(sql_cursor, "upsert_schema_migration",
+                                                                (name, checksum, execution_time))
+                    db_connection.commit()
+
+                except psycopg2.Error:
+                    db_connection.rollback()
+                    print("failed   " + name, file=file)
+                    raise
+
+                list_applied.append((name, execution_time))
+                print("{:<8} {:<50} {:>25}".format(MIGRATION_APPLIED, name,
+                                                   "{:.1f} ms".format(execution_time * 1000)), file=file)
+
+        finally:
+            # a failed statement aborts the transaction, the lock can only be released after the rollback
+            db_connection.rollback()
+            sql_cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+            db_connection.commit()
+
+        # the structure might have changed, the cached metadata has to be reloaded
+        if list_applied:
+            DB_Communication.reload_schema_metadata(sql_cursor)
+            db_connection.commit()
+
+    return list_applied
+
+
+def parse_arguments(list_arguments=None):
+    """
+    Parse the arguments of the command line
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description="Apply new and changed migrations to the database.")
+
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan, nothing is executed")
+    parser.add_argument("--directory", default=MIGRATIONS_DIRECTORY,
+                        help="directory containing the migration files (default: " + MIGRATIONS_DIRECTORY + ")")
+    parser.add_argument("--db-name", default=None, help="name of the database, defaults to the config file")
+    parser.add_argument("--host", default=None, help="host of the database, defaults to the config file")
+    parser.add_argument("--user", default=None, help="user of the database, defaults to the config file")
+    parser.add_argument("--password", default=None, help="password of the user, defaults to the config file")
+
+    return parser.parse_args(list_arguments)
+
+
+def main(list_arguments=None):
+    """
+    Entry point of the command line tool
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: exit code, 0 in case of success, 2 in case of an error
+    """
+
+    arguments = parse_arguments(list_arguments)
+
+    db_pool = DB_Communication.create_connection_pool(arguments.db_name, arguments.host, arguments.user,
+                                                      arguments.password, min_size=1, max_size=1)
+
+    if db_pool is None:
+        print("Error while connecting to the database", file=sys.stderr)
+        return 2
+
+    start_time = time.perf_counter()
+
+    try:
+        with db_pool, db_pool.connection() as db_connection:
+            list_applied = apply_migrations(db_connection, arguments.directory, arguments.dry_run)
+
+    except (OSError, psycopg2.Error) as error:
+        print("Error while migrating", error, sep="\n", file=sys.stderr)
+        return 2
+
+    if not arguments.dry_run:
+        print(str(len(list_applied)) + " migrations applied in " +
+              "{:.1f} ms".format((time.perf_counter() - start_time) * 1000) + ".")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import threading
+"""
+    This python file implements a cache of the database's schema metadata.
+    Column names, types and order of all tables are read once from information_schema,
+    so inserts do not need additional round trips to find out the structure of a table.
+"""
+
+
+class SchemaCatalog:
+    """
+    Cache of column names, types and order for every table of the schemas data, entities and param
+    """
+
+    def __init__(self, insert_statement_builder, catalog_query):
+        """
+        Create an empty catalog, it gets loaded on first access
+        :param insert_statement_builder: function(table_name, column_names, returning, on_conflict_constraint)
+                                         creating an INSERT statement
+        :param catalog_query: query returning schema, table, column name and data type of all columns in column order
+        """
+
+        self.insert_statement_builder = insert_statement_builder
+        self.catalog_query = catalog_query
+
+        # dictionary table name -> list of tuples (column name, data type) in column order
+        self._columns = {}
+
+        # dictionary table name -> name of the schema containing the table
+        self._schemas = {}
+
+        # memoized INSERT statements, key is (table name, exclude_id, returning, on_conflict_constraint)
+        self._insert_statements = {}
+
+        self._is_loaded = False
+        self._lock = threading.RLock()
+
+    def is_loaded(self):
+        return self._is_loaded
+
+    def load(self, sql_cursor):
+        """
+        Read the metadata of all tables from the database
+        :param sql_cursor: psycopg2 cursor
+        :return: None
+        """
+
+        sql_cursor.execute(self.catalog_query)
+
+        self.load_rows(sql_cursor.fetchall())
+
+    def load_rows(self, list_rows):
+        """
+        Fill the catalog with the result of catalog_query, e.g. fetched by a driver other than psycopg2
+        :param list_rows: rows of (schema, table, column name, data type) in column order
+        :return: None
+        """
+
+        dict_columns = {}
+        dict_schemas = {}
+
+        for table_schema, table_name, column_name, data_type in list_rows:
+            dict_columns.setdefault(table_name, []).append((column_name, data_type))
+            dict_schemas[table_name] = table_schema
+
+        with self._lock:
+            self._columns = dict_columns
+            self._schemas = dict_schemas
+            self._insert_statements = {}
+            self._is_loaded = True
+
+    def invalidate(self, table_name=None):
+        """
+        Drop cached metadata, e.g. after a migration changed the schema
+        :param table_name: table to be invalidated, all tables in case of None
+        :return: None
+        """
+
+        with self._lock:
+            if table_name is None:
+                self._columns = {}
+                self._schemas = {}
+                self._insert_statements = {}
+                self._is_loaded = False
+
+            else:
+                self._columns.pop(table_name, None)
+                self._schemas.pop(table_name, None)
+                self._insert_statements = {key: statement for key, statement in self._insert_statements.items()
+                                           if key[0] != table_name}
+
+    def refresh(self, sql_cursor):
+        """
+        Reload the metadata of all tables from the database
+        :param sql_cursor: psycopg2 cursor
+        :return: None
+        """
+        self.invalidate()
+        self.load(sql_cursor)
+
+    def _get_table_columns(self, table_name, sql_cursor=None):
+        """
+        Get the cached columns of a table, (re)load the catalog in case the table is not known yet
+        :param table_name: name of table
+        :param sql_cursor: psycopg2 cursor used for loading, required in case the catalog is not loaded yet
+        :return: list of tuples (column name, data type)
+        """
+
+        with self._lock:
+
+            if table_name not in self._columns and sql_cursor is not None:
+                # tables created after the last load are picked up by one reload
+                self.load(sql_cursor)
+
+            if table_name not in self._columns:
+                raise KeyError("Table " + table_name + " is not known in the schema catalog")
+
+            return self._columns[table_name]
+
+    def get_column_names(self, table_name, sql_cursor=None):
+        """
+        :param table_name: name of table
+        :param sql_cursor: psycopg2 cursor used in case the catalog has to be loaded
+        :return: list of the table's column names in column order (a copy, which can be modified by the caller)
+        """
+        return [column_name for column_name, data_type in self._get_table_columns(table_name, sql_cursor)]
+
+    def get_column_types(self, table_name, sql_cursor=None):
+        """
+        :param table_name: name of table
+        :param sql_cursor: psycopg2 cursor used in case the catalog has to be loaded
+        :return: dictionary column name -> data type of the table
+        """
+        return dict(self._get_table_columns(table_name, sql_cursor))
+
+    def get_schema_name(self, table_name, sql_cursor=None):
+        """
+        :param table_name: name of table
+        :param sql_cursor: psycopg2 cursor used in case the catalog has to be loaded
+        :return: name of the schema containing the table
+        """
+        self._get_table_columns(table_name, sql_cursor)
+        return self._schemas[table_name]
+
+    def get_table_schemas(self):
+        """
+        :return: dictionary table name -> name of the schema containing the table (a copy) of all loaded tables
+        """
+        with self._lock:
+            return dict(self._schemas)
+
+    def get_insert_statement(self, table_name, exclude_id=True, returning=False, on_conflict_constraint=None,
+                             sql_cursor=None):
+        """
+        Get the INSERT statement for all columns of a table, statements are created only once
+        :param table_name: name of table
+        :param exclude_id: leave out the column ID, as it is generated automatically by the database
+        :param returning: indicates whether a returning clause should be included
+        :param on_conflict_constraint: name of a unique constraint, rows violating it are skipped instead of failing
+        :param sql_cursor: psycopg2 cursor used in case the catalog has to be loaded
+        :return: sql statement as a string
+        """
+
+        key = (table_name, exclude_id, returning, on_conflict_constraint)
+
+        with self._lock:
+
+            if key not in self._insert_statements:
+
+                column_names = self.get_column_names(table_name, sql_cursor)
+
+                if exclude_id:
+                    column_names.remove("ID")
+
+                self._insert_statements[key] = self.insert_statement_builder(table_name, column_names, returning,
+                                                                             on_conflict_constraint)
+
+            return self._insert_statements[key]
@@ -0,0 +1,200 @@
+import numbers
+import pandas as pd
+from psycopg2 import sql
+import DB_Communication
+"""
+    This python file implements the screening of all shares by declarative filters.
+    Metric filters (e.g. ROA > 0.08 in each of the latest 3 years) and attribute filters (e.g. sector in ...) are
+    compiled into a single query, every metric filter becomes a grouped common table expression over the current
+    versions of its table joined to the shares. The query is registered by its structure, so screens differing
+    only in their values share one prepared statement.
+
+    e.g. screen_shares(sql_cursor, [MetricFilter("ROAs", ">", 0.08, years=3),
+                                    MetricFilter("leverages", "<", 1.0),
+                                    AttributeFilter("country", ["Germany", "France"])])
+"""
+
+# comparison operators allowed in metric filters (they are composed into the query, so only these are accepted)
+OPERATORS = (">", ">=", "<", "<=", "=", "<>")
+
+# attributes of a share which can be filtered, attribute -> qualified column of the screening query
+ATTRIBUTE_COLUMNS = {
+    "sector": ("sector", "sector_name"),
+    "country": ("country", "country_name"),
+    "category": ("category", "category_name"),
+    "currency": ("currency", "currency_name")
+}
+
+# columns of the result which describe the share, followed by one column per metric filter
+RESULT_COLUMNS = ["share_ID", "isin", "company_name", "sector_name", "country_name", "category_name",
+                  "currency_name"]
+
+
+class MetricFilter:
+    """
+    Condition on the values of a data table, it has to hold in each of the latest years of a share
+    """
+
+    def __init__(self, metric, operator, value, years=1):
+        """
+        :param metric: name of a data table (its first value column) or tuple (table, value column)
+        :param operator: one of OPERATORS
+        :param value: number the values are compared with (in the unit stored, e.g. 0.08 for 8 %)
+        :param years: number of latest consecutive years which have to fulfil the condition,
+                      ignored for tables without year (sharePrices)
+        """
+
+        self.table_name, self.value_column = (metric, None) if isinstance(metric, str) else metric
+
+        if self.table_name not in DB_Communication.data_table_value_columns:
+            raise ValueError("Table " + str(self.table_name) + " is not a data table")
+
+        if self.value_column is None:
+            self.value_column = DB_Communication.data_table_value_columns[self.table_name][0]
+        elif self.value_column not in DB_Communication.data_table_value_columns[self.table_name]:
+            raise ValueError("Column " + str(self.value_column) + " is not a value column of " + self.table_name)
+
+        if operator not in OPERATORS:
+            raise ValueError("Unknown operator " + str(operator))
+
+        if not isinstance(value, numbers.Real) or isinstance(value, bool):
+            raise ValueError("The value of a filter has to be a number")
+
+        if int(years) < 1:
+            raise ValueError("A filter has to cover at least one year")
+
+        self.operator = operator
+        self.value = float(value)
+        self.years = int(years)
+
+    def has_year(self):
+        return self.table_name not in DB_Communication.data_tables_without_year
+
+    def get_column_name(self):
+        """
+        :return: name of the result column holding the latest value of the metric
+        """
+        return self.table_name + "." + self.value_column
+
+    def get_structure(self):
+        """
+        :return: string describing the filter without its values, filters of the same structure share a statement
+        """
+        return self.table_name + "." + self.value_column + self.operator
+
+    def __repr__(self):
+        return "MetricFilter(" + self.get_column_name() + " " + self.operator + " " + str(self.value) + \
+               ", years=" + str(self.years) + ")"
+
+
+class AttributeFilter:
+    """
+    Condition on an attribute of a share, its value has to be one of the given values
+    """
+
+    def __init__(self, attribute, values):
+        """
+        :param attribute: one of ATTRIBUTE_COLUMNS (e.g. sector)
+        :param values: iterable of allowed names (e.g. sector names)
+        """
+
+        if attribute not in ATTRIBUTE_COLUMNS:
+            raise ValueError("Unknown attribute " + str(attribute))
+
+        self.attribute = attribute
+        self.values = [str(each_value) for each_value in values]
+
+    def get_structure(self):
+        return self.attribute
+
+    def __repr__(self):
+        return "AttributeFilter(" + self.attribute + " in " + str(self.values) + ")"
+
+
+def compile_screen(list_filters, year=None):
+    """
+    Compile the filters into one query
+    :param list_filters: list of MetricFilter and AttributeFilter instances, all of them have to be fulfilled
+    :param year: latest year taken into account by the metric filters, all years in case of None
+    :return: tuple (statement name, query as psycopg2.sql.Composable, list of params, list of result columns)
+    """
+
+    list_metric_filters = [each_filter for each_filter in list_filters if isinstance(each_filter, MetricFilter)]
+    list_attribute_filters = [each_filter for each_filter in list_filters
+                              if isinstance(each_filter, AttributeFilter)]
+
+    if len(list_metric_filters) + len(list_attribute_filters) != len(list_filters):
+        raise ValueError("Filters have to be instances of MetricFilter or AttributeFilter")
+
+    year = 2147483647 if year is None else int(year)
+
+    list_ctes = []
+    list_columns = []
+    list_joins = []
+    list_conditions = []
+    list_params = []
+
+    for i, each_filter in enumerate(list_metric_filters):
+
+        alias = sql.Identifier("filter_" + str(i))
+
+        if each_filter.has_year():
+            template = DB_Communication.statement_registry.get_query("screen_metric_filter")
+            list_params += [each_filter.years, each_filter.years, each_filter.value,
+                            DB_Communication.VALID_TO_OPEN_END, year, each_filter.years]
+        else:
+            template = DB_Communication.statement_registry.get_query("screen_metric_filter_without_year")
+            list_params += [each_filter.value, DB_Communication.VALID_TO_OPEN_END]
+
+        subquery = sql.SQL(template).format(
+            table=sql.Identifier(DB_Communication.table_schema_relation[each_filter.table_name],
+                                 each_filter.table_name),
+            value_column=sql.Identifier(each_filter.value_column),
+            operator=sql.SQL(each_filter.operator))
+
+        # materialized, so the condition is not pushed into the grouping, where the planner would underestimate the
+        # number of shares and rescan the subquery per share
+        list_ctes.append(sql.SQL("{} AS MATERIALIZED (\n{}\n)").format(alias, subquery))
+        list_columns.append(sql.SQL(",\n\t{}.value AS {}").format(alias,
+                                                                   sql.Identifier(each_filter.get_column_name())))
+        list_joins.append(sql.SQL("\n\tJOIN {} ON {}.{} = share.{}").format(alias, alias, sql.Identifier("share_ID"),
+                                                                          sql.Identifier("ID")))
+        list_conditions.append(sql.SQL("\n\tAND {}.is_fulfilled").format(alias))
+
+    # the conditions follow the common table expressions in the query, so do their params
+    for each_filter in list_attribute_filters:
+        list_conditions.append(sql.SQL("\n\tAND {} = ANY(%s)").format(
+            sql.Identifier(*ATTRIBUTE_COLUMNS[each_filter.attribute])))
+        list_params.append(each_filter.values)
+
+    filter_ctes = sql.SQL("WITH {}\n").format(sql.SQL(",\n").join(list_ctes)) if list_ctes else sql.SQL("")
+
+    query = sql.SQL(DB_Communication.statement_registry.get_query("screen_shares")).format(
+        filter_ctes=filter_ctes, filter_columns=sql.Composed(list_columns), filter_joins=sql.Composed(list_joins),
+        filter_conditions=sql.Composed(list_conditions))
+
+    statement_name = "screen_shares[" + ",".join(each_filter.get_structure() for each_filter
+                                                 in list_metric_filters + list_attribute_filters) + "]"
+
+    return statement_name, query, list_params, \
+        RESULT_COLUMNS + [each_filter.get_column_name() for each_filter in list_metric_filters]
+
+
+def screen_shares(sql_cursor, list_filters, year=None):
+    """
+    Get all shares fulfilling all filters with one query
+    :param sql_cursor: psycopg2 cursor
+    :param list_filters: list of MetricFilter and AttributeFilter instances
+    :param year: latest year taken into account by the metric filters, all years in case of None
+    :return: data frame with one row per share, the description of the share and the latest value of each metric
+    """
+
+    statement_name, query, list_params, list_columns = compile_screen(list_filters, year)
+
+    # the structure of the filters determines the query, so it is composed and registered only once
+    if not DB_Communication.statement_registry.is_registered(statement_name):
+        DB_Communication.statement_registry.register(statement_name, query)
+
+    DB_Communication.statement_registry.execute(sql_cursor, statement_name, list_params)
+
+    return pd.DataFrame.from_records(sql_cursor.fetchall(), columns=list_columns)
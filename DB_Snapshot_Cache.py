@@ -0,0 +1,521 @@
+import datetime
+import hashlib
+import json
+import os
+import io
+import shutil
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+import DB_Communication
+"""
+    This python file implements a local columnar snapshot of the data schema for offline analytics.
+    Every table of the data schema is stored with all its versions as one .npy file per column, the shares are
+    stored joined with their company, sector, country, category and currency. The files are loaded memory-mapped,
+    so millions of rows are available without copying them and without querying the database.
+    A refresh only transfers the versions changed since the last refresh: the snapshot of the database read by a
+    refresh is kept as watermark, the next refresh looks up the versions inserted, updated or deleted by the
+    transactions not visible in it in public.data_change_log (see migration 0005).
+
+    e.g. refresh_snapshots(db_pool)
+         dict_snapshots = load_snapshots(db_pool)
+         df_roas = dict_snapshots["ROAs"].to_data_frame(current_only=True)
+"""
+
+# directory of the snapshots, every database gets a subdirectory
+SNAPSHOT_DIRECTORY = './data/snapshots/'
+
+# name of the snapshot of the shares including their attributes
+SHARES_SNAPSHOT = "shares"
+
+# dtypes of the columns every data table has, the value columns are stored as float64
+SNAPSHOT_KEY_DTYPES = {"ID": "int32", "share_ID": "int32", "year": "int32", "valid_from": "datetime64[us]",
+                       "valid_to": "datetime64[us]"}
+
+# big-endian dtypes of the columns in the binary COPY format, the value columns are double precision
+BINARY_COPY_DTYPES = {"ID": ">i4", "share_ID": ">i4", "year": ">i4", "valid_from": ">i8", "valid_to": ">i8"}
+
+# first bytes of the binary COPY format
+BINARY_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+# timestamps of the binary COPY format are microseconds since 2000-01-01
+POSTGRES_EPOCH_OFFSET = 946684800000000
+
+# number of versions fetched per query
+SNAPSHOT_BATCH_SIZE = 500000
+
+# generations of a table kept on disk besides the current one, readers may still have them mapped
+KEPT_GENERATIONS = 1
+
+
+class TableSnapshot:
+    """
+    Columns of a snapshot table as (memory-mapped) arrays of equal length
+    """
+
+    def __init__(self, table_name, columns, meta):
+        """
+        :param table_name: name of the table (e.g. ROAs)
+        :param columns: dictionary column name -> array
+        :param meta: dictionary with the watermark, the number of rows and the time of the refresh
+        """
+
+        self.table_name = table_name
+        self.columns = columns
+        self.meta = meta
+
+    def __len__(self):
+        return int(self.meta["rows"])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def refreshed_at(self):
+        return datetime.datetime.fromisoformat(self.meta["refreshed_at"])
+
+    def get_current_mask(self):
+        """
+        :return: boolean array, True for the current versions
+        """
+        return self.columns["valid_to"] == np.datetime64(DB_Communication.VALID_TO_OPEN_END, "us")
+
+    def get_as_of_mask(self, as_of):
+        """
+        :param as_of: point in time (datetime or string)
+        :return: boolean array, True for the versions valid at the point in time
+        """
+
+        as_of = np.datetime64(pd.Timestamp(as_of).to_pydatetime(), "us")
+
+        return (self.columns["valid_from"] <= as_of) & (self.columns["valid_to"] > as_of)
+
+    def to_data_frame(self, as_of=None, current_only=False):
+        """
+        Copy the rows into a data frame
+        :param as_of: only the versions valid at this point in time, all versions in case of None
+        :param current_only: only the current versions
+        :return: data frame with one column per snapshot column
+        """
+
+        if as_of is not None:
+            mask = self.get_as_of_mask(as_of)
+        elif current_only and "valid_to" in self.columns:
+            mask = self.get_current_mask()
+        else:
+            mask = None
+
+        return pd.DataFrame({column: (values if mask is None else values[mask])
+                             for column, values in self.columns.items()})
+
+
+def get_snapshot_directory(db_pool, directory=SNAPSHOT_DIRECTORY):
+    """
+    Every database has a snapshot directory of its own
+    :param db_pool: ConnectionPool of the database
+    :param directory: directory of all snapshots
+    :return: path of the snapshot directory of the database
+    """
+
+    key = json.dumps([db_pool.connection_params.get("host"), db_pool.connection_params.get("dbname")])
+
+    return os.path.join(directory, "snapshot_" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+
+
+def get_snapshot_columns(table_name):
+    """
+    :param table_name: name of a data table
+    :return: list of the columns stored for the table
+    """
+
+    list_key_columns = ["ID", "share_ID"] if table_name in DB_Communication.data_tables_without_year \
+        else ["ID", "share_ID", "year"]
+
+    return list_key_columns + DB_Communication.data_table_value_columns[table_name] + ["valid_from", "valid_to"]
+
+
+def get_column_dtype(column):
+    return SNAPSHOT_KEY_DTYPES.get(column, "float64")
+
+
+def load_table_snapshot(snapshot_directory, table_name, mmap=True):
+    """
+    Load the snapshot of a table
+    :param snapshot_directory: snapshot directory of the database, see get_snapshot_directory
+    :param table_name: name of the table (a data table or shares)
+    :param mmap: map the files read-only instead of reading them into memory
+    :return: TableSnapshot, None in case the table has no snapshot yet
+    """
+
+    table_directory = os.path.join(snapshot_directory, table_name)
+
+    try:
+        with open(os.path.join(table_directory, "meta.json"), 'r', encoding='utf-8') as F:
+            meta = json.load(F)
+
+    except FileNotFoundError:
+        return None
+
+    generation_directory = os.path.join(table_directory, str(meta["generation"]))
+
+    # empty files cannot be mapped, they are read instead
+    mmap_mode = "r" if mmap and meta["rows"] > 0 else None
+
+    columns = {column: np.load(os.path.join(generation_directory, column + ".npy"), mmap_mode=mmap_mode,
+                               allow_pickle=False)
+               for column in meta["columns"]}
+
+    return TableSnapshot(table_name, columns, meta)
+
+
+def save_table_meta(table_directory, meta):
+    """
+    Replace the meta file of a table atomically
+    :param table_directory: directory of the table in the snapshot directory
+    :param meta: dictionary with the generation, the columns, the number of rows and the watermark
+    :return: None
+    """
+
+    meta["refreshed_at"] = datetime.datetime.now().isoformat()
+
+    temporary_path = os.path.join(table_directory, "meta.json.tmp")
+    with open(temporary_path, 'w', encoding='utf-8') as F:
+        json.dump(meta, F, indent=1)
+
+    os.replace(temporary_path, os.path.join(table_directory, "meta.json"))
+
+
+def save_table_snapshot(snapshot_directory, table_name, columns, watermark):
+    """
+    Write the columns of a table as a new generation, the generation gets visible by replacing the meta file
+    atomically, so readers never see partially written files
+    :param snapshot_directory: snapshot directory of the database
+    :param table_name: name of the table
+    :param columns: dictionary column name -> array, all of the same length
+    :param watermark: snapshot of the database the columns were read in (see get_change_watermark)
+    :return: TableSnapshot of the written generation (not mapped)
+    """
+
+    table_directory = os.path.join(snapshot_directory, table_name)
+    os.makedirs(table_directory, exist_ok=True)
+
+    list_generations = sorted(int(each_name) for each_name in os.listdir(table_directory) if each_name.isdigit())
+    generation = list_generations[-1] + 1 if list_generations else 1
+
+    generation_directory = os.path.join(table_directory, str(generation))
+    os.makedirs(generation_directory)
+
+    for column, values in columns.items():
+        np.save(os.path.join(generation_directory, column + ".npy"), np.ascontiguousarray(values),
+                allow_pickle=False)
+
+    meta = {"table": table_name,
+            "generation": generation,
+            "columns": list(columns),
+            "rows": len(next(iter(columns.values()))) if columns else 0,
+            "watermark": watermark}
+
+    save_table_meta(table_directory, meta)
+
+    # older generations are removed, the previous ones may still be mapped by readers
+    for each_generation in list_generations[:len(list_generations) - KEPT_GENERATIONS]:
+        shutil.rmtree(os.path.join(table_directory, str(each_generation)), ignore_errors=True)
+
+    return TableSnapshot(table_name, columns, meta)
+
+
+def get_binary_row_dtype(list_columns):
+    """
+    Every field of a row of the binary COPY format is preceded by its length, a row starts with the number of fields
+    :param list_columns: list of the columns of the rows
+    :return: numpy dtype of a row (big-endian like the COPY format)
+    """
+
+    list_fields = [("number_of_fields", ">i2")]
+
+    for column in list_columns:
+        list_fields += [(column + "_length", ">i4"), (column, BINARY_COPY_DTYPES.get(column, ">f8"))]
+
+    return np.dtype(list_fields)
+
+
+def parse_binary_copy(data, list_columns):
+    """
+    Convert the output of COPY ... TO STDOUT (FORMAT binary) into arrays, the rows have a fixed length, so they
+    are read by numpy at once without parsing every value
+    :param data: bytes of the COPY output
+    :param list_columns: list of the columns of the rows
+    :return: dictionary column name -> array of the column's dtype
+    """
+
+    if not data.startswith(BINARY_COPY_SIGNATURE):
+        raise ValueError("Output of COPY is not in binary format")
+
+    # the header consists of the signature, the flags and the length of the header extension
+    header_extension_length = int(np.frombuffer(data, dtype=">i4", count=1, offset=len(BINARY_COPY_SIGNATURE) + 4)[0])
+    header_length = len(BINARY_COPY_SIGNATURE) + 8 + header_extension_length
+
+    row_dtype = get_binary_row_dtype(list_columns)
+
+    # the rows are followed by a trailer of two bytes
+    number_of_rows, remainder = divmod(len(data) - header_length - 2, row_dtype.itemsize)
+    if remainder:
+        raise ValueError("Rows of the COPY output have different lengths, a column contains NULL")
+
+    array_rows = np.frombuffer(data, dtype=row_dtype, count=number_of_rows, offset=header_length)
+
+    dict_columns = {}
+
+    for column in list_columns:
+        if (array_rows[column + "_length"] != row_dtype[column].itemsize).any():
+            raise ValueError("Column " + column + " contains NULL")
+
+        if column in ("valid_from", "valid_to"):
+            dict_columns[column] = (array_rows[column].astype("int64") + POSTGRES_EPOCH_OFFSET).view("datetime64[us]")
+        else:
+            dict_columns[column] = array_rows[column].astype(get_column_dtype(column))
+
+    return dict_columns
+
+
+def get_change_watermark(sql_cursor, previous_watermark=None):
+    """
+    Get the watermark of the current transaction, it has to run in a repeatable read transaction, so the watermark
+    matches the versions read
+    :param sql_cursor: psycopg2 cursor
+    :param previous_watermark: watermark of the last refresh, None in case there is none
+    :return: tuple (watermark, whether all changes since the previous watermark are still in the change log)
+    """
+
+    DB_Communication.statement_registry.execute(sql_cursor, "get_change_watermark",
+                                                (previous_watermark, previous_watermark))
+    watermark, is_complete = sql_cursor.fetchone()
+
+    return watermark, bool(is_complete)
+
+
+def copy_versions(sql_cursor, table_name, statement_name, params):
+    """
+    Fetch versions of a data table by binary COPY
+    :param sql_cursor: psycopg2 cursor
+    :param table_name: name of the data table
+    :param statement_name: name of a registered statement selecting the snapshot columns of the versions
+    :param params: parameters of the statement
+    :return: dictionary column name -> array
+    """
+
+    list_columns = get_snapshot_columns(table_name)
+    list_value_columns = DB_Communication.data_table_value_columns[table_name]
+
+    # COPY takes no parameters, so the query is composed and the parameters are bound on the client
+    query = sql.SQL(DB_Communication.statement_registry.get_query(statement_name)).format(
+        key_columns=sql.SQL(", ").join(map(sql.Identifier, list_columns[:-len(list_value_columns) - 2])),
+        value_columns=sql.SQL(", ").join(sql.SQL("COALESCE({0}, 'NaN')::double precision AS {0}").format(
+            sql.Identifier(each_column)) for each_column in list_value_columns),
+        table=sql.Identifier(DB_Communication.table_schema_relation[table_name], table_name)).as_string(sql_cursor)
+
+    buffer = io.BytesIO()
+    sql_cursor.copy_expert("COPY (" + sql_cursor.mogrify(query, params).decode() + ") TO STDOUT WITH (FORMAT binary)",
+                           buffer)
+
+    return parse_binary_copy(buffer.getvalue(), list_columns)
+
+
+def concatenate_versions(table_name, list_batches):
+    """
+    :param table_name: name of the data table
+    :param list_batches: list of dictionaries column name -> array
+    :return: dictionary column name -> array of all batches
+    """
+
+    list_columns = get_snapshot_columns(table_name)
+
+    if not list_batches:
+        return {column: np.empty(0, dtype=get_column_dtype(column)) for column in list_columns}
+
+    return {column: np.concatenate([each_batch[column] for each_batch in list_batches]) for column in list_columns}
+
+
+def fetch_all_versions(sql_cursor, table_name, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Fetch all versions of a data table in batches by binary COPY
+    :param sql_cursor: psycopg2 cursor
+    :param table_name: name of the data table
+    :param batch_size: number of versions per query
+    :return: dictionary column name -> array, ordered by ID
+    """
+
+    list_batches = []
+    last_id = 0
+
+    while True:
+        dict_batch = copy_versions(sql_cursor, table_name, "get_snapshot_versions", (last_id, batch_size))
+        number_of_rows = len(dict_batch["ID"])
+
+        if number_of_rows:
+            list_batches.append(dict_batch)
+            last_id = int(dict_batch["ID"][-1])
+
+        if number_of_rows < batch_size:
+            break
+
+    return concatenate_versions(table_name, list_batches)
+
+
+def fetch_changed_versions(sql_cursor, table_name, watermark, batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Fetch the versions of a data table inserted, updated or deleted by the transactions not visible in the
+    watermark, the versions are read in their current state
+    :param sql_cursor: psycopg2 cursor
+    :param table_name: name of the data table
+    :param watermark: watermark of the last refresh (see get_change_watermark)
+    :param batch_size: number of versions per query
+    :return: tuple (sorted array of the changed IDs, dictionary column name -> array of the versions still existing)
+    """
+
+    buffer = io.BytesIO()
+    sql_cursor.copy_expert("COPY (" + sql_cursor.mogrify(
+        DB_Communication.statement_registry.get_query("get_snapshot_changed_ids"),
+        (table_name, watermark, watermark)).decode() + ") TO STDOUT WITH (FORMAT binary)", buffer)
+
+    array_changed_ids = parse_binary_copy(buffer.getvalue(), ["ID"])["ID"]
+
+    list_batches = [copy_versions(sql_cursor, table_name, "get_snapshot_versions_by_id",
+                                  (array_changed_ids[start:start + batch_size].tolist(),))
+                    for start in range(0, len(array_changed_ids), batch_size)]
+
+    return array_changed_ids, concatenate_versions(table_name, list_batches)
+
+
+def refresh_table_snapshot(sql_cursor, snapshot_directory, table_name, full=False,
+                           batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Bring the snapshot of a data table up to date, only the versions changed since the last refresh are transferred
+    (see fetch_changed_versions). All versions are transferred in case there is no snapshot yet or the changes since
+    its watermark have been pruned from the change log
+    :param sql_cursor: psycopg2 cursor in a repeatable read transaction
+    :param snapshot_directory: snapshot directory of the database
+    :param table_name: name of the data table
+    :param full: transfer all versions instead of refreshing the existing snapshot
+    :param batch_size: number of versions per query
+    :return: tuple (number of new versions, number of changed or removed versions)
+    """
+
+    snapshot = None if full else load_table_snapshot(snapshot_directory, table_name, mmap=True)
+
+    # a changed table structure (e.g. a new value column) requires a full refresh
+    if snapshot is not None and snapshot.meta["columns"] != get_snapshot_columns(table_name):
+        snapshot = None
+
+    previous_watermark = None if snapshot is None else snapshot.meta.get("watermark")
+    watermark, is_complete = get_change_watermark(sql_cursor, previous_watermark)
+
+    if snapshot is None or not is_complete:
+        dict_versions = fetch_all_versions(sql_cursor, table_name, batch_size)
+        save_table_snapshot(snapshot_directory, table_name, dict_versions, watermark)
+        return len(dict_versions["ID"]), 0
+
+    array_changed_ids, dict_changed_versions = fetch_changed_versions(sql_cursor, table_name, previous_watermark,
+                                                                      batch_size)
+
+    if len(array_changed_ids) == 0:
+        # the columns stay as they are, only the watermark moves on
+        save_table_meta(os.path.join(snapshot_directory, table_name), dict(snapshot.meta, watermark=watermark))
+        return 0, 0
+
+    # the changed versions replace their old state, deleted versions are only removed
+    is_changed = np.isin(snapshot["ID"], array_changed_ids)
+    number_of_changed = int(is_changed.sum())
+    number_of_new = len(dict_changed_versions["ID"]) - int(np.isin(dict_changed_versions["ID"], snapshot["ID"]).sum())
+
+    dict_columns = {column: np.concatenate([snapshot[column][~is_changed], dict_changed_versions[column]])
+                    for column in snapshot.meta["columns"]}
+
+    # the IDs of a snapshot are ascending, versions of a transaction committed late may have lower IDs
+    order = np.argsort(dict_columns["ID"], kind="stable")
+    dict_columns = {column: values[order] for column, values in dict_columns.items()}
+
+    save_table_snapshot(snapshot_directory, table_name, dict_columns, watermark)
+
+    return number_of_new, number_of_changed
+
+
+def refresh_shares_snapshot(sql_cursor, snapshot_directory):
+    """
+    Write the snapshot of the shares including their attributes, it is small and always transferred completely
+    :param sql_cursor: psycopg2 cursor
+    :param snapshot_directory: snapshot directory of the database
+    :return: number of shares
+    """
+
+    df_shares = DB_Communication.query_as_data_frame(sql_cursor, "get_snapshot_shares")
+
+    # strings are stored with a fixed width, so the files can be mapped without pickling
+    dict_columns = {column: df_shares[column].to_numpy(dtype="int32") if column == "share_ID"
+                    else df_shares[column].fillna("").to_numpy(dtype="U")
+                    for column in df_shares.columns}
+
+    save_table_snapshot(snapshot_directory, SHARES_SNAPSHOT, dict_columns, get_change_watermark(sql_cursor)[0])
+
+    return len(df_shares)
+
+
+def refresh_snapshots(db_pool, table_names=None, directory=SNAPSHOT_DIRECTORY, full=False,
+                      batch_size=SNAPSHOT_BATCH_SIZE):
+    """
+    Refresh the snapshots of the shares and the data tables, all tables are read in one repeatable read
+    transaction, so they show the same state of the database
+    :param db_pool: ConnectionPool of the database
+    :param table_names: iterable of data tables, all data tables in case of None
+    :param directory: directory of all snapshots
+    :param full: transfer all versions instead of refreshing the existing snapshots
+    :param batch_size: number of versions per query
+    :return: dictionary table name -> tuple (number of new versions, number of changed or removed versions)
+    """
+
+    list_tables = sorted(DB_Communication.data_table_value_columns) if table_names is None else list(table_names)
+    snapshot_directory = get_snapshot_directory(db_pool, directory)
+
+    dict_results = {}
+
+    with db_pool.connection() as db_connection:
+
+        try:
+            with db_connection.cursor() as sql_cursor:
+                sql_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+                dict_results[SHARES_SNAPSHOT] = (refresh_shares_snapshot(sql_cursor, snapshot_directory), 0)
+
+                for table_name in list_tables:
+                    dict_results[table_name] = refresh_table_snapshot(sql_cursor, snapshot_directory, table_name,
+                                                                      full, batch_size)
+
+        finally:
+            # nothing has been written, the transaction only ends the snapshot of the database
+            db_connection.rollback()
+
+    return dict_results
+
+
+def load_snapshots(db_pool, table_names=None, directory=SNAPSHOT_DIRECTORY, mmap=True):
+    """
+    Load the snapshots of the shares and the data tables without querying the database
+    :param db_pool: ConnectionPool of the database (only used to find its snapshot directory)
+    :param table_names: iterable of data tables, all data tables in case of None
+    :param directory: directory of all snapshots
+    :param mmap: map the files read-only instead of reading them into memory
+    :return: dictionary table name -> TableSnapshot, tables without snapshot are missing
+    """
+
+    list_tables = sorted(DB_Communication.data_table_value_columns) if table_names is None else list(table_names)
+    snapshot_directory = get_snapshot_directory(db_pool, directory)
+
+    dict_snapshots = {}
+
+    for table_name in [SHARES_SNAPSHOT] + list_tables:
+        snapshot = load_table_snapshot(snapshot_directory, table_name, mmap)
+
+        if snapshot is not None:
+            dict_snapshots[table_name] = snapshot
+
+    return dict_snapshots
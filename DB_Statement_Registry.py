@@ -0,0 +1,369 @@
+import itertools
+import os
+import re
+import threading
+import time
+import weakref
+from psycopg2 import sql
+import psycopg2
+"""
+    This python file implements a registry for all SQL statements of the application.
+    All files below ./data/sql/ are read once, statements executed frequently are prepared on the server
+    (PREPARE/EXECUTE) per connection, so they skip parsing and planning. Hit and timing counters are kept
+    for each statement to see which statements are worth preparing.
+"""
+
+# statements starting with one of these keywords can be prepared on the server
+PREPARABLE_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "VALUES", "WITH")
+
+
+class RegisteredStatement:
+    """
+    A single statement of the registry including its counters
+    """
+
+    def __init__(self, name, query, prepared_name, prepare=True):
+        """
+        :param name: unique name of the statement
+        :param query: query as string or psycopg2.sql.Composable, parameters as %s placeholders
+        :param prepared_name: name of the statement on the server (has to be a valid, short identifier)
+        :param prepare: allow to prepare the statement on the server
+        """
+
+        self.name = name
+        self.query = query
+
+        # query rendered as string (Composables need a connection to be rendered)
+        self.query_string = query if isinstance(query, str) else None
+
+        self.is_preparable = prepare
+        self.prepared_name = prepared_name
+
+        # connections the statement is prepared on, entries vanish with the connection
+        self.prepared_connections = weakref.WeakSet()
+
+        self.hits = 0
+        self.prepared_hits = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def get_query_string(self, sql_cursor):
+        """
+        :param sql_cursor: psycopg2 cursor used to render Composables
+        :return: the query as string
+        """
+        if self.query_string is None:
+            self.query_string = self.query.as_string(sql_cursor)
+
+            # the rendered query is final now, so it can be checked for being preparable
+            self.is_preparable = self.is_preparable and is_query_preparable(self.query_string)
+
+        return self.query_string
+
+
+def is_query_preparable(query_string):
+    """
+    Check whether a query consists of a single DML statement using only positional %s placeholders
+    :param query_string: query as string
+    :return: True or False
+    """
+
+    query_string = query_string.strip().rstrip(';')
+
+    if ';' in query_string or '%(' in query_string:
+        return False
+
+    # leading comments describe the statement, its keyword follows them
+    query_string = re.sub(r'^(\s*--[^\n]*\n)+', '', query_string)
+
+    return query_string.lstrip().lstrip('(').upper().startswith(PREPARABLE_KEYWORDS)
+
+
+def convert_placeholders(query_string):
+    """
+    Convert the %s placeholders of psycopg2 to the $n placeholders required by PREPARE
+    :param query_string: query as string
+    :return: tuple of converted query and number of parameters
+    """
+
+    number_of_params = 0
+
+    def replace(match):
+        nonlocal number_of_params
+
+        if match.group(0) == '%%':
+            return '%'
+
+        number_of_params += 1
+        return '$' + str(number_of_params)
+
+    return re.sub(r'%%|%s', replace, query_string), number_of_params
+
+
+def compose_identifier(value):
+    """
+    Create the psycopg2 representation of an identifier
+    :param value: string (e.g. a column), tuple of strings for a qualified name (e.g. (schema, table))
+                  or list of strings for a comma separated list of identifiers (e.g. several columns)
+    :return: psycopg2.sql.Composable
+    """
+
+    if isinstance(value, tuple):
+        return sql.Identifier(*value)
+
+    if isinstance(value, list):
+        return sql.SQL(", ").join(map(sql.Identifier, value))
+
+    return sql.Identifier(value)
+
+
+class StatementRegistry:
+    """
+    Registry of named SQL statements with server-side preparation and per-statement counters
+    """
+
+    def __init__(self, sql_directory='./data/sql/', prepare_threshold=5):
+        """
+        Load all .sql files of the directory (including subdirectories)
+        :param sql_directory: directory containing the .sql files
+        :param prepare_threshold: number of executions after which a statement gets prepared on a connection,
+                                  None disables server-side preparation
+        """
+
+        self.sql_directory = sql_directory
+        self.prepare_threshold = prepare_threshold
+
+        self._statements = {}
+        self._lock = threading.Lock()
+
+        # statement names are numbered, as the registered names may exceed the identifier length of PostgreSQL
+        self._prepared_name_counter = itertools.count(1)
+
+        self.load_directory(sql_directory)
+
+    def load_directory(self, sql_directory):
+        """
+        Register all .sql files of a directory, the name of a statement is its relative path without extension
+        e.g. ./data/sql/init/00_init_schemas.sql -> init/00_init_schemas
+        :param sql_directory: directory containing the .sql files
+        :return: None
+        """
+
+        for directory, list_subdirectories, list_files in os.walk(sql_directory):
+
+            # sort to get a reproducible order of registration
+            list_subdirectories.sort()
+
+            for each_file in sorted(list_files):
+
+                if not each_file.endswith('.sql'):
+                    continue
+
+                file_path = os.path.join(directory, each_file)
+                name = os.path.relpath(file_path, sql_directory)[:-4].replace(os.sep, '/')
+
+                with open(file_path, 'r', encoding='utf-8') as F:
+                    self.register(name, F.read())
+
+    def register(self, name, query, prepare=True):
+        """
+        Register a statement under the given name, an existing statement with the same name is replaced
+        :param name: unique name of the statement
+        :param query: query as string or psycopg2.sql.Composable, parameters as %s placeholders
+        :param prepare: allow to prepare the statement on the server
+        :return: the registered statement
+        """
+
+        if isinstance(query, str):
+            prepare = prepare and is_query_preparable(query)
+
+        with self._lock:
+            statement = RegisteredStatement(name, query, "sharetool_" + str(next(self._prepared_name_counter)),
+                                            prepare)
+            self._statements[name] = statement
+
+        return statement
+
+    def get_names(self):
+        return sorted(self._statements.keys())
+
+    def is_registered(self, name):
+        with self._lock:
+            return name in self._statements
+
+    def get_query(self, name):
+        """
+        :param name: name of the registered statement
+        :return: query as loaded from the file, identifiers not yet composed
+        """
+        return self._statements[name].query
+
+    def get_query_string(self, sql_cursor, name, identifiers=None):
+        """
+        :param sql_cursor: psycopg2 cursor used to render composed statements
+        :param name: name of the registered statement
+        :param identifiers: dictionary placeholder -> identifier, see execute
+        :return: query as executed, identifiers composed
+        """
+        return self._get_statement(name, identifiers).get_query_string(sql_cursor)
+
+    def _get_statement(self, name, identifiers):
+        """
+        Get the statement for a name, compose the identifiers into the query in case any are given
+        :param name: name of the registered statement
+        :param identifiers: dictionary placeholder -> identifier, see compose_identifier
+        :return: RegisteredStatement instance
+        """
+
+        if not identifiers:
+            return self._statements[name]
+
+        # each combination of identifiers is a statement of its own, with own counters and preparation
+        composed_name = name + "[" + ",".join(key + "=" + str(value)
+                                               for key, value in sorted(identifiers.items())) + "]"
+
+        with self._lock:
+            statement = self._statements.get(composed_name)
+
+        if statement is None:
+
+            template = self._statements[name]
+
+            dict_identifiers = {key: compose_identifier(value) for key, value in identifiers.items()}
+
+            statement = self.register(composed_name, sql.SQL(template.query).format(**dict_identifiers),
+                                      prepare=template.is_preparable)
+
+        return statement
+
+    def _prepare(self, sql_cursor, statement, query_string):
+        """
+        Prepare a statement on the cursor's connection
+        :param sql_cursor: psycopg2 cursor
+        :param statement: RegisteredStatement to be prepared
+        :param query_string: rendered query
+        :return: True in case the statement could be prepared
+        """
+
+        prepared_query, number_of_params = convert_placeholders(query_string)
+        prepare_query = 'PREPARE ' + statement.prepared_name + ' AS ' + prepared_query
+
+        conn = sql_cursor.connection
+
+        # protect the surrounding transaction against a failing PREPARE
+        use_savepoint = not conn.autocommit
+        try:
+            if use_savepoint:
+                sql_cursor.execute('SAVEPOINT sharetool_prepare')
+
+            sql_cursor.execute(prepare_query)
+
+            if use_savepoint:
+                sql_cursor.execute('RELEASE SAVEPOINT sharetool_prepare')
+
+        except psycopg2.Error:
+            if use_savepoint:
+                sql_cursor.execute('ROLLBACK TO SAVEPOINT sharetool_prepare')
+
+            # never try again, the statement is executed unprepared from now on
+            statement.is_preparable = False
+            return False
+
+        statement.prepared_connections.add(conn)
+        return True
+
+    def execute(self, sql_cursor, name, params=None, identifiers=None):
+        """
+        Execute a registered statement, the result can be fetched from the cursor afterwards
+        :param sql_cursor: psycopg2 cursor
+        :param name: name of the registered statement
+        :param params: sequence of parameters for the %s placeholders
+        :param identifiers: dictionary placeholder -> identifier, composed safely into {placeholder} fields of the
+                            query (see compose_identifier)
+        :return: None
+        """
+
+        statement = self._get_statement(name, identifiers)
+        query_string = statement.get_query_string(sql_cursor)
+
+        conn = sql_cursor.connection
+        is_prepared = conn in statement.prepared_connections
+
+        if (not is_prepared and statement.is_preparable and self.prepare_threshold is not None
+                and statement.hits >= self.prepare_threshold):
+            is_prepared = self._prepare(sql_cursor, statement, query_string)
+
+        start_time = time.perf_counter()
+
+        if is_prepared:
+            if params:
+                sql_cursor.execute('EXECUTE ' + statement.prepared_name + ' (' + ', '.join(['%s'] * len(params)) + ')',
+                                   params)
+            else:
+                sql_cursor.execute('EXECUTE ' + statement.prepared_name)
+        else:
+            sql_cursor.execute(query_string, params)
+
+        duration = time.perf_counter() - start_time
+
+        with self._lock:
+            statement.hits += 1
+            statement.total_time += duration
+            statement.max_time = max(statement.max_time, duration)
+
+            if is_prepared:
+                statement.prepared_hits += 1
+
+    def execute_union(self, sql_cursor, list_parts):
+        """
+        Execute several registered statements combined by UNION ALL, so all rows are fetched in one round trip
+        The combined statement is registered on first use and gets prepared like any other statement
+        :param sql_cursor: psycopg2 cursor
+        :param list_parts: list of tuples (name of registered statement, params, identifiers), the statements have
+                           to return the same columns
+        :return: None
+        """
+
+        list_statements = [self._get_statement(name, identifiers) for name, params, identifiers in list_parts]
+        union_name = " UNION ALL ".join(statement.name for statement in list_statements)
+
+        with self._lock:
+            union_statement = self._statements.get(union_name)
+
+        if union_statement is None:
+            self.register(union_name, " UNION ALL ".join("(" + statement.get_query_string(sql_cursor) + ")"
+                                                         for statement in list_statements))
+
+        self.execute(sql_cursor, union_name, [each_param for name, params, identifiers in list_parts
+                                              for each_param in params])
+
+    def get_statistics(self):
+        """
+        Get the counters of all executed statements, sorted by total time descending
+        :return: list of dictionaries
+        """
+
+        with self._lock:
+            list_statistics = [{"name": statement.name,
+                                "hits": statement.hits,
+                                "prepared_hits": statement.prepared_hits,
+                                "total_time": statement.total_time,
+                                "mean_time": statement.total_time / statement.hits,
+                                "max_time": statement.max_time,
+                                "is_preparable": statement.is_preparable}
+                               for statement in self._statements.values() if statement.hits > 0]
+
+        return sorted(list_statistics, key=lambda x: x["total_time"], reverse=True)
+
+    def reset_statistics(self):
+        """
+        Reset the counters of all statements
+        :return: None
+        """
+
+        with self._lock:
+            for statement in self._statements.values():
+                statement.hits = 0
+                statement.prepared_hits = 0
+                statement.total_time = 0.0
+                statement.max_time = 0.0
@@ -0,0 +1,410 @@
+import datetime
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+import DB_Communication
+"""
+    This python file implements universe-wide analytics of the fundamentals.
+    The values of all shares are loaded with one statement (see DB_Communication.get_data_as_of) and aligned into
+    a dense array values[share, year, metric] with NaN for missing values. Growth rates, multi-year averages,
+    z-scores and rankings are computed on these arrays for all shares at once instead of share by share.
+    A loaded cube and its indicators can be cached on disk as .npz file.
+
+    e.g. cube = load_fundamentals_cached(db_pool)
+         cube.indicators["rank"][cube.get_share_position(42), :, cube.get_metric_position("ROAs")]
+"""
+
+# data tables analysed by default, every value column of a table is a metric
+FUNDAMENTAL_TABLES = ("profits", "cashflows", "ROAs", "leverages", "liquidities", "grossMargins", "assetTurnovers")
+
+# directory of the cached cubes
+CACHE_DIRECTORY = './data/cache/'
+
+# axes of the value array
+SHARE_AXIS = 0
+YEAR_AXIS = 1
+METRIC_AXIS = 2
+
+
+class FundamentalsCube:
+    """
+    Dense array of the values of many shares, years and metrics
+    """
+
+    def __init__(self, values, share_ids, years, metrics, as_of=None, created_at=None):
+        """
+        :param values: float array (shares x years x metrics), NaN for missing values
+        :param share_ids: sorted array of the share ids along the first axis
+        :param years: array of consecutive years along the second axis
+        :param metrics: list of tuples (table, value column) along the third axis
+        :param as_of: point in time the values are valid at, None for the current versions
+        :param created_at: point in time the values have been loaded, defaults to now
+        """
+
+        self.values = values
+        self.share_ids = share_ids
+        self.years = years
+        self.metrics = [tuple(each_metric) for each_metric in metrics]
+        self.as_of = as_of
+        self.created_at = datetime.datetime.now() if created_at is None else created_at
+
+        # arrays of the same shape as values, computed by compute_indicators
+        self.indicators = {}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def get_share_position(self, share_ids):
+        """
+        :param share_ids: share id or array of share ids
+        :return: position(s) of the shares along the first axis
+        """
+
+        share_ids = np.asarray(share_ids)
+        positions = np.minimum(np.searchsorted(self.share_ids, share_ids), max(len(self.share_ids) - 1, 0))
+
+        if len(self.share_ids) == 0 or np.any(self.share_ids[positions] != share_ids):
+            raise KeyError("Share(s) not contained in the cube")
+
+        return positions
+
+    def get_year_position(self, years):
+        """
+        :param years: year or array of years
+        :return: position(s) of the years along the second axis
+        """
+
+        positions = np.asarray(years) - (self.years[0] if len(self.years) else 0)
+
+        if np.any(positions < 0) or np.any(positions >= len(self.years)):
+            raise KeyError("Year(s) not contained in the cube")
+
+        return positions
+
+    def get_metric_position(self, metric):
+        """
+        :param metric: tuple (table, value column) or name of a table, which stands for its first value column
+        :return: position of the metric along the third axis
+        """
+
+        for i, (table_name, column_name) in enumerate(self.metrics):
+            if metric == (table_name, column_name) or metric == table_name:
+                return i
+
+        raise KeyError("Metric " + str(metric) + " not contained in the cube")
+
+    def to_data_frame(self, values=None):
+        """
+        Convert an array of the cube's shape into a data frame, e.g. for display or export
+        :param values: array of the cube's shape (e.g. an indicator), defaults to the values of the cube
+        :return: data frame indexed by (share_ID, year) with one column (table, value column) per metric,
+                 rows without any value are dropped
+        """
+
+        values = self.values if values is None else values
+
+        index = pd.MultiIndex.from_product([self.share_ids, self.years], names=["share_ID", "year"])
+        df_values = pd.DataFrame(values.reshape(-1, len(self.metrics)), index=index,
+                                 columns=pd.MultiIndex.from_tuples(self.metrics))
+
+        return df_values.dropna(how="all")
+
+
+def create_cube(df_data, as_of=None):
+    """
+    Align the values of a data frame as returned by DB_Communication.get_data_as_of into a dense array
+    :param df_data: data frame indexed by (share_ID, year) with one column (table, value column) per metric
+    :param as_of: point in time the values are valid at, None for the current versions
+    :return: FundamentalsCube, the years range from the first to the last year found without gaps
+    """
+
+    list_metrics = list(df_data.columns)
+
+    share_ids_of_rows = df_data.index.get_level_values("share_ID").to_numpy(dtype="int64")
+    years_of_rows = df_data.index.get_level_values("year").to_numpy(dtype="int64")
+
+    if len(df_data) == 0:
+        return FundamentalsCube(np.empty((0, 0, len(list_metrics))), np.empty(0, dtype="int64"),
+                                np.empty(0, dtype="int64"), list_metrics, as_of)
+
+    share_ids = np.unique(share_ids_of_rows)
+    years = np.arange(years_of_rows.min(), years_of_rows.max() + 1, dtype="int64")
+
+    values = np.full((len(share_ids), len(years), len(list_metrics)), np.nan)
+
+    # scatter all rows at once, positions are found by binary search (share ids) and offset (years)
+    values[np.searchsorted(share_ids, share_ids_of_rows), years_of_rows - years[0]] = \
+        df_data.to_numpy(dtype="float64")
+
+    return FundamentalsCube(values, share_ids, years, list_metrics, as_of)
+
+
+def load_fundamentals(sql_cursor, table_names=FUNDAMENTAL_TABLES, as_of=None, year_from=None, year_to=None,
+                      share_ids=None):
+    """
+    Load the values of several data tables for all shares with one statement
+    :param sql_cursor: psycopg2 cursor
+    :param table_names: iterable of data tables with a year column
+    :param as_of: point in time (datetime or string), None for the current versions
+    :param year_from: first year to be loaded (inclusive), all years in case of None
+    :param year_to: last year to be loaded (inclusive), all years in case of None
+    :param share_ids: iterable of share ids, all shares in case of None
+    :return: FundamentalsCube
+    """
+
+    list_tables = list(table_names)
+
+    list_tables_without_year = [each_table for each_table in list_tables
+                                if each_table in DB_Communication.data_tables_without_year]
+    if list_tables_without_year:
+        raise ValueError("Tables without year cannot be aligned by year: " + ", ".join(list_tables_without_year))
+
+    if share_ids is None:
+        share_ids = DB_Communication.get_lookup_table(sql_cursor, "shares")["ID"]
+
+    df_data = DB_Communication.get_data_as_of(sql_cursor, share_ids, list_tables, as_of, year_from, year_to)
+
+    return create_cube(df_data, None if as_of is None else pd.Timestamp(as_of).to_pydatetime())
+
+
+def growth_rates(values, periods=1):
+    """
+    Relative change compared to the value a number of years before, (x[t] - x[t-periods]) / |x[t-periods]|
+    :param values: array with the years along the second axis (e.g. FundamentalsCube.values)
+    :param periods: number of years
+    :return: array of the same shape, NaN for the first years and where the previous value is missing or 0
+    """
+
+    result = np.full(values.shape, np.nan)
+
+    if periods >= values.shape[YEAR_AXIS]:
+        return result
+
+    previous = values[:, :-periods]
+    current = values[:, periods:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:, periods:] = np.where(previous != 0, (current - previous) / np.abs(previous), np.nan)
+
+    return result
+
+
+def compound_growth_rates(values, periods):
+    """
+    Average yearly growth over a number of years, (x[t] / x[t-periods]) ** (1 / periods) - 1
+    :param values: array with the years along the second axis (e.g. FundamentalsCube.values)
+    :param periods: number of years
+    :return: array of the same shape, NaN for the first years and where one of both values is not positive
+    """
+
+    result = np.full(values.shape, np.nan)
+
+    if periods >= values.shape[YEAR_AXIS]:
+        return result
+
+    previous = values[:, :-periods]
+    current = values[:, periods:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[:, periods:] = np.where((previous > 0) & (current > 0),
+                                       np.power(current / previous, 1.0 / periods) - 1.0, np.nan)
+
+    return result
+
+
+def rolling_means(values, window, min_periods=None):
+    """
+    Mean of the last years (including the current one), missing values are skipped
+    :param values: array with the years along the second axis (e.g. FundamentalsCube.values)
+    :param window: number of years
+    :param min_periods: minimum number of values within the window, defaults to the window
+    :return: array of the same shape, NaN where there are too few values
+    """
+
+    min_periods = window if min_periods is None else min_periods
+
+    is_valid = ~np.isnan(values)
+
+    # window sums are differences of cumulative sums, padded by a leading zero
+    shape_padding = list(values.shape)
+    shape_padding[YEAR_AXIS] = 1
+
+    cumulative_sums = np.concatenate((np.zeros(shape_padding), np.cumsum(np.where(is_valid, values, 0.0),
+                                                                         axis=YEAR_AXIS)), axis=YEAR_AXIS)
+    cumulative_counts = np.concatenate((np.zeros(shape_padding), np.cumsum(is_valid, axis=YEAR_AXIS)),
+                                       axis=YEAR_AXIS)
+
+    positions_end = np.arange(1, values.shape[YEAR_AXIS] + 1)
+    positions_start = np.maximum(positions_end - window, 0)
+
+    sums = cumulative_sums[:, positions_end] - cumulative_sums[:, positions_start]
+    counts = cumulative_counts[:, positions_end] - cumulative_counts[:, positions_start]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts >= max(min_periods, 1), sums / counts, np.nan)
+
+
+def z_scores(values, axis=SHARE_AXIS, ddof=0):
+    """
+    Standardize the values, by default cross-sectionally (all shares of a year and metric)
+    :param values: array (e.g. FundamentalsCube.values)
+    :param axis: axis the mean and standard deviation are computed along
+    :param ddof: delta degrees of freedom of the standard deviation
+    :return: array of the same shape, NaN for missing values and where the standard deviation is 0
+    """
+
+    is_valid = ~np.isnan(values)
+    counts = is_valid.sum(axis=axis, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(is_valid, values, 0.0).sum(axis=axis, keepdims=True) / counts
+        deviations = np.where(is_valid, values - means, 0.0)
+        standard_deviations = np.sqrt((deviations ** 2).sum(axis=axis, keepdims=True) / (counts - ddof))
+
+        return np.where(is_valid & (standard_deviations > 0), deviations / standard_deviations, np.nan)
+
+
+def ranks(values, ascending=False, pct=False):
+    """
+    Rank the shares within each year and metric, ties get their average rank
+    :param values: array with the shares along the first axis (e.g. FundamentalsCube.values)
+    :param ascending: False ranks the highest value first (e.g. ROA), True the lowest one (e.g. leverage)
+    :param pct: percentile ranks (0, 1] instead of ranks 1 to n
+    :return: array of the same shape, NaN for missing values
+    """
+
+    # all years and metrics are ranked at once as columns of a frame
+    df_values = pd.DataFrame(values.reshape(values.shape[SHARE_AXIS], -1))
+
+    return df_values.rank(axis=0, method="average", ascending=ascending, pct=pct, na_option="keep") \
+        .to_numpy(dtype="float64").reshape(values.shape)
+
+
+def compute_indicators(cube, window=3):
+    """
+    Compute the standard indicators of a cube, they are stored in cube.indicators as well
+    :param cube: FundamentalsCube
+    :param window: number of years of the multi-year averages and compound growth rates
+    :return: dictionary indicator name -> array of the cube's shape
+    """
+
+    cube.indicators = {"growth": growth_rates(cube.values),
+                       "growth_" + str(window) + "y": compound_growth_rates(cube.values, window),
+                       "mean_" + str(window) + "y": rolling_means(cube.values, window),
+                       "z_score": z_scores(cube.values),
+                       "rank": ranks(cube.values, pct=True)}
+
+    return cube.indicators
+
+
+def save_cube(cube, file_path):
+    """
+    Write a cube including its indicators to a .npz file, the file is replaced atomically
+    :param cube: FundamentalsCube
+    :param file_path: path of the file
+    :return: None
+    """
+
+    dict_arrays = {"values": cube.values,
+                   "share_ids": cube.share_ids,
+                   "years": cube.years,
+                   "metrics": np.array(cube.metrics, dtype="U").reshape(-1, 2),
+                   "as_of": np.array("" if cube.as_of is None else cube.as_of.isoformat()),
+                   "created_at": np.array(cube.created_at.isoformat())}
+
+    for name, values in cube.indicators.items():
+        dict_arrays["indicator_" + name] = values
+
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # readers never see a partially written file
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, 'wb') as cache_file:
+        np.savez(cache_file, **dict_arrays)
+
+    os.replace(temporary_path, file_path)
+
+
+def load_cube(file_path):
+    """
+    Read a cube written by save_cube
+    :param file_path: path of the file
+    :return: FundamentalsCube including its indicators
+    """
+
+    with np.load(file_path, allow_pickle=False) as npz_file:
+
+        as_of = str(npz_file["as_of"])
+
+        cube = FundamentalsCube(npz_file["values"], npz_file["share_ids"], npz_file["years"],
+                                npz_file["metrics"].tolist(),
+                                datetime.datetime.fromisoformat(as_of) if as_of else None,
+                                datetime.datetime.fromisoformat(str(npz_file["created_at"])))
+
+        cube.indicators = {name[len("indicator_"):]: npz_file[name] for name in npz_file.files
+                           if name.startswith("indicator_")}
+
+    return cube
+
+
+def get_cache_file_path(db_pool, table_names, as_of=None, year_from=None, year_to=None, window=3,
+                        cache_directory=CACHE_DIRECTORY):
+    """
+    Every combination of database and parameters has a cache file of its own
+    :param db_pool: ConnectionPool of the database
+    :param table_names: iterable of data tables
+    :param as_of: point in time, None for the current versions
+    :param year_from: first year (inclusive), all years in case of None
+    :param year_to: last year (inclusive), all years in case of None
+    :param window: number of years of the multi-year indicators
+    :param cache_directory: directory of the cache files
+    :return: path of the cache file
+    """
+
+    key = json.dumps([db_pool.connection_params.get("host"), db_pool.connection_params.get("dbname"),
+                      list(table_names),
+                      None if as_of is None else pd.Timestamp(as_of).isoformat(), year_from, year_to, window])
+
+    return os.path.join(cache_directory, "fundamentals_" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] +
+                        ".npz")
+
+
+def load_fundamentals_cached(db_pool, table_names=FUNDAMENTAL_TABLES, as_of=None, year_from=None, year_to=None,
+                             window=3, max_age=3600.0, cache_directory=CACHE_DIRECTORY):
+    """
+    Load a cube including its indicators from the cache, it is loaded from the database in case the cache file
+    does not exist or is outdated
+    :param db_pool: ConnectionPool of the database
+    :param table_names: iterable of data tables with a year column
+    :param as_of: point in time (datetime or string), None for the current versions
+    :param year_from: first year to be loaded (inclusive), all years in case of None
+    :param year_to: last year to be loaded (inclusive), all years in case of None
+    :param window: number of years of the multi-year indicators
+    :param max_age: seconds a cache file stays valid, None for no expiry
+    :param cache_directory: directory of the cache files
+    :return: FundamentalsCube
+    """
+
+    file_path = get_cache_file_path(db_pool, table_names, as_of, year_from, year_to, window, cache_directory)
+
+    try:
+        if max_age is None or time.time() - os.path.getmtime(file_path) < max_age:
+            return load_cube(file_path)
+
+    except (OSError, KeyError, ValueError):
+        # missing or unreadable, the cube is loaded from the database
+        pass
+
+    with db_pool.cursor() as sql_cursor:
+        cube = load_fundamentals(sql_cursor, table_names, as_of, year_from, year_to)
+
+    compute_indicators(cube, window)
+    save_cube(cube, file_path)
+
+    return cube
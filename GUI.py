@@ -1,8 +1,12 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
 from ISIN_Validator import is_isin_valid
 import DB_Communication
+import DB_Instrumentation
+import DB_Screener
+from GUI_Background_Executor import BackgroundExecutor, TaskTimeout
+from GUI_Completion_Index import CompletionIndex, MATCH_MODES
 from PIL import ImageTk
 import json
 import pandas as pd
@@ -21,13 +25,27 @@ class AutocompleteCombobox(ttk.Combobox):
         reference to: https://mail.python.org/pipermail/tkinter-discuss/2012-January/003041.html
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, match_mode="prefix", max_dropdown_values=500, **kwargs):
+        """
+        :param match_mode: prefix, substring or fuzzy, in substring and fuzzy mode the drop down menu is narrowed
+                           to the matching values while typing
+        :param max_dropdown_values: maximum number of values shown in the narrowed drop down menu
+        """
 
         # call super constructor
         super().__init__(*args, **kwargs)
 
-        self._completion_list = None
-        self._hits = []
+        if match_mode not in MATCH_MODES:
+            raise ValueError("Unknown match mode " + str(match_mode))
+
+        self.match_mode = match_mode
+        self.max_dropdown_values = max_dropdown_values
+
+        self._completion_list = []
+        self._completion_index = CompletionIndex([])
+
+        # range (lo, hi) of the values in the completion index matching the current input
+        self._hits = (0, 0)
         self._hit_index = 0
         self.position = 0
         self.bind('<KeyRelease>', self.handle_keyrelease)
@@ -38,7 +56,9 @@ class AutocompleteCombobox(ttk.Combobox):
         :param completion_list: list of all possible values
         :return: None
         """
-        self._completion_list = sorted(completion_list, key=str.lower)
+        self._completion_index = CompletionIndex(completion_list)
+        self._completion_list = self._completion_index.values
+        self._hits = (0, 0)
         self['values'] = self._completion_list  # set up the popup menu
 
     def autocomplete(self, delta=0):
@@ -56,30 +76,38 @@ class AutocompleteCombobox(ttk.Combobox):
         else:
             self.position = len(self.get())
 
-        # collect hits
-        _hits = []
+        text = self.get()
 
-        for element in self._completion_list:
-            # Match case insensitively
-            if element.lower().startswith(self.get().lower()):
-                _hits.append(element)
+        # collect hits, the index narrows the range of the previous input
+        lo, hi = self._completion_index.prefix_range(text)
 
-        # keep list only if it is different
-        if _hits != self._hits:
+        # keep hit index only if the hits are the same
+        if (lo, hi) != self._hits:
             self._hit_index = 0
-            self._hits = _hits
+            self._hits = (lo, hi)
 
         # allow cycling only if the list is already known
-        if _hits == self._hits and self._hits:
-            self._hit_index = (self._hit_index + delta) % len(self._hits)
-            # self.current(self._hit_index)
+        if hi > lo:
+            self._hit_index = (self._hit_index + delta) % (hi - lo)
+
+        self.update_dropdown_values(text)
 
         # perform auto completion
-        if self._hits:
+        if hi > lo:
             self.delete(0, tk.END)
-            self.insert(0, self._hits[self._hit_index])
+            self.insert(0, self._completion_index.get_value(lo + self._hit_index))
             self.select_range(self.position, tk.END)
 
+    def update_dropdown_values(self, text):
+        """
+        Narrow the drop down menu to the values matching the text (only in substring and fuzzy mode)
+        :param text: current input
+        :return: None
+        """
+
+        if self.match_mode != "prefix":
+            self['values'] = self._completion_index.find(text, self.match_mode, limit=self.max_dropdown_values)
+
     def handle_keyrelease(self, event):
         """
         Event handler for the key release event
@@ -90,6 +118,7 @@ class AutocompleteCombobox(ttk.Combobox):
         if event.keysym == "BackSpace":
             self.delete(self.index(tk.INSERT), tk.END)
             self.position = self.index(tk.END)
+            self.update_dropdown_values(self.get())
 
         if event.keysym == "Left":
             if self.position < self.index(tk.END):
@@ -104,9 +133,6 @@ class AutocompleteCombobox(ttk.Combobox):
         if len(event.keysym) == 1:
             self.autocomplete()
 
-            # display all values that match the current input
-            # self.config(values=list(self._hits))
-
 
 class ShareToolGUI(tk.Tk):
     """
@@ -122,7 +148,15 @@ class ShareToolGUI(tk.Tk):
         tk.Tk.wm_title(self, "Share Management Tool")
         tk.Tk.iconbitmap(self, default='./data/img/ShareTool.ico')
 
-        self.db_connection = None
+        # pool of database connections, pages borrow their connections from it
+        self.db_pool = None
+
+        # runs the database work of the pages in the background, so the window stays responsive
+        self.executor = BackgroundExecutor(self)
+
+        # running queries can be cancelled with escape, closing the window cancels them as well
+        self.bind_all('<Escape>', lambda event: self.executor.cancel_all())
+        self.protocol("WM_DELETE_WINDOW", self.close_application)
 
         self.container = tk.Frame(self)
         self.container.pack(side="top", fill="both", expand=True)
@@ -134,7 +168,8 @@ class ShareToolGUI(tk.Tk):
 
         # create the main menu with its entries
         self.menu_main = tk.Menu(self.menubar, tearoff=0)
-        self.menu_main.add_command(label="Status page", command=self.menu_bar_open_status_page)
+        self.menu_main.add_command(label="Status page",
+                                   command=lambda: self.open_page(StatusPage, delete_page=WelcomePage))
         self.menu_main.add_command(label="Help",
                                    command=lambda: messagebox.showinfo(title='Stay tuned!',
                                                                        message="Unfortunately not supported yet"))
@@ -143,35 +178,40 @@ class ShareToolGUI(tk.Tk):
 
         # add option to customize db cofig
         self.menu_main.add_command(label="Customize DB Config",
-                                   command=self.menu_bar_open_custom_db)
+                                   command=lambda: self.open_page(ConfigDBPage, requires_db=False))
         # add optical separator
         self.menu_main.add_separator()
 
         # add exit command
-        self.menu_main.add_command(label="Exit", command=quit)
+        self.menu_main.add_command(label="Exit", command=self.close_application)
 
         self.menubar.add_cascade(label="Main", menu=self.menu_main)
 
         # create menu for new data entries
         self.menu_insert_data = tk.Menu(self.menubar, tearoff=0)
-        self.menu_insert_data.add_command(label="Cashflow", command=self.menu_bar_open_create_cashflows)
-        self.menu_insert_data.add_command(label='Leverages', command=self.menu_bar_open_create_leverages)
-        self.menu_insert_data.add_command(label='Liquidity', command=self.menu_bar_open_create_liquidities)
-        self.menu_insert_data.add_command(label="Profits", command=self.menu_bar_open_create_profits)
-        self.menu_insert_data.add_command(label="ROAs", command=self.menu_bar_open_create_roas)
+        self.menu_insert_data.add_command(label="Cashflow", command=lambda: self.open_page(InsertCashflowPage))
+        self.menu_insert_data.add_command(label='Leverages', command=lambda: self.open_page(InsertLeveragePage))
+        self.menu_insert_data.add_command(label='Liquidity', command=lambda: self.open_page(InsertLiquidityPage))
+        self.menu_insert_data.add_command(label="Profits", command=lambda: self.open_page(InsertProfitsPage))
+        self.menu_insert_data.add_command(label="ROAs", command=lambda: self.open_page(InsertROAPage))
 
         # create menu for new entries
         self.menu_new = tk.Menu(self.menubar, tearoff=0)
-        self.menu_new.add_command(label="Entities", command=self.menu_bar_open_create_entities)
+        self.menu_new.add_command(label="Entities", command=lambda: self.open_page(CreateEntitiesPage))
         self.menu_new.add_cascade(label="Data", menu=self.menu_insert_data)
         self.menubar.add_cascade(label="New", menu=self.menu_new)
 
         # create menu for updating entries
         self.menu_update = tk.Menu(self.menubar, tearoff=0)
         self.menu_update.add_command(label="Entities", command=self.depends_on_db)
-        self.menu_update.add_command(label="Data", command=self.depends_on_db)
+        self.menu_update.add_command(label="Data", command=lambda: self.open_page(UpdateDataPage))
         self.menubar.add_cascade(label="Update", menu=self.menu_update)
 
+        # create menu for analysing the data
+        self.menu_analysis = tk.Menu(self.menubar, tearoff=0)
+        self.menu_analysis.add_command(label="Screener", command=lambda: self.open_page(ScreenerPage))
+        self.menubar.add_cascade(label="Analysis", menu=self.menu_analysis)
+
         # add menubar to frame
         tk.Tk.config(self, menu=self.menubar)
 
@@ -184,11 +224,22 @@ class ShareToolGUI(tk.Tk):
         self.frame_welcome_page.grid(row=0, column=0, sticky='nsew')
         self.show_frame(WelcomePage)
 
-    def get_db_connection(self):
-        return self.db_connection
+    def get_db_pool(self):
+        return self.db_pool
+
+    def set_db_pool(self, pool):
+        self.db_pool = pool
 
-    def set_db_connection(self, con):
-        self.db_connection = con
+    def get_executor(self):
+        return self.executor
+
+    def close_application(self):
+        """
+        Cancel all running queries and close the application
+        :return: None
+        """
+        self.executor.shutdown()
+        self.destroy()
 
     def get_frames(self):
         return self.frames
@@ -202,6 +253,9 @@ class ShareToolGUI(tk.Tk):
         # get instance of page by class
         frame = self.frames[page]
 
+        # query the page's data only in case it has changed since the page has been shown the last time
+        frame.refresh_if_outdated()
+
         # update frame and show it to the user
         frame.update_frame()
         frame.tkraise()
@@ -214,15 +268,10 @@ class ShareToolGUI(tk.Tk):
         :return: None
         """
 
-        # get instance of page by class
-        frame = self.frames[page]
+        self.show_frame(page)
 
-        # update frame and show it to the user
-        frame.update_frame()
-        frame.tkraise()
-
-        # delete the old page
-        del (self.frames[old_page])
+        # delete the old page, destroy its widgets as well, otherwise they would stay in memory
+        self.frames.pop(old_page).destroy()
 
     def create_page(self, page):
         """
@@ -234,210 +283,174 @@ class ShareToolGUI(tk.Tk):
         self.frames[page] = frame
         frame.grid(row=0, column=0, sticky='nsew')
 
-    # TODO: has to be replaced stepwise
-    def depends_on_db(self):
-        """
-        ONLY FOR DEVELOPMENT
-        """
-        if self.db_connection is None:
-            messagebox.showinfo(title='Configure DB',
-                                message="Please ensure valid db connection before proceed")
-        else:
-            messagebox.showinfo(title='Stay tuned!',
-                                message="Unfortunately not supported yet")
-
-    def menu_bar_open_status_page(self):
+    def open_page(self, page, requires_db=True, delete_page=None):
         """
-        Display status page in case it exists
-        :return: None
+        Show a page, it is created on first use and kept for later use afterwards
+        :param page: class of page to be shown
+        :param requires_db: the page can only be shown with an established db connection
+        :param delete_page: class of page to be deleted in case it exists (e.g. WelcomePage)
+        :return: True or False, depending on whether the page is shown
         """
 
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
+        # db_connection is prerequisite for most pages
+        if requires_db and self.db_pool is None:
             messagebox.showinfo(title='Not possible yet!',
                                 message="Please first ensure the database connection to be established")
+            return False
 
-        # check whether status page exists already
-        elif StatusPage in self.frames.keys():
-            self.show_frame(StatusPage)
+        if page not in self.frames:
+            self.create_page(page)
 
-        # create status page if not
+        if delete_page is not None and delete_page is not page and delete_page in self.frames:
+            self.show_frame_with_delete(page, delete_page)
         else:
-            self.create_page(StatusPage)
-            self.show_frame_with_delete(StatusPage, WelcomePage)
+            self.show_frame(page)
 
-    def menu_bar_open_custom_db(self):
+        return True
+
+    # TODO: has to be replaced stepwise
+    def depends_on_db(self):
         """
-        Opens a frame allowing the user to customize the DB configuration
-        Creates page as well if required
-        :return: None
+        ONLY FOR DEVELOPMENT
         """
-
-        if ConfigDBPage in self.frames.keys():
-            self.show_frame(ConfigDBPage)
+        if self.db_pool is None:
+            messagebox.showinfo(title='Configure DB',
+                                message="Please ensure valid db connection before proceed")
         else:
-            self.create_page(ConfigDBPage)
-            self.show_frame(ConfigDBPage)
+            messagebox.showinfo(title='Stay tuned!',
+                                message="Unfortunately not supported yet")
 
-    def menu_bar_open_create_entities(self):
-        """
-        Opens a frame allowing the user to create new entities
-        Creates page as well if required
-        :return: None
-        """
 
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message="Please first ensure the database connection to be established")
+class BasicPage(tk.Frame):
+    """
+    Super class for all pages
+    """
 
-        # check whether CreateEntitiesPage exists already
-        elif CreateEntitiesPage in self.frames.keys():
-            self.show_frame(CreateEntitiesPage)
+    # tables the data of the page is queried from, the data is only queried again in case one of them has changed
+    # (see refresh_if_outdated), None refreshes the data every time the page is shown
+    depends_on_tables = None
 
-        # create CreateEntitiesPage if not
-        else:
-            self.create_page(CreateEntitiesPage)
-            self.show_frame(CreateEntitiesPage)
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent)
+        tk.Frame.config(self)
 
-    def menu_bar_open_create_profits(self):
-        """
-        Opens a frame allowing the user to create new profit entries
-        Creates page as well if required
-        :return: None
-        """
+        self.controller = controller
+        self.parent = parent
 
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message="Please first ensure the database connection to be established")
+        # versions of depends_on_tables at the last refresh of the data, None in case the data is not loaded yet
+        self._data_versions = None
 
-        # check whether InsertProfitsPage exists already
-        elif InsertProfitsPage in self.frames.keys():
-            self.show_frame(InsertProfitsPage)
+    def get_controller(self):
+        return self.controller
 
-        # create InsertProfitsPage if not
-        else:
-            self.create_page(InsertProfitsPage)
-            self.show_frame(InsertProfitsPage)
+    def get_parent(self):
+        return self.parent
 
-    def menu_bar_open_create_cashflows(self):
+    def get_db_pool(self):
         """
-        Opens a frame allowing the user to create new cashflow entries
-        Creates page as well if required
-        :return: None
+        :return: the application's current connection pool (it changes in case the db config is customized)
         """
+        return self.controller.get_db_pool()
 
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message="Please first ensure the database connection to be established")
-
-        # check whether InsertCashflowPage exists already
-        elif InsertCashflowPage in self.frames.keys():
-            self.show_frame(InsertCashflowPage)
+    def get_executor(self):
+        return self.controller.get_executor()
 
-        # create InsertCashflowPage if not
-        else:
-            self.create_page(InsertCashflowPage)
-            self.show_frame(InsertCashflowPage)
-
-    def menu_bar_open_create_roas(self):
+    @staticmethod
+    def show_db_error(error):
         """
-
-        Opens a frame allowing the user to create new ROA entries
-        Creates page as well if required
+        Inform the user about a failed background task
+        :param error: exception raised by the task
         :return: None
         """
 
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message='Please first ensure the database connection to be established')
-
-        # check whether InsertROAPage exists already
-        elif InsertROAPage in self.frames.keys():
-            self.show_frame(InsertROAPage)
-
-        # create InsertROAPage if not
+        if isinstance(error, TaskTimeout):
+            messagebox.showerror("Time-out", "The database did not respond in time, the query has been cancelled. "
+                                             "\nPlease check the connection and try again.")
         else:
-            self.create_page(InsertROAPage)
-            self.show_frame(InsertROAPage)
+            messagebox.showerror("DB Error", "An error has occurred. Please try again. "
+                                             "In case the error remains, please restart the application. \n" +
+                                 str(error))
 
-    def menu_bar_open_create_leverages(self):
+    def get_data_versions(self):
         """
-
-        Opens a frame allowing the user to create new leverage entries
-        Creates page as well if required
-        :return: None
+        :return: tuple of the current versions of depends_on_tables, changed with every modification of a table
         """
-        # TODO: one funtion for all menu bars
-
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message='Please first ensure the database connection to be established')
+        return tuple(DB_Communication.lookup_cache.get_table_version(each_table)
+                     for each_table in self.depends_on_tables)
 
-        # check whether InsertLeveragePage exists already
-        elif InsertLeveragePage in self.frames.keys():
-            self.show_frame(InsertLeveragePage)
+    def is_outdated(self):
+        return self.depends_on_tables is None or self._data_versions != self.get_data_versions()
 
-        # create InsertLeveragePage if not
-        else:
-            self.create_page(InsertLeveragePage)
-            self.show_frame(InsertLeveragePage)
-
-    def menu_bar_open_create_liquidities(self):
+    def refresh_if_outdated(self):
         """
-        Opens a frame allowing the user to create new liquidity entries
-        Creates page as well if required
-        :return: None
+        Query the data of the page in case it is not loaded yet or one of its tables has changed
+        :return: True or False, depending on whether the data has been refreshed
         """
 
-        # TODO: one funtion for all menu bars
-
-        # db_connection is prerequisite for this page
-        if self.db_connection is None:
-            messagebox.showinfo(title='Not possible yet!',
-                                message='Please first ensure the database connection to be established')
+        if not self.is_outdated():
+            return False
 
-        # check whether InsertROAPage exists already
-        elif InsertLiquidityPage in self.frames.keys():
-            self.show_frame(InsertLiquidityPage)
+        # take the versions before querying, so changes during the query mark the page as outdated again
+        if self.depends_on_tables is not None:
+            self._data_versions = self.get_data_versions()
 
-        # create InsertLiquidityPage if not
-        else:
-            self.create_page(InsertLiquidityPage)
-            self.show_frame(InsertLiquidityPage)
+        try:
+            self.refresh_data()
+        except BaseException:
+            self._data_versions = None
+            raise
 
+        return True
 
-class BasicPage(tk.Frame):
-    """
-    Super class for all pages
-    """
+    def mark_outdated(self):
+        """
+        Query the data again the next time the page is shown
+        :return: None
+        """
+        self._data_versions = None
 
-    def __init__(self, parent, controller):
-        tk.Frame.__init__(self, parent)
-        tk.Frame.config(self)
+    def submit_refresh(self, key, function, on_success, on_cancel=None, busy_widgets=()):
+        """
+        Run a query of refresh_data in the background. The page is marked as outdated in case the query cannot be
+        started (a query with the same key is still running), fails or is cancelled
+        :param key: key of the task, see BackgroundExecutor.submit
+        :param function: function taking the BackgroundTask as only argument, must not access Tk widgets
+        :param on_success: function called on the main thread with the result of the function
+        :param on_cancel: function without parameters called on the main thread in case the query fails or is
+                          cancelled
+        :param busy_widgets: widgets disabled while the query runs
+        :return: the BackgroundTask or None in case the query could not be started
+        """
 
-        self.controller = controller
-        self.parent = parent
+        def handle_cancel():
+            self.mark_outdated()
+            if on_cancel is not None:
+                on_cancel()
 
-        self.db_connection = controller.db_connection
+        def handle_error(error):
+            handle_cancel()
+            self.show_db_error(error)
 
-    def get_controller(self):
-        return self.controller
+        task = self.get_executor().submit(key, function, on_success=on_success, on_error=handle_error,
+                                          on_cancel=handle_cancel, busy_widgets=busy_widgets)
 
-    def get_parent(self):
-        return self.parent
+        if task is None:
+            self.mark_outdated()
 
-    def get_db_connection(self):
-        return self.db_connection
+        return task
 
-    def set_db_connection(self, con):
-        self.db_connection = con
+    def refresh_data(self):
+        """
+        Query the data displayed on the page, called only in case the data is outdated
+        :return: None
+        """
+        pass
 
     def update_frame(self):
+        """
+        Update the widgets every time the page is shown, must not query the database
+        :return: None
+        """
         pass
 
 
@@ -476,12 +489,10 @@ class WelcomePage(BasicPage):
         :return: True or False, depending on accessibility
         """
 
-        self.set_db_connection(DB_Communication.connect_to_db())
-
-        if self.controller.get_db_connection() is None:
-            self.controller.set_db_connection(self.db_connection)
+        if self.controller.get_db_pool() is None:
+            self.controller.set_db_pool(DB_Communication.create_connection_pool(listen_for_changes=True))
 
-        if self.controller.get_db_connection() is not None:
+        if self.controller.get_db_pool() is not None:
 
             self.label_connection_check.config(text="Connection to database successfully initiated!")
             return True
@@ -496,8 +507,7 @@ class WelcomePage(BasicPage):
         Create status page and delete Welcome Page
         :return: None
         """
-        self.controller.create_page(StatusPage)
-        self.controller.show_frame_with_delete(StatusPage, WelcomePage)
+        self.controller.open_page(StatusPage, delete_page=WelcomePage)
 
     def update_frame(self):
         """
@@ -514,6 +524,8 @@ class WelcomePage(BasicPage):
 
 class StatusPage(BasicPage):
 
+    depends_on_tables = ("shares",)
+
     def __init__(self, parent, controller):
 
         # call constructor of superclass
@@ -569,39 +581,147 @@ class StatusPage(BasicPage):
         self.label_no_of_incomplete_instances.place(x=700, y=450, anchor='center')
         # TODO: integrate in update Function
 
-    def update_frame(self):
+        # create checkbox to switch the timing of the database queries on and off
+        self.query_statistics_enabled = tk.BooleanVar(value=DB_Instrumentation.is_enabled())
+        self.checkbox_query_statistics = ttk.Checkbutton(self, text="Record query statistics",
+                                                         var=self.query_statistics_enabled,
+                                                         command=self.toggle_query_statistics)
+        self.checkbox_query_statistics.place(x=480, y=250, anchor='center')
+
+        # create button to show the recorded query statistics
+        self.button_query_statistics = ttk.Button(self, text="Query statistics",
+                                                  command=self.create_query_statistics_dialog)
+        self.button_query_statistics.place(x=480, y=300, anchor='center')
+
+    def toggle_query_statistics(self):
         """
-        Update all instaces using values from the db
+        Enable or disable the instrumentation of DB_Communication, the recorded statistics are kept
         :return: None
         """
-        # get latest db_connection
-        self.set_db_connection(self.get_controller().get_db_connection())
 
+        if self.query_statistics_enabled.get():
+            DB_Instrumentation.enable()
+        else:
+            DB_Instrumentation.disable()
+
+    def create_query_statistics_dialog(self):
+        """
+        create dialog window showing the statistics per function, statement and table
+        :return: None
+        """
+
+        list_columns = ["name", "calls", "errors", "rows", "bytes", "mean_time", "p95_time", "max_time"]
+
+        # create a dialog window
+        top = tk.Toplevel()
+        top.title("Query statistics")
+        top.geometry("900x400")
+        top.resizable(0, 0)
+
+        # allow user to choose between functions, statements and tables
+        combobox_kind = ttk.Combobox(top, values=["functions", "statements", "tables"], state="readonly", width=15)
+        combobox_kind.set("functions")
+        combobox_kind.place(x=20, y=20, anchor='nw')
+
+        label_state = ttk.Label(top, text="", font=NORMAL_FONT)
+        label_state.place(x=200, y=22, anchor='nw')
+
+        treeview_statistics = ttk.Treeview(top, show="headings", height=14, columns=list_columns)
+        treeview_statistics.place(x=450, y=200, anchor='center', width=860)
+
+        for each_column in list_columns:
+            # the times are shown in milliseconds
+            treeview_statistics.heading(each_column, text=each_column.replace("_time", " [ms]"))
+            treeview_statistics.column(each_column, width=320 if each_column == "name" else 77,
+                                       stretch=each_column == "name")
+
+        def show_statistics():
+            df_statistics = DB_Instrumentation.instrumentation.get_data_frame(combobox_kind.get())
+
+            treeview_statistics.delete(*treeview_statistics.get_children())
+
+            for each_row in df_statistics.itertuples(index=False):
+                treeview_statistics.insert("", tk.END, values=[each_row.name, each_row.calls, each_row.errors,
+                                                               each_row.rows, each_row.bytes,
+                                                               round(each_row.mean_time * 1000, 2),
+                                                               round(each_row.p95_time * 1000, 2),
+                                                               round(each_row.max_time * 1000, 2)])
+
+            label_state.config(text="Recording" if DB_Instrumentation.is_enabled() else
+                               "Recording disabled, enable it on the status page")
+
+        def reset_statistics():
+            DB_Instrumentation.reset()
+            show_statistics()
+
+        def save_statistics():
+            file_path = filedialog.asksaveasfilename(title="Save query statistics", defaultextension=".json",
+                                                     filetypes=[("json files", "*.json")], parent=top)
+            if not file_path:
+                return
+
+            try:
+                DB_Instrumentation.dump_json(file_path)
+            except OSError as error:
+                messagebox.showerror("Save Error", "The statistics could not be saved: " + str(error), parent=top)
+
+        combobox_kind.bind("<<ComboboxSelected>>", lambda event: show_statistics())
+
+        # create buttons to refresh, reset and save the statistics
+        button_refresh = ttk.Button(top, text="Refresh", command=show_statistics)
+        button_refresh.place(x=300, y=370, anchor='center')
+
+        button_reset = ttk.Button(top, text="Reset", command=reset_statistics)
+        button_reset.place(x=450, y=370, anchor='center')
+
+        button_save = ttk.Button(top, text="Save as JSON", command=save_statistics)
+        button_save.place(x=600, y=370, anchor='center')
+
+        show_statistics()
+
+    def refresh_data(self):
+        """
+        Update all instaces using values from the db
+        :return: None
+        """
         # update number of shares
         self.change_label_number_of_shares()
 
     def change_label_number_of_shares(self):
         """
-        Get the total number of shares that are currently in the database
-        :return: True or False, depending on the query's success
+        Get the total number of shares that are currently in the database, the label is updated as soon as the
+        query in the background has finished
+        :return: True or False, depending on whether the query could be started
         """
 
-        db_connection = self.db_connection
+        db_pool = self.get_db_pool()
 
-        if db_connection is not None:
-
-            sql_cursor = db_connection.cursor()
+        if db_pool is None:
+            self.mark_outdated()
+            messagebox.showerror("Query Error", "The query could not be performed successfully. "
+                                                "Please check the connection and the query code.")
+            return False
 
-            number_of_shares = DB_Communication.get_total_number_of_shares(sql_cursor)
+        def query_number_of_shares(task):
+            with task.cursor(db_pool) as sql_cursor:
+                return DB_Communication.get_total_number_of_shares(sql_cursor)
 
+        def show_number_of_shares(number_of_shares):
             if number_of_shares is not None:
                 self.label_no_of_shares.config(text=number_of_shares)
-                return True
-        else:
-            messagebox.showerror("Query Error", "The query could not be performed successfully. "
-                                                "Please check the connection and the query code.")
+
+        def reset_label():
+            self.label_no_of_shares.config(text="-")
+
+        # the label shows the busy state until the number arrives, a query still running sets it as well
+        if self.submit_refresh("number_of_shares", query_number_of_shares, show_number_of_shares,
+                               on_cancel=reset_label) is None:
             return False
 
+        self.label_no_of_shares.config(text="...")
+
+        return True
+
 
 class ConfigDBPage(BasicPage):
     """
@@ -708,6 +828,9 @@ class ConfigDBPage(BasicPage):
             F.write(str(db_config))
         F.close()
 
+        # make sure the new configuration is used for the next connection pool
+        DB_Communication.read_db_config(reload=True)
+
     def check_connection(self):
         """
         check whether the currently specified configuration gives access to the database
@@ -715,12 +838,13 @@ class ConfigDBPage(BasicPage):
         :return: None
         """
 
-        db_connection = DB_Communication.connect_to_db_with_params(db_name=self.entry_db_name.get(),
-                                                                   host=self.entry_hostname.get(),
-                                                                   user=self.entry_user_name.get(),
-                                                                   password=self.entry_pw.get())
+        db_pool = DB_Communication.create_connection_pool(db_name=self.entry_db_name.get(),
+                                                         host=self.entry_hostname.get(),
+                                                         user=self.entry_user_name.get(),
+                                                         password=self.entry_pw.get(),
+                                                         listen_for_changes=True)
 
-        if db_connection is None:
+        if db_pool is None:
             messagebox.showerror(title="No Connection",
                                  message="It's not possible to get a connection to the database"
                                          " with the chosen parameters. \n The connection has not changed. \n"
@@ -729,10 +853,8 @@ class ConfigDBPage(BasicPage):
             messagebox.showinfo(title="Connection initialized",
                                 message="Connection to database is successfully initialized. \n"
                                         "You can now navigate back to the Welcome Page and start the application.")
-            self.db_connection = db_connection
-
-            # pass db_connection to controller
-            self.controller.set_db_connection(self.db_connection)
+            # pass the new connection pool to controller
+            self.controller.set_db_pool(db_pool)
 
     def show_available_frame(self):
         """
@@ -744,11 +866,12 @@ class ConfigDBPage(BasicPage):
         controller = self.get_controller()
         list_curr_frames = controller.get_frames()
 
+        # the page is kept, so it is not created again the next time the configuration is customized
         if WelcomePage in list_curr_frames:
 
-            controller.show_frame_with_delete(WelcomePage, ConfigDBPage)
+            controller.show_frame(WelcomePage)
         else:
-            controller.show_frame_with_delete(StatusPage, ConfigDBPage)
+            controller.show_frame(StatusPage)
 
 
 class CreateEntitiesPage(BasicPage):
@@ -756,6 +879,8 @@ class CreateEntitiesPage(BasicPage):
     Page allows user to create new entries for company and share
     """
 
+    depends_on_tables = ("sectors", "countries", "categories", "currencies")
+
     def __init__(self, parent, controller):
 
         # call constructor of superclass
@@ -851,29 +976,74 @@ class CreateEntitiesPage(BasicPage):
         self.button_new_share = ttk.Button(self, text="Create share in DB", command=self.create_new_share_in_db)
         self.button_new_share.place(x=200, y=500, anchor='center')
 
-    def update_frame(self, shares_disabled=True, delete_entries=False):
+    def refresh_data(self):
         """
-        update the frame's components
+        query the lookup tables and fill the comboboxes, only called in case one of the tables has changed
         :return: None
         """
 
-        # update sector combobox
-        self.df_sectors = DB_Communication.get_all_sectors(self.db_connection.cursor())
-        self.combobox_sector.set_completion_list(self.df_sectors.sector_name)
+        db_pool = self.get_db_pool()
+
+        def query_lookup_tables(task):
+            # get all lookup tables, they are only queried in case they are not cached
+            list_tables = []
+            for table_name in ("sectors", "countries", "categories", "currencies"):
+                task.check_cancelled()
+                list_tables.append(DB_Communication.get_cached_lookup_table(db_pool, table_name))
+
+            return list_tables
+
+        def show_lookup_tables(list_tables):
+            self.df_sectors, self.df_countries, self.df_categories, self.df_currencies = list_tables
+
+            # update sector combobox
+            self.combobox_sector.set_completion_list(self.df_sectors.sector_name)
 
-        # update country combobox
-        self.df_countries = DB_Communication.get_all_countries(self.db_connection.cursor())
-        self.combobox_country.set_completion_list(self.df_countries.country_name)
+            # update country combobox
+            self.combobox_country.set_completion_list(self.df_countries.country_name)
 
-        # update category combobox
-        self.df_categories = DB_Communication.get_all_categories(self.db_connection.cursor())
-        self.combobox_category.set_completion_list(self.df_categories.category_name)
-        self.combobox_category.current(1)  # category 'value' is most common
+            # update category combobox
+            self.combobox_category.set_completion_list(self.df_categories.category_name)
 
-        # update currency combobox
-        self.df_currencies = DB_Communication.get_all_currencies(self.db_connection.cursor())
-        self.combobox_currency.set_completion_list(self.df_currencies.currency_name)
-        self.combobox_currency.current(0)
+            # update currency combobox
+            self.combobox_currency.set_completion_list(self.df_currencies.currency_name)
+
+            # the page may have been shown before the tables arrived
+            for combobox, index in self.get_default_selections():
+                if not combobox.get():
+                    self.select_default(combobox, index)
+
+        self.submit_refresh("create_entities_lookup_tables", query_lookup_tables, show_lookup_tables)
+
+    def get_default_selections(self):
+        """
+        :return: list of tuples (combobox, index of the item selected by default)
+        """
+
+        # category 'value' is most common
+        return [(self.combobox_category, 1), (self.combobox_currency, 0), (self.combobox_sector, 0),
+                (self.combobox_country, 0)]
+
+    @staticmethod
+    def select_default(combobox, index):
+        """
+        Select an item of a combobox, nothing is selected as long as the items are not loaded
+        :param combobox: ttk.Combobox
+        :param index: index of the item
+        :return: None
+        """
+
+        if len(combobox["values"]) > index:
+            combobox.current(index)
+
+    def update_frame(self, shares_disabled=True, delete_entries=False):
+        """
+        update the frame's components
+        :return: None
+        """
+
+        self.select_default(self.combobox_category, 1)  # category 'value' is most common
+        self.select_default(self.combobox_currency, 0)
 
         if delete_entries:
             # clear isin input
@@ -894,8 +1064,8 @@ class CreateEntitiesPage(BasicPage):
             self.combobox_sector["state"] = "normal"
             self.combobox_country["state"] = "normal"
             self.button_new_company["state"] = "normal"
-            self.combobox_sector.current(0)
-            self.combobox_country.current(0)
+            self.select_default(self.combobox_sector, 0)
+            self.select_default(self.combobox_country, 0)
 
         else:
             # set share elements normal
@@ -932,11 +1102,18 @@ class CreateEntitiesPage(BasicPage):
         if company_name == "":
             messagebox.showinfo("Missing Company Name", "Please insert a company name!")
         else:
-            self.new_company_id = DB_Communication.insert_company(self.db_connection,
-                                                                  company_name,
-                                                                  country_id,
-                                                                  sector_id)
-            self.update_frame(shares_disabled=False)
+            db_pool = self.get_db_pool()
+
+            def insert_company(task):
+                with task.connection(db_pool) as db_connection:
+                    return DB_Communication.insert_company(db_connection, company_name, country_id, sector_id)
+
+            def show_company_created(new_company_id):
+                self.new_company_id = new_company_id
+                self.update_frame(shares_disabled=False)
+
+            self.get_executor().submit("create_company", insert_company, on_success=show_company_created,
+                                       on_error=self.show_db_error, busy_widgets=(self.button_new_company,))
 
     def create_new_share_in_db(self):
         """
@@ -955,26 +1132,43 @@ class CreateEntitiesPage(BasicPage):
             messagebox.showinfo("Missing ISIN", "Please insert an ISIN!")
         elif is_isin_valid(isin):
 
-            # get list of current isin
-            list_isin = DB_Communication.get_all_isin(self.db_connection.cursor())
+            db_pool = self.get_db_pool()
+            dict_share_values = {"isin": isin,
+                                 "category_id": category_id,
+                                 "currency_id": currency_id,
+                                 "comment": comment,
+                                 "company_id": self.new_company_id}
 
-            # allow insert only for unique ISIN
-            if isin in list_isin:
-                messagebox.showerror("Duplicated ISIN", "The given ISIN does already exist.")
-            else:
-                dict_share_values = {"isin": isin,
-                                     "category_id": category_id,
-                                     "currency_id": currency_id,
-                                     "comment": comment,
-                                     "company_id": self.new_company_id}
-                error = DB_Communication.insert_share(self.db_connection, dict_share_values)
-
-                if error is None:
+            def insert_share(task):
+                """
+                :return: tuple of whether the ISIN exists already and the error message of the insert
+                """
+
+                # check the ISIN against the unique index of the database
+                with task.cursor(db_pool) as sql_cursor:
+                    if DB_Communication.does_isin_exist(sql_cursor, isin):
+                        return True, None
+
+                task.check_cancelled()
+
+                with task.connection(db_pool) as db_connection:
+                    return False, DB_Communication.insert_share(db_connection, dict_share_values)
+
+            def show_share_created(result):
+                is_isin_existing, error = result
+
+                # allow insert only for unique ISIN
+                if is_isin_existing:
+                    messagebox.showerror("Duplicated ISIN", "The given ISIN does already exist.")
+                elif error is None:
                     self.update_frame(shares_disabled=True, delete_entries=True)
                     messagebox.showinfo("Success!", "The configured has been successfully created in the database.")
                 else:
                     messagebox.showerror("DB Error", "An error has occured. Please try again."
                                                      "In case the error remains, please restart the application")
+
+            self.get_executor().submit("create_share", insert_share, on_success=show_share_created,
+                                       on_error=self.show_db_error, busy_widgets=(self.button_new_share,))
         elif is_isin_valid(isin) is not None:
             messagebox.showerror("Invalid ISIN", "The entered ISIN is well-formated but invalid. \n"
                                                  "Please change it.")
@@ -1024,6 +1218,9 @@ class ParentInsertPage(BasicPage):
     Parent Page for all insert pages
     """
 
+    # shares are listed by the name of their company
+    depends_on_tables = DB_Communication.lookup_table_definitions["shares"][2]
+
     def __init__(self, parent, controller, insert_type=""):
 
         super().__init__(parent, controller)
@@ -1046,7 +1243,8 @@ class ParentInsertPage(BasicPage):
         self.label_choose_share.place(x=350, y=100, anchor='center')
 
         # create combobox for shares
-        self.combobox_shares = AutocompleteCombobox(self, width=30)
+        # shares are searched by any part of the company name, as there are many of them
+        self.combobox_shares = AutocompleteCombobox(self, width=30, match_mode="substring")
         self.combobox_shares.place(x=525, y=100, anchor='center')
 
         # create label for insert
@@ -1080,16 +1278,38 @@ class ParentInsertPage(BasicPage):
         self.list_spinboxes = []
         self.list_spinboxes_vars = []
 
+        # indicates whether the elements have been reset after construction (see update_frame)
+        self.is_initialized = False
+
+    def refresh_data(self):
+        """
+        query the shares and fill the combobox, only called in case shares or companies have changed
+        :return: None
+        """
+
+        db_pool = self.get_db_pool()
+
+        def show_shares(df_shares):
+            self.df_shares = df_shares
+            self.combobox_shares.set_completion_list(self.df_shares.company_name)
+
+        self.submit_refresh(self.insert_type + "_shares",
+                            lambda task: DB_Communication.get_cached_lookup_table(db_pool, "shares"), show_shares)
+
     def update_frame(self):
         """
-           update the frame's components
+           update the frame's components, the inputs are kept while the user switches between pages
            :return: None
         """
-        pass
+
+        # the elements of the subclasses exist only after construction, so they are reset on the first show
+        if not self.is_initialized:
+            self.update_parent_elements_on_frame()
+            self.is_initialized = True
 
     def update_parent_elements_on_frame(self):
         """
-        update all elements owned by parent class
+        reset all elements owned by parent class, e.g. after the values have been inserted
         :return: None
         """
 
@@ -1111,9 +1331,6 @@ class ParentInsertPage(BasicPage):
         for each_checkbox_var in self.list_checkboxes_vars:
             each_checkbox_var.set(True)
 
-        self.df_shares = DB_Communication.get_all_shares(self.db_connection.cursor())
-        self.combobox_shares.set_completion_list(self.df_shares.company_name)
-
     @staticmethod
     def create_five_year_range():
         # TODO: sinnvollen Ort dafür finden
@@ -1141,31 +1358,34 @@ class ParentInsertPage(BasicPage):
 
         if not errors_detected:
 
-            existing_data = ""
+            db_pool = self.get_db_pool()
+            share_id = self.current_share_id
+            table_name = DB_Communication.get_table_name_for_insert_type(self.insert_type)
 
-            list_data = None
+            def query_existing_data(task):
+                # get tuples for year and profit for the current share as a list
+                with task.cursor(db_pool) as sql_cursor:
+                    return DB_Communication.get_data_for_specific_share(sql_cursor, share_id, table_name)
 
-            # get tuples for year and profit for the current share as a list
-            if self.insert_type == 'liquidity':
-                list_data = DB_Communication.get_data_for_specific_share(self.db_connection.cursor(),
-                                                                         self.current_share_id,
-                                                                         "liquidities")
-            else:
-                list_data = DB_Communication.get_data_for_specific_share(self.db_connection.cursor(),
-                                                                         self.current_share_id,
-                                                                         self.insert_type + "s")
+            def show_existing_data(list_data):
+                existing_data = ""
 
-            # create text according to query results
-            if len(list_data) > 0:
-                for each_datum in list_data:
-                    year, profit = each_datum
+                # create text according to query results
+                if len(list_data) > 0:
+                    for each_datum in list_data:
+                        year, profit = each_datum
 
-                    existing_data += str(year) + ": " + str(profit) + "\n"
-            else:
-                existing_data = "No " + self.insert_type + "s available so far"
+                        existing_data += str(year) + ": " + str(profit) + "\n"
+                else:
+                    existing_data = "No " + self.insert_type + "s available so far"
 
-            # display text in text box
-            self.scrolledtext_data.insert(tk.INSERT, existing_data)
+                # display text in text box
+                self.scrolledtext_data.delete('1.0', tk.END)
+                self.scrolledtext_data.insert(tk.INSERT, existing_data)
+
+            self.get_executor().submit(self.insert_type + "_existing_data", query_existing_data,
+                                       on_success=show_existing_data, on_error=self.show_db_error,
+                                       busy_widgets=(self.button_existing_data,))
 
     def insert_data_in_db(self):
         """
@@ -1230,60 +1450,72 @@ class ParentInsertPage(BasicPage):
                                              "Accordingly, no values will be inserted. \n"
                                              "Please select at least one combobox.")
 
-        list_existing_years = []
+        # the check for existing years and the insert are performed in the background
         if not errors_detected:
+            self.insert_values_in_background(values_to_be_inserted)
 
-            if self.insert_type == "liquidity":
-                # get a list of years for which values are already in the database (only for current insert type)
-                list_existing_years = DB_Communication.get_years_for_specific_share(self.db_connection.cursor(),
-                                                                                    "liquidities",
-                                                                                    self.current_share_id)
-            else:
-                # get a list of years for which values are already in the database (only for current insert type)
-                list_existing_years = DB_Communication.get_years_for_specific_share(self.db_connection.cursor(),
-                                                                                    self.insert_type + "s",
-                                                                                    self.current_share_id)
+    def insert_values_in_background(self, values_to_be_inserted):
+        """
+        Insert the values unless one of their years exists already, the user is informed about the result
+        :param values_to_be_inserted: list of tuples (year, value)
+        :return: None
+        """
 
-        list_duplicated_years = []
+        db_pool = self.get_db_pool()
+        share_id = self.current_share_id
+        insert_type = self.insert_type
+        table_name = DB_Communication.get_table_name_for_insert_type(insert_type)
 
-        # catch each year which has already a value of the insert type
-        for y, p in values_to_be_inserted:
-            if y in list_existing_years:
-                list_duplicated_years.append(y)
+        def insert_values(task):
+            """
+            :return: tuple of the list of already existing years and the error message of the insert
+            """
 
-        # show message which years are already existent
-        if len(list_duplicated_years) > 0 and not errors_detected:
-            message_text = self.insert_type + "(s) for "
+            # get a list of years for which values are already in the database (only for current insert type)
+            with task.cursor(db_pool) as sql_cursor:
+                list_existing_years = DB_Communication.get_years_for_specific_share(sql_cursor, table_name, share_id)
 
-            for each_year in list_duplicated_years:
-                message_text += str(each_year) + " "
+            list_duplicated_years = []
 
-            message_text += "already exist(s). \nPlease use Update section to change the values."
-            messagebox.showerror(title="Year(s) exist already",
-                                 message=message_text)
-            errors_detected = True
+            # catch each year which has already a value of the insert type
+            for y, p in values_to_be_inserted:
+                if y in list_existing_years:
+                    list_duplicated_years.append(y)
 
-        values_per_entry = {}
+            if len(list_duplicated_years) > 0:
+                return list_duplicated_years, None
 
-        # if no errors are found so far, we can insert the values in the database
-        if not errors_detected:
+            task.check_cancelled()
 
             ts_current_time = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             # create a dictionary with all values for each year
-            values_per_entry.update({"year": list([y for y,p in values_to_be_inserted])})
-            values_per_entry.update({"share_ID": list([self.current_share_id for i in range(len(values_to_be_inserted))
-                                                       ])})
-            values_per_entry.update({self.insert_type: list([p for y,p in values_to_be_inserted])})
-            values_per_entry.update({"valid_from": list([ts_current_time for i in range(len(values_to_be_inserted))])})
-            values_per_entry.update({"valid_to": list(['9999-12-31 23:59:59' for i in range(len(values_to_be_inserted))
-                                                       ])})
+            values_per_entry = {"year": [y for y, p in values_to_be_inserted],
+                                "share_ID": [share_id for i in range(len(values_to_be_inserted))],
+                                insert_type: [p for y, p in values_to_be_inserted],
+                                "valid_from": [ts_current_time for i in range(len(values_to_be_inserted))],
+                                "valid_to": [DB_Communication.VALID_TO_OPEN_END] * len(values_to_be_inserted)}
 
             # finally perform insert into db
-            error = DB_Communication.insert_into_data_table(self.db_connection, self.insert_type, values_per_entry)
+            with task.connection(db_pool) as db_connection:
+                return [], DB_Communication.insert_into_data_table(db_connection, insert_type, values_per_entry)
+
+        def show_insert_result(result):
+            list_duplicated_years, error = result
+
+            # show message which years are already existent
+            if len(list_duplicated_years) > 0:
+                message_text = insert_type + "(s) for "
 
-            if error is None:
-                self.update_frame()
+                for each_year in list_duplicated_years:
+                    message_text += str(each_year) + " "
+
+                message_text += "already exist(s). \nPlease use Update > Data to change the values."
+                messagebox.showerror(title="Year(s) exist already",
+                                     message=message_text)
+
+            elif error is None:
+                self.update_parent_elements_on_frame()
                 messagebox.showinfo(title="Success!",
                                     message="The configured data has been successfully created in the database.")
             else:
@@ -1291,6 +1523,10 @@ class ParentInsertPage(BasicPage):
                                      message="An error has occurred. Please try again."
                                              "In case the error remains, please restart the application.")
 
+        self.get_executor().submit(insert_type + "_insert", insert_values, on_success=show_insert_result,
+                                   on_error=self.show_db_error, timeout=60.0,
+                                   busy_widgets=(self.button_insert_data,))
+
 
 class InsertProfitsPage(ParentInsertPage):
     """
@@ -1402,14 +1638,6 @@ class InsertProfitsPage(ParentInsertPage):
         self.entry_profit_5.place(x=425, y=400, anchor='center')
         self.list_entries.append(self.entry_profit_5)
 
-    def update_frame(self):
-        """
-           update the frame's components
-           :return: None
-        """
-
-        self.update_parent_elements_on_frame()
-
 
 class InsertCashflowPage(ParentInsertPage):
     """
@@ -1444,14 +1672,6 @@ class InsertCashflowPage(ParentInsertPage):
         # rearrange insert button
         self.button_insert_data.place(x=480, y=325, anchor='center')
 
-    def update_frame(self):
-        """
-           update the frame's components
-           :return: None
-        """
-
-        self.update_parent_elements_on_frame()
-
 
 class InsertROAPage(ParentInsertPage):
     """
@@ -1506,14 +1726,6 @@ class InsertROAPage(ParentInsertPage):
         # rearrange insert button
         self.button_insert_data.place(x=480, y=375, anchor='center')
 
-    def update_frame(self):
-        """
-           update the frame's components
-           :return: None
-        """
-
-        self.update_parent_elements_on_frame()
-
 
 class InsertLeveragePage(ParentInsertPage):
     """
@@ -1568,14 +1780,6 @@ class InsertLeveragePage(ParentInsertPage):
         # rearrange insert button
         self.button_insert_data.place(x=480, y=375, anchor='center')
 
-    def update_frame(self):
-        """
-        update the frame's components
-        :return: None
-        """
-
-        self.update_parent_elements_on_frame()
-
 
 class InsertLiquidityPage(ParentInsertPage):
     """
@@ -1630,10 +1834,510 @@ class InsertLiquidityPage(ParentInsertPage):
         # rearrange insert_button
         self.button_insert_data.place(x=480, y=375, anchor='center')
 
+
+class UpdateDataPage(BasicPage):
+    """
+    Page allows user to correct the values of a data table, the previous values are kept as closed versions
+    Values are either edited for a single share or imported from a csv file for many shares at once
+    """
+
+    # shares are listed by the name of their company
+    depends_on_tables = DB_Communication.lookup_table_definitions["shares"][2]
+
+    def __init__(self, parent, controller):
+
+        super().__init__(parent, controller)
+
+        # data frame for shares
+        self.df_shares = pd.DataFrame(columns=['ID', 'company_name'])
+
+        # share and table of the loaded values, dictionary year -> tuple of values as loaded from the db
+        self.loaded_share_id = None
+        self.loaded_table_name = None
+        self.dict_loaded_values = {}
+
+        # create heading
+        self.label_heading = ttk.Label(self, text="Update data", font=HEADING1_FONT)
+        self.label_heading.place(x=480, y=50, anchor='center')
+
+        # create label and combobox for choosing the table
+        self.label_choose_table = ttk.Label(self, text="Pick a table", font=NORMAL_FONT)
+        self.label_choose_table.place(x=150, y=100, anchor='center')
+        self.combobox_tables = ttk.Combobox(self, width=28, state="readonly")
+        self.combobox_tables.place(x=325, y=100, anchor='center')
+        self.combobox_tables.bind("<<ComboboxSelected>>", lambda event: self.update_frame())
+
+        # create label and combobox for choosing the share
+        # shares are searched by any part of the company name, as there are many of them
+        self.label_choose_share = ttk.Label(self, text="Pick a share", font=NORMAL_FONT)
+        self.label_choose_share.place(x=150, y=140, anchor='center')
+        self.combobox_shares = AutocompleteCombobox(self, width=30, match_mode="substring")
+        self.combobox_shares.place(x=325, y=140, anchor='center')
+
+        # create button for loading the current values
+        self.button_load_values = ttk.Button(self, text="Load current values", command=self.load_current_values)
+        self.button_load_values.place(x=525, y=140, anchor='center')
+
+        # create label describing the format of the values
+        self.label_format = ttk.Label(self, text="", font=SMALL_FONT)
+        self.label_format.place(x=325, y=180, anchor='center')
+
+        # create text box for the values, one line per year
+        self.scrolledtext_values = ScrolledText(self, width=40, height=13, wrap='none')
+        self.scrolledtext_values.place(x=325, y=315, anchor='center')
+
+        # create button for updating the values of the share
+        self.button_update_values = ttk.Button(self, text="Update values", command=self.update_values_in_db)
+        self.button_update_values.place(x=325, y=475, anchor='center')
+
+        # create section for the import of many shares
+        self.label_heading_import = ttk.Label(self, text="Update many shares", font=LARGE_FONT)
+        self.label_heading_import.place(x=775, y=180, anchor='center')
+
+        self.label_import_format = ttk.Label(self, text="", font=SMALL_FONT, justify='left')
+        self.label_import_format.place(x=775, y=250, anchor='center')
+
+        self.button_import_file = ttk.Button(self, text="Import csv file", command=self.import_file_in_db)
+        self.button_import_file.place(x=775, y=325, anchor='center')
+
+    def refresh_data(self):
+        """
+        query the shares and fill the comboboxes, only called in case shares or companies have changed
+        :return: None
+        """
+
+        db_pool = self.get_db_pool()
+
+        def show_shares(df_shares):
+            self.df_shares = df_shares
+            self.combobox_shares.set_completion_list(self.df_shares.company_name)
+
+        self.submit_refresh("update_data_shares",
+                            lambda task: DB_Communication.get_cached_lookup_table(db_pool, "shares"), show_shares)
+
+        # the data tables might have changed by a migration
+        self.combobox_tables["values"] = self.get_table_names()
+
+        if self.combobox_tables["values"] and self.combobox_tables.get() not in self.combobox_tables["values"]:
+            self.combobox_tables.current(0)
+
+    @staticmethod
+    def get_table_names():
+        """
+        :return: sorted list of all data tables with a year column
+        """
+        return sorted(each_table for each_table in DB_Communication.data_table_value_columns
+                      if each_table not in DB_Communication.data_tables_without_year)
+
     def update_frame(self):
         """
-                update the frame's components
-                :return: None
-                """
+        describe the expected format of the values of the selected table
+        :return: None
+        """
+
+        list_value_columns = DB_Communication.data_table_value_columns.get(self.combobox_tables.get(), [])
+
+        self.label_format.config(text="One line per year: year; " + "; ".join(list_value_columns))
+        self.label_import_format.config(text="Columns separated by ;\n"
+                                             "isin (or share_ID); year; " + "; ".join(list_value_columns) + "\n"
+                                             "Each row replaces the current value\nof the share and year.")
+
+    def get_selected_share_id(self):
+        """
+        :return: ID of the share selected in the combobox, None in case no share is selected
+        """
+
+        try:
+            return self.df_shares.ID[self.df_shares.company_name == self.combobox_shares.get()].iloc[0]
+        except IndexError:
+            messagebox.showerror("No selection", "No combobox item selected! \n"
+                                                 "Please select a share to which the values should refer.")
+            return None
+
+    def load_current_values(self):
+        """
+        Get the current values of the selected share and table and display them for editing
+        :return: None
+        """
+
+        share_id = self.get_selected_share_id()
+
+        if share_id is None:
+            return
+
+        db_pool = self.get_db_pool()
+        table_name = self.combobox_tables.get()
+
+        def query_current_values(task):
+            with task.cursor(db_pool) as sql_cursor:
+                return DB_Communication.get_data_for_shares(sql_cursor, [share_id], [table_name])
+
+        def show_current_values(df_values):
+            self.loaded_share_id = share_id
+            self.loaded_table_name = table_name
+            self.dict_loaded_values = {int(year): tuple(each_row)
+                                       for (each_share_id, year), each_row in zip(df_values.index,
+                                                                                  df_values.values.tolist())}
+
+            self.scrolledtext_values.delete('1.0', tk.END)
+            self.scrolledtext_values.insert(tk.INSERT, "".join(
+                str(year) + "; " + "; ".join(str(each_value) for each_value in list_values) + "\n"
+                for year, list_values in sorted(self.dict_loaded_values.items())))
+
+        self.get_executor().submit("update_load_values", query_current_values, on_success=show_current_values,
+                                   on_error=self.show_db_error, busy_widgets=(self.button_load_values,))
+
+    def parse_values(self, table_name):
+        """
+        Parse the lines of the text box
+        :param table_name: name of the data table the values belong to
+        :return: dictionary year -> tuple of values, None in case of invalid input (the user has been informed)
+        """
+
+        number_of_values = len(DB_Communication.data_table_value_columns[table_name])
+        dict_values = {}
+
+        for line_number, each_line in enumerate(self.scrolledtext_values.get('1.0', tk.END).splitlines(), start=1):
+
+            if each_line.strip() == "":
+                continue
+
+            list_fields = [each_field.strip() for each_field in each_line.split(";")]
+
+            try:
+                if len(list_fields) != number_of_values + 1:
+                    raise ValueError
+
+                year = int(list_fields[0])
+                dict_values[year] = tuple(float(each_field) for each_field in list_fields[1:])
+
+            except ValueError:
+                messagebox.showerror(title="Value Error",
+                                     message="Line " + str(line_number) + " is invalid. \nPlease insert the year and " +
+                                             str(number_of_values) + " number(s) separated by ;")
+                return None
+
+        return dict_values
+
+    def update_values_in_db(self):
+        """
+        Write the changed and new values of the text box as new versions of the share's values
+        :return: None
+        """
+
+        share_id = self.get_selected_share_id()
+
+        if share_id is None:
+            return
+
+        table_name = self.combobox_tables.get()
+        dict_values = self.parse_values(table_name)
+
+        if dict_values is None:
+            return
+
+        # values which are unchanged do not get a new version
+        if share_id == self.loaded_share_id and table_name == self.loaded_table_name:
+            dict_values = {year: list_values for year, list_values in dict_values.items()
+                           if self.dict_loaded_values.get(year) != list_values}
+
+        if not dict_values:
+            messagebox.showinfo(title="Nothing to update", message="None of the values has been changed.")
+            return
+
+        list_years = sorted(dict_values)
+        list_value_columns = DB_Communication.data_table_value_columns[table_name]
+
+        values = {"share_ID": [share_id] * len(list_years), "year": list_years}
+        for i, each_column in enumerate(list_value_columns):
+            values[each_column] = [dict_values[year][i] for year in list_years]
+
+        db_pool = self.get_db_pool()
+
+        def update_values(task):
+            with task.connection(db_pool) as db_connection:
+                return DB_Communication.update_data_table(db_connection, table_name, values)
+
+        def show_update_result(result):
+            self.show_update_result(result)
+            self.load_current_values()
+
+        self.get_executor().submit("update_values", update_values, on_success=show_update_result,
+                                   on_error=self.show_update_error, timeout=60.0,
+                                   busy_widgets=(self.button_update_values, self.button_import_file))
+
+    def import_file_in_db(self):
+        """
+        Update the values of many shares from a csv file in one transaction
+        :return: None
+        """
+
+        file_path = filedialog.askopenfilename(title="Import values", filetypes=[("csv files", "*.csv")])
+
+        if not file_path:
+            return
+
+        db_pool = self.get_db_pool()
+        table_name = self.combobox_tables.get()
+
+        def import_values(task):
+
+            df_values = pd.read_csv(file_path, sep=';', encoding='utf-8-sig')
+
+            # shares are identified by their ISIN, unless the file contains their IDs
+            if "share_ID" not in df_values.columns:
+
+                if "isin" not in df_values.columns:
+                    raise ValueError("The file has neither a column isin nor share_ID.")
+
+                with task.cursor(db_pool) as sql_cursor:
+                    dict_share_ids = DB_Communication.get_share_ids_for_isins(sql_cursor,
+                                                                              df_values.isin.unique().tolist())
+
+                list_unknown_isins = sorted(set(df_values.isin) - set(dict_share_ids))
+                if list_unknown_isins:
+                    raise ValueError(str(len(list_unknown_isins)) + " unknown ISIN(s), e.g. " +
+                                     ", ".join(map(str, list_unknown_isins[:5])))
+
+                df_values["share_ID"] = df_values.isin.map(dict_share_ids)
+
+            task.check_cancelled()
+
+            with task.connection(db_pool) as db_connection:
+                return DB_Communication.update_data_table(db_connection, table_name, df_values)
+
+        self.get_executor().submit("update_import", import_values, on_success=self.show_update_result,
+                                   on_error=self.show_update_error, timeout=300.0,
+                                   busy_widgets=(self.button_update_values, self.button_import_file))
+
+    @staticmethod
+    def show_update_result(result):
+        """
+        :param result: tuple (number of closed versions, number of new versions)
+        :return: None
+        """
+
+        number_of_closed_versions, number_of_new_versions = result
+
+        messagebox.showinfo(title="Success!",
+                            message=str(number_of_new_versions) + " value(s) written, " +
+                                    str(number_of_closed_versions) + " of them replaced a previous value.")
+
+    def show_update_error(self, error):
+        """
+        :param error: exception raised by the update
+        :return: None
+        """
+
+        # invalid input is reported as is, nothing has been written
+        if isinstance(error, (ValueError, KeyError, OSError)):
+            messagebox.showerror(title="Invalid values", message=str(error) + "\nNo values have been updated.")
+        else:
+            self.show_db_error(error)
+
+
+class ScreenerPage(BasicPage):
+    """
+    Page allows user to screen all shares by conditions on their data and their sector and country
+    """
+
+    # the sectors and countries are offered as attribute filters
+    depends_on_tables = ("sectors", "countries")
+
+    # number of metric filters offered on the page
+    NUMBER_OF_METRIC_FILTERS = 4
+
+    def __init__(self, parent, controller):
+
+        super().__init__(parent, controller)
+
+        # create heading
+        self.label_heading = ttk.Label(self, text="Screener", font=HEADING1_FONT)
+        self.label_heading.place(x=480, y=40, anchor='center')
+
+        # create headings of the metric filters
+        for text, x in (("Metric", 150), ("Operator", 290), ("Value", 390), ("Years", 490)):
+            ttk.Label(self, text=text, font=NORMAL_FONT).place(x=x, y=80, anchor='center')
+
+        # create one row of widgets per metric filter, an empty metric disables the filter
+        self.list_metric_filter_widgets = []
+
+        for i in range(self.NUMBER_OF_METRIC_FILTERS):
+
+            y = 110 + i * 35
+
+            combobox_metric = ttk.Combobox(self, width=30, state="readonly")
+            combobox_metric.place(x=150, y=y, anchor='center')
+
+            combobox_operator = ttk.Combobox(self, width=5, state="readonly", values=DB_Screener.OPERATORS)
+            combobox_operator.current(0)
+            combobox_operator.place(x=290, y=y, anchor='center')
+
+            entry_value = ttk.Entry(self, width=12)
+            entry_value.place(x=390, y=y, anchor='center')
+
+            spinbox_years = ttk.Spinbox(self, from_=1, to=10, width=5, state="readonly")
+            spinbox_years.set(1)
+            spinbox_years.place(x=490, y=y, anchor='center')
+
+            self.list_metric_filter_widgets.append((combobox_metric, combobox_operator, entry_value, spinbox_years))
+
+        # create input for the latest year taken into account
+        self.label_year = ttk.Label(self, text="Up to year (optional)", font=NORMAL_FONT)
+        self.label_year.place(x=150, y=260, anchor='center')
+        self.entry_year = ttk.Entry(self, width=12)
+        self.entry_year.place(x=290, y=260, anchor='center')
+
+        # create lists of sectors and countries, nothing selected means all of them
+        self.label_sectors = ttk.Label(self, text="Sectors", font=NORMAL_FONT)
+        self.label_sectors.place(x=650, y=80, anchor='center')
+        self.listbox_sectors = tk.Listbox(self, selectmode=tk.MULTIPLE, exportselection=False, height=10, width=24)
+        self.listbox_sectors.place(x=650, y=175, anchor='center')
+
+        self.label_countries = ttk.Label(self, text="Countries", font=NORMAL_FONT)
+        self.label_countries.place(x=840, y=80, anchor='center')
+        self.listbox_countries = tk.Listbox(self, selectmode=tk.MULTIPLE, exportselection=False, height=10, width=24)
+        self.listbox_countries.place(x=840, y=175, anchor='center')
+
+        # create button to start the screening
+        self.button_screen = ttk.Button(self, text="Screen", command=self.screen_shares)
+        self.button_screen.place(x=480, y=260, anchor='center')
+
+        # create label for the number of found shares
+        self.label_result = ttk.Label(self, text="", font=NORMAL_FONT)
+        self.label_result.place(x=650, y=260, anchor='center')
+
+        # create table for the found shares
+        self.treeview_result = ttk.Treeview(self, show="headings", height=12)
+        self.treeview_result.place(x=480, y=420, anchor='center', width=900)
+
+    def refresh_data(self):
+        """
+        query the sectors and countries, only called in case they have changed
+        :return: None
+        """
+
+        db_pool = self.get_db_pool()
+
+        def query_names(task):
+            list_names = []
+            for table_name, column_name in (("sectors", "sector_name"), ("countries", "country_name")):
+                task.check_cancelled()
+                list_names.append(DB_Communication.get_cached_lookup_table(db_pool, table_name)[column_name]
+                                  .astype(str).tolist())
+
+            return list_names
+
+        def show_names(list_names):
+            for listbox, list_table_names in zip((self.listbox_sectors, self.listbox_countries), list_names):
+
+                # keep the selection of names which still exist
+                set_selected = {listbox.get(i) for i in listbox.curselection()}
+
+                listbox.delete(0, tk.END)
+                for i, each_name in enumerate(list_table_names):
+                    listbox.insert(tk.END, each_name)
+                    if each_name in set_selected:
+                        listbox.selection_set(i)
+
+        self.submit_refresh("screener_lookup_tables", query_names, show_names)
+
+    def update_frame(self):
+        """
+        offer all value columns of the data tables as metrics, the tables might have changed by a migration
+        :return: None
+        """
+
+        list_metrics = [""] + [table_name + "." + column_name
+                               for table_name, list_columns in sorted(DB_Communication.data_table_value_columns.items())
+                               for column_name in list_columns]
+
+        for combobox_metric, combobox_operator, entry_value, spinbox_years in self.list_metric_filter_widgets:
+            combobox_metric["values"] = list_metrics
+
+    def create_filters(self):
+        """
+        Create the filters from the input of the user
+        :return: list of filters, None in case of invalid input (the user has been informed)
+        """
+
+        list_filters = []
+
+        for i, (combobox_metric, combobox_operator, entry_value, spinbox_years) \
+                in enumerate(self.list_metric_filter_widgets, start=1):
+
+            if combobox_metric.get() == "":
+                continue
+
+            table_name, column_name = combobox_metric.get().split(".", 1)
+
+            try:
+                list_filters.append(DB_Screener.MetricFilter((table_name, column_name), combobox_operator.get(),
+                                                             float(entry_value.get().replace(",", ".")),
+                                                             int(spinbox_years.get())))
+            except ValueError:
+                messagebox.showerror(title="Value Error",
+                                     message="The value of filter " + str(i) + " is invalid. \n"
+                                             "Please insert a number (e.g. 0.08 for 8 %).")
+                return None
+
+        for attribute, listbox in (("sector", self.listbox_sectors), ("country", self.listbox_countries)):
+            if listbox.curselection():
+                list_filters.append(DB_Screener.AttributeFilter(attribute,
+                                                                [listbox.get(i) for i in listbox.curselection()]))
+
+        return list_filters
+
+    def screen_shares(self):
+        """
+        Query all shares fulfilling the filters in the background and display them
+        :return: None
+        """
+
+        list_filters = self.create_filters()
+
+        if list_filters is None:
+            return
+
+        if not list_filters:
+            messagebox.showinfo(title="No filter", message="Please choose at least one metric, sector or country.")
+            return
+
+        year = None
+        if self.entry_year.get().strip():
+            try:
+                year = int(self.entry_year.get())
+            except ValueError:
+                messagebox.showerror(title="Value Error", message="Please insert a valid year or leave it empty.")
+                return
+
+        db_pool = self.get_db_pool()
+
+        def query_shares(task):
+            with task.cursor(db_pool) as sql_cursor:
+                return DB_Screener.screen_shares(sql_cursor, list_filters, year)
+
+        self.get_executor().submit("screener", query_shares, on_success=self.show_result,
+                                   on_error=self.show_db_error, busy_widgets=(self.button_screen,))
+
+    def show_result(self, df_result):
+        """
+        :param df_result: data frame as returned by DB_Screener.screen_shares
+        :return: None
+        """
+
+        # the ID is only needed internally, the metric columns follow the description of the share
+        list_columns = [each_column for each_column in df_result.columns if each_column != "share_ID"]
+
+        self.treeview_result.delete(*self.treeview_result.get_children())
+        self.treeview_result["columns"] = list_columns
+
+        for each_column in list_columns:
+            self.treeview_result.heading(each_column, text=each_column)
+            self.treeview_result.column(each_column, width=100, stretch=True)
+
+        for each_row in df_result[list_columns].itertuples(index=False, name=None):
+            self.treeview_result.insert("", tk.END, values=[round(each_value, 4) if isinstance(each_value, float)
+                                                            else each_value for each_value in each_row])
 
-        self.update_parent_elements_on_frame()
\ No newline at end of file
+        self.label_result.config(text=str(len(df_result)) + " share(s) found")
\ No newline at end of file
@@ -0,0 +1,320 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.extensions
+"""
+    This python file implements the execution of database work in the background for the GUI.
+    Tasks run on a pool of worker threads, so the Tk main loop never waits for a round trip to the database.
+    Results are passed back to the main thread by polling with after(), as Tk widgets must only be accessed
+    from the thread running the main loop. Running queries can be cancelled on the server and time out.
+"""
+
+# milliseconds between two checks for finished tasks (one frame at 60 fps)
+POLL_INTERVAL_MS = 16
+
+
+class TaskCancelled(Exception):
+    """
+    Raised in case a task has been cancelled before or while it was running
+    """
+    pass
+
+
+class TaskTimeout(TaskCancelled):
+    """
+    Raised in case a task has been cancelled because it exceeded its time-out
+    """
+    pass
+
+
+class BackgroundTask:
+    """
+    A single unit of work, passed to the task function to allow cancellation of its queries
+    """
+
+    def __init__(self, key, timeout=None):
+        """
+        :param key: key of the task, only one task per key can run at the same time
+        :param timeout: seconds after which the task gets cancelled, None for no time-out
+        """
+
+        self.key = key
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+        self.is_timed_out = False
+
+        self._cancel_event = threading.Event()
+
+        # connections currently used by the task, their queries are cancelled on the server on cancellation
+        self._connections = set()
+        self._lock = threading.Lock()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """
+        Raise TaskCancelled in case the task has been cancelled, to be called between steps of the task
+        :return: None
+        """
+
+        if self._cancel_event.is_set():
+            raise TaskTimeout("Time-out after " + str(self.timeout) + " seconds") if self.is_timed_out \
+                else TaskCancelled("Task " + str(self.key) + " has been cancelled")
+
+    def cancel(self, timed_out=False):
+        """
+        Cancel the task, a query running on one of its connections is aborted by the database
+        :param timed_out: indicates whether the cancellation is caused by the time-out
+        :return: None
+        """
+
+        with self._lock:
+            self.is_timed_out = self.is_timed_out or timed_out
+            self._cancel_event.set()
+
+            for conn in self._connections:
+                try:
+                    # thread-safe, sends a cancel request to the server over a separate connection
+                    conn.cancel()
+                except psycopg2.Error:
+                    pass
+
+    @contextmanager
+    def connection(self, db_pool):
+        """
+        Borrow a connection from the pool for the task, it gets cancelled together with the task
+        :param db_pool: ConnectionPool of the database
+        :return: psycopg2 connection
+        """
+
+        self.check_cancelled()
+
+        with db_pool.connection() as conn:
+
+            with self._lock:
+                self._connections.add(conn)
+
+            try:
+                # the task might have been cancelled while waiting for the connection
+                self.check_cancelled()
+
+                yield conn
+
+            except psycopg2.extensions.QueryCanceledError:
+                # report the cancellation instead of the database error it caused
+                self.check_cancelled()
+                raise
+
+            finally:
+                with self._lock:
+                    self._connections.discard(conn)
+
+    @contextmanager
+    def cursor(self, db_pool):
+        """
+        Same as connection, but provides a cursor
+        :param db_pool: ConnectionPool of the database
+        :return: psycopg2 cursor
+        """
+
+        with self.connection(db_pool) as conn:
+            sql_cursor = conn.cursor()
+            try:
+                yield sql_cursor
+            finally:
+                sql_cursor.close()
+
+
+class BackgroundExecutor:
+    """
+    Runs functions on worker threads and calls their callbacks on the Tk main thread
+    """
+
+    def __init__(self, tk_root, max_workers=4, poll_interval=POLL_INTERVAL_MS):
+        """
+        :param tk_root: Tk instance, used for after() and the busy cursor
+        :param max_workers: number of worker threads
+        :param poll_interval: milliseconds between two checks for finished tasks
+        """
+
+        self.tk_root = tk_root
+        self.poll_interval = poll_interval
+
+        self._thread_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ShareTool-Worker")
+
+        # key -> tuple (BackgroundTask, on_success, on_error, on_cancel, list of busy widgets with their previous
+        # state)
+        self._running_tasks = {}
+
+        # finished tasks handed over from the worker threads, tuples (task, result, error)
+        self._finished_tasks = queue.Queue()
+
+        self._poll_id = None
+        self._is_shut_down = False
+
+    def is_running(self, key):
+        return key in self._running_tasks
+
+    def has_running_tasks(self):
+        return len(self._running_tasks) > 0
+
+    def submit(self, key, function, on_success=None, on_error=None, timeout=30.0, busy_widgets=(), on_cancel=None):
+        """
+        Run a function in the background, a second submission for a key still running is ignored
+        :param key: key of the task (e.g. the name of the action)
+        :param function: function taking the BackgroundTask as only argument, must not access Tk widgets
+        :param on_success: function called on the main thread with the result of the function
+        :param on_error: function called on the main thread with the raised exception, not called for
+                         cancellations but for time-outs (TaskTimeout)
+        :param timeout: seconds after which the task gets cancelled, None for no time-out
+        :param busy_widgets: widgets disabled while the task runs
+        :param on_cancel: function without parameters called on the main thread in case the task has been cancelled
+                          (except for time-outs, see on_error)
+        :return: the BackgroundTask or None in case a task with the key is still running
+        """
+
+        if self._is_shut_down or key in self._running_tasks:
+            return None
+
+        task = BackgroundTask(key, timeout)
+
+        # disable the widgets and remember their state, so it can be restored afterwards
+        list_busy_widgets = []
+        for each_widget in busy_widgets:
+            list_busy_widgets.append((each_widget, str(each_widget.cget("state"))))
+            each_widget.config(state="disabled")
+
+        self._running_tasks[key] = (task, on_success, on_error, on_cancel, list_busy_widgets)
+        self.tk_root.config(cursor="watch")
+
+        self._thread_pool.submit(self._run_task, task, function)
+
+        if self._poll_id is None:
+            self._poll_id = self.tk_root.after(self.poll_interval, self._poll)
+
+        return task
+
+    def _run_task(self, task, function):
+        """
+        Executed on a worker thread
+        """
+
+        try:
+            task.check_cancelled()
+            result = function(task)
+            task.check_cancelled()
+            self._finished_tasks.put((task, result, None))
+
+        except BaseException as error:
+            self._finished_tasks.put((task, None, error))
+
+    def _poll(self):
+        """
+        Check for finished and timed out tasks, executed on the main thread
+        """
+
+        self._poll_id = None
+
+        while True:
+            try:
+                task, result, error = self._finished_tasks.get_nowait()
+            except queue.Empty:
+                break
+
+            self._finish_task(task, result, error)
+
+        now = time.monotonic()
+
+        for task, on_success, on_error, on_cancel, list_busy_widgets in list(self._running_tasks.values()):
+            if task.deadline is not None and now > task.deadline and not task.is_cancelled():
+                task.cancel(timed_out=True)
+
+        # keep polling only while tasks are running, an idle GUI does not need to be woken up
+        if self._running_tasks and not self._is_shut_down:
+            self._poll_id = self.tk_root.after(self.poll_interval, self._poll)
+
+    def _finish_task(self, task, result, error):
+        """
+        Restore the busy widgets and call the callbacks of a finished task, executed on the main thread
+        """
+
+        task_entry = self._running_tasks.get(task.key)
+
+        # ignore results of tasks which are not registered anymore (e.g. after a shutdown)
+        if task_entry is None or task_entry[0] is not task:
+            return
+
+        del self._running_tasks[task.key]
+        task, on_success, on_error, on_cancel, list_busy_widgets = task_entry
+
+        for each_widget, state in list_busy_widgets:
+            try:
+                each_widget.config(state=state)
+            except Exception:
+                # the widget has been destroyed in the meantime
+                pass
+
+        if not self._running_tasks:
+            self.tk_root.config(cursor="")
+
+        if task.is_timed_out and error is not None:
+            error = TaskTimeout("Time-out after " + str(task.timeout) + " seconds")
+
+        if error is None:
+            if on_success is not None:
+                on_success(result)
+
+        elif isinstance(error, TaskCancelled) and not isinstance(error, TaskTimeout):
+            if on_cancel is not None:
+                on_cancel()
+
+        elif on_error is not None:
+            on_error(error)
+
+    def cancel(self, key):
+        """
+        Cancel a running task, only its on_cancel callback is called as soon as the task has stopped
+        :param key: key of the task
+        :return: True in case a task has been cancelled
+        """
+
+        task_entry = self._running_tasks.get(key)
+
+        if task_entry is None:
+            return False
+
+        task_entry[0].cancel()
+        return True
+
+    def cancel_all(self):
+        """
+        Cancel all running tasks
+        :return: number of cancelled tasks
+        """
+
+        list_keys = list(self._running_tasks.keys())
+
+        for each_key in list_keys:
+            self.cancel(each_key)
+
+        return len(list_keys)
+
+    def shutdown(self):
+        """
+        Cancel all tasks and stop the worker threads, to be called before the application is closed
+        :return: None
+        """
+
+        self._is_shut_down = True
+        self.cancel_all()
+
+        if self._poll_id is not None:
+            self.tk_root.after_cancel(self._poll_id)
+            self._poll_id = None
+
+        self._thread_pool.shutdown(wait=False)
@@ -0,0 +1,152 @@
+import bisect
+import re
+"""
+    This python file implements the search index behind the AutocompleteCombobox.
+    The values are sorted once by their case-folded form, so all values starting with a prefix form a contiguous
+    range found by binary search. While the user keeps typing, the search is narrowed to the hits of the previous
+    input instead of starting over. Substring and fuzzy (subsequence) matching are supported as well.
+"""
+
+# supported match modes
+MATCH_MODES = ("prefix", "substring", "fuzzy")
+
+# character sorting behind all others, appended to a prefix to find the end of its range
+_MAX_CHAR = '\U0010ffff'
+
+
+class CompletionIndex:
+    """
+    Case-insensitive index of completion values with prefix, substring and fuzzy lookup
+    """
+
+    def __init__(self, values):
+        """
+        :param values: iterable of values (converted to strings)
+        """
+
+        list_values = [str(each_value) for each_value in values]
+
+        # stable sort by the case-folded value, ties keep their original order
+        list_order = sorted(range(len(list_values)), key=lambda i: list_values[i].casefold())
+
+        self.values = [list_values[i] for i in list_order]
+        self._keys = [each_value.casefold() for each_value in self.values]
+
+        # all keys in one string, so substring and fuzzy matches are searched by the regex engine instead of a loop
+        # over the keys, offsets holds the start of each key (plus the end of the string)
+        self._joined_keys = "".join(each_key.replace("\n", " ") + "\n" for each_key in self._keys)
+        self._offsets = [0]
+        for each_key in self._keys:
+            self._offsets.append(self._offsets[-1] + len(each_key) + 1)
+
+        # last query and its hits per mode, used for incremental narrowing
+        # prefix: (prefix, lo, hi), substring/fuzzy: (query, list of indices, position the search stopped at)
+        self._last_prefix_query = ("", 0, len(self._keys))
+        self._last_queries = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def get_value(self, idx):
+        return self.values[idx]
+
+    def prefix_range(self, text):
+        """
+        Find the range of all values starting with the text (case-insensitive)
+        :param text: prefix typed by the user
+        :return: tuple (lo, hi), the values self.values[lo:hi] start with the text
+        """
+
+        prefix = text.casefold()
+        last_prefix, last_lo, last_hi = self._last_prefix_query
+
+        # a longer input can only match values within the range of its beginning
+        if prefix.startswith(last_prefix):
+            lo, hi = last_lo, last_hi
+        else:
+            lo, hi = 0, len(self._keys)
+
+        lo = bisect.bisect_left(self._keys, prefix, lo, hi)
+        hi = bisect.bisect_left(self._keys, prefix + _MAX_CHAR, lo, hi)
+
+        self._last_prefix_query = (prefix, lo, hi)
+
+        return lo, hi
+
+    def _find_indices(self, text, mode, limit=None):
+        """
+        Find the indices of the values matching the text as substring or subsequence
+        :param text: input of the user
+        :param mode: substring or fuzzy
+        :param limit: stop searching after this number of hits, None for all
+        :return: list of indices in sorted order
+        """
+
+        query = text.casefold().replace("\n", " ")
+
+        if mode == "substring":
+            pattern = re.compile(re.escape(query))
+        else:
+            # characters have to appear in the given order, with other characters of the same key in between
+            # (negated classes instead of lazy wildcards, so the regex engine never has to backtrack)
+            pattern = re.compile(re.escape(query[:1]) + "".join("[^\n" + re.escape(each_char) + "]*" +
+                                                               re.escape(each_char) for each_char in query[1:]))
+
+        last_query, list_last_indices, position = self._last_queries.get(mode, (None, None, 0))
+
+        # extending the input keeps substrings and subsequences intact, so only the previous hits have to be checked
+        # before the search continues where it stopped
+        if last_query is not None and query.startswith(last_query):
+            list_indices = [i for i in list_last_indices if pattern.search(self._keys[i])]
+        else:
+            list_indices = []
+            position = 0
+
+        while (limit is None or len(list_indices) < limit) and position < len(self._joined_keys):
+
+            match = pattern.search(self._joined_keys, position)
+
+            if match is None:
+                position = len(self._joined_keys)
+                break
+
+            # continue with the next key, each key is reported once
+            idx = bisect.bisect_right(self._offsets, match.start()) - 1
+            list_indices.append(idx)
+            position = self._offsets[idx + 1]
+
+        self._last_queries[mode] = (query, list_indices, position)
+
+        return list_indices
+
+    def find(self, text, mode="prefix", limit=None):
+        """
+        Get all values matching the text
+        In substring and fuzzy mode values starting with the text are listed first
+        :param text: input of the user
+        :param mode: prefix, substring or fuzzy
+        :param limit: maximum number of returned values, None for all
+        :return: list of matching values
+        """
+
+        if mode not in MATCH_MODES:
+            raise ValueError("Unknown match mode " + str(mode))
+
+        lo, hi = self.prefix_range(text)
+
+        if mode == "prefix" or not text:
+            return self.values[lo:hi if limit is None else min(hi, lo + limit)]
+
+        list_values = self.values[lo:hi]
+
+        # values starting with the text match as well, so at most limit hits are required
+        for i in self._find_indices(text, mode, limit):
+
+            if limit is not None and len(list_values) >= limit:
+                break
+
+            # prefix matches are already listed
+            if not lo <= i < hi:
+                list_values.append(self.values[i])
+
+        return list_values if limit is None else list_values[:limit]
@@ -1,4 +1,5 @@
 import string
+import numpy as np
 
 
 def is_isin_valid(string_isin):
@@ -62,3 +63,142 @@ def is_isin_valid(string_isin):
         return True
     else:
         return False
+
+
+# status codes returned by validate_isin_batch
+ISIN_FORMAT_ERROR = 0
+ISIN_INVALID_CHECKSUM = 1
+ISIN_VALID = 2
+
+# digit sum of each doubled digit (e.g. 7 -> 14 -> 1 + 4 = 5), indexed by the digit
+DOUBLED_DIGIT_SUMS = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9])
+
+
+def calculate_check_digits(array_values):
+    """
+    Calculate the check digits for the first 11 characters of several ISINs at once
+    Same algorithm as in is_isin_valid: letters are expanded to two digits (A = 10, ..., Z = 35) and
+    every second digit, starting with the last one, is doubled (Luhn algorithm)
+    :param array_values: integer array of shape (number of ISINs, 11), digits 0-9 and letters 10-35
+    :return: integer array of the expected check digits
+    """
+
+    array_values = np.asarray(array_values, dtype=np.int64).reshape(-1, 11)
+
+    # letters are expanded to two digits, so the position of a digit depends on all characters to its right
+    is_letter = array_values >= 10
+    number_of_digits = 1 + is_letter
+
+    # distance of the ones digit of each character to the end of the expanded digit string
+    distance_to_end = np.cumsum(number_of_digits[:, ::-1], axis=1)[:, ::-1] - number_of_digits
+
+    ones = array_values % 10
+    tens = array_values // 10
+
+    # digits with an even distance to the end get doubled, the tens digit is one position further away
+    sum_ones = np.where(distance_to_end % 2 == 0, DOUBLED_DIGIT_SUMS[ones], ones).sum(axis=1)
+    sum_tens = np.where(is_letter,
+                        np.where(distance_to_end % 2 == 1, DOUBLED_DIGIT_SUMS[tens], tens),
+                        0).sum(axis=1)
+
+    return (10 - (sum_ones + sum_tens) % 10) % 10
+
+
+def _validate_isin_scalar(string_isin):
+    """
+    Validate a single ISIN with is_isin_valid and calculate its check digit, fallback for non ASCII input
+    :param string_isin: ISIN to be checked
+    :return: tuple of status code and expected check digit (-1 in case of a format error)
+    """
+
+    try:
+        is_valid = is_isin_valid(string_isin)
+
+    except ValueError:
+        # is_isin_valid cannot convert non ASCII letters, such an ISIN is not well-formatted either
+        return ISIN_FORMAT_ERROR, -1
+
+    if is_valid is None:
+        return ISIN_FORMAT_ERROR, -1
+
+    # same conversion as in is_isin_valid
+    list_values = [int(each_char) if each_char.isdigit()
+                   else string.ascii_uppercase.index(each_char.upper()) + 9 + 1
+                   for each_char in string_isin[:-1]]
+
+    check_digit = int(calculate_check_digits([list_values])[0])
+
+    return (ISIN_VALID if is_valid else ISIN_INVALID_CHECKSUM), check_digit
+
+
+def validate_isin_batch(isins):
+    """
+    Checks many ISINs for validity at once, the result matches is_isin_valid for every input:
+    ISIN_FORMAT_ERROR corresponds to None, ISIN_INVALID_CHECKSUM to False and ISIN_VALID to True
+    (inputs for which is_isin_valid raises an error, like non ASCII letters, are reported as format error)
+    :param isins: iterable or numpy array of ISIN strings
+    :return: tuple of two numpy arrays, the status code and the expected check digit (-1 for format errors)
+             of each ISIN
+    """
+
+    if isinstance(isins, np.ndarray) and isins.dtype.kind == 'U':
+        array_isins = isins.ravel()
+        array_lengths = np.char.str_len(array_isins)
+
+    else:
+        # numpy unicode arrays drop trailing NUL characters, so the lengths are taken from the original strings
+        array_originals = np.asarray(isins if isinstance(isins, np.ndarray) else list(isins),
+                                     dtype=object).ravel()
+        if not all(isinstance(each_isin, str) for each_isin in array_originals):
+            raise TypeError("validate_isin_batch expects strings")
+        array_lengths = np.fromiter((len(each_isin) for each_isin in array_originals), dtype=np.int64,
+                                    count=array_originals.shape[0])
+        array_isins = array_originals.astype(str)
+
+    number_of_isins = array_isins.shape[0]
+
+    array_status = np.full(number_of_isins, ISIN_FORMAT_ERROR, dtype=np.int8)
+    array_check_digits = np.full(number_of_isins, -1, dtype=np.int8)
+
+    # only strings of exactly 12 characters can be well-formatted
+    is_length_valid = array_lengths == 12
+
+    if not is_length_valid.any():
+        return array_status, array_check_digits
+
+    # matrix of the unicode code points, one row per ISIN
+    array_codes = array_isins[is_length_valid].astype('U12').view(np.uint32).reshape(-1, 12).astype(np.int64)
+    idx_length_valid = np.flatnonzero(is_length_valid)
+
+    # non ASCII characters follow the unicode rules of str.isalnum etc., so they are checked one by one
+    is_ascii = (array_codes < 128).all(axis=1)
+
+    for idx in idx_length_valid[~is_ascii]:
+        array_status[idx], array_check_digits[idx] = _validate_isin_scalar(str(array_isins[idx]))
+
+    array_codes = array_codes[is_ascii]
+    idx_ascii = idx_length_valid[is_ascii]
+
+    is_digit = (array_codes >= ord('0')) & (array_codes <= ord('9'))
+    is_upper = (array_codes >= ord('A')) & (array_codes <= ord('Z'))
+    is_lower = (array_codes >= ord('a')) & (array_codes <= ord('z'))
+    is_alpha = is_upper | is_lower
+
+    # alphanumeric only, starting with two letters and ending with a digit
+    is_format_valid = ((is_digit | is_alpha).all(axis=1) & is_alpha[:, 0] & is_alpha[:, 1] & is_digit[:, -1])
+
+    array_codes = array_codes[is_format_valid]
+    idx_format_valid = idx_ascii[is_format_valid]
+
+    # convert alpha characters to numbers, lower case letters are treated as upper case letters
+    array_values = np.where(is_digit[is_format_valid], array_codes - ord('0'),
+                            np.where(is_upper[is_format_valid], array_codes - ord('A') + 10,
+                                     array_codes - ord('a') + 10))
+
+    check_digits_calc = calculate_check_digits(array_values[:, :-1])
+
+    array_check_digits[idx_format_valid] = check_digits_calc
+    array_status[idx_format_valid] = np.where(check_digits_calc == array_values[:, -1],
+                                              ISIN_VALID, ISIN_INVALID_CHECKSUM)
+
+    return array_status, array_check_digits
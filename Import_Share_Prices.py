@@ -0,0 +1,395 @@
+import argparse
+import collections
+import csv
+import datetime
+import json
+import math
+import os
+import sys
+import psycopg2
+import DB_Communication
+from Validate_ISIN_File import ProgressReporter
+"""
+    This python script imports share price histories from large CSV files into data."sharePrices" from the command line.
+    The files are streamed in chunks, the ISINs are resolved to share IDs by an in-memory map and every chunk is
+    copied into a staging table and merged into the price histories by one statement, so the memory usage does not
+    depend on the size of the files. After every chunk a checkpoint is written, an interrupted import continues
+    after the last merged chunk when started again. Rejected rows are written to a CSV report.
+
+    e.g. python Import_Share_Prices.py prices_1990.csv prices_2000.csv --checkpoint prices.checkpoint.json
+"""
+
+# columns of the report of rejected rows
+REPORT_HEADER = ["file", "line", "isin", "issue", "detail"]
+
+
+def parse_arguments(list_arguments=None):
+    """
+    Parse the arguments of the command line
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description="Import share price histories of CSV files into the database.")
+
+    parser.add_argument("files", nargs="+", help="CSV files with a header, one price per share and date")
+    parser.add_argument("--isin-column", default="isin", help="name of the ISIN column (default: isin)")
+    parser.add_argument("--date-column", default="date",
+                        help="name of the column containing the dates as YYYY-MM-DD (default: date)")
+    parser.add_argument("--price-column", default="price", help="name of the price column (default: price)")
+    parser.add_argument("--delimiter", default=",", help="delimiter of the files (default: ,)")
+    parser.add_argument("--chunk-size", type=int, default=100000,
+                        help="number of rows merged per transaction (default: 100000)")
+    parser.add_argument("--checkpoint", default=None,
+                        help="path of the JSON checkpoint, an existing checkpoint is resumed, "
+                             "it is removed after a successful import")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--report", default=None, help="path of the CSV report of rejected rows, defaults to stdout")
+    parser.add_argument("--progress-interval", type=float, default=2.0,
+                        help="seconds between progress messages on stderr, 0 disables them (default: 2)")
+
+    arguments = parser.parse_args(list_arguments)
+
+    if arguments.chunk_size < 1:
+        parser.error("--chunk-size has to be positive")
+
+    return arguments
+
+
+def get_column_indices(header, list_columns):
+    """
+    Find the indices of the columns in the header
+    :param header: list of column names of the first line
+    :param list_columns: list of column names to be found
+    :return: list of column indices
+    """
+
+    list_names = [each_name.strip().lower() for each_name in header]
+
+    list_missing_columns = [each_column for each_column in list_columns
+                            if each_column.strip().lower() not in list_names]
+    if list_missing_columns:
+        raise ValueError("Columns " + ", ".join(list_missing_columns) + " not found in header " + str(header))
+
+    return [list_names.index(each_column.strip().lower()) for each_column in list_columns]
+
+
+def read_price_rows(file_path, list_columns, delimiter=",", start_line=0):
+    """
+    Generator yielding the rows of a price file line by line, the file is never loaded completely
+    :param file_path: path of the file
+    :param list_columns: names of the ISIN, date and price column
+    :param delimiter: delimiter of the file
+    :param start_line: rows up to this line are skipped (they were imported before)
+    :return: generator of tuples (line number, ISIN, date, price) with the values as strings
+    """
+
+    # utf-8-sig removes the byte order mark written by many spreadsheet programs
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as F:
+
+        csv_reader = csv.reader(F, delimiter=delimiter)
+
+        header = next(csv_reader, None)
+        if header is None:
+            return
+
+        isin_index, date_index, price_index = get_column_indices(header, list_columns)
+        number_of_columns = max(isin_index, date_index, price_index) + 1
+
+        for each_row in csv_reader:
+
+            # line_num counts physical lines, so it identifies the position in the file across runs
+            if csv_reader.line_num <= start_line or not any(each_row):
+                continue
+
+            if len(each_row) < number_of_columns:
+                yield csv_reader.line_num, "", "", ""
+                continue
+
+            yield csv_reader.line_num, each_row[isin_index].strip(), each_row[date_index].strip(), \
+                each_row[price_index].strip()
+
+
+def read_chunks(file_path, list_columns, chunk_size, delimiter=",", start_line=0):
+    """
+    Generator combining the rows of a file to chunks
+    :param file_path: path of the file
+    :param list_columns: names of the ISIN, date and price column
+    :param chunk_size: maximum number of rows per chunk
+    :param delimiter: delimiter of the file
+    :param start_line: rows up to this line are skipped
+    :return: generator of lists of tuples (line number, ISIN, date, price)
+    """
+
+    list_rows = []
+
+    for each_row in read_price_rows(file_path, list_columns, delimiter, start_line):
+
+        list_rows.append(each_row)
+
+        if len(list_rows) >= chunk_size:
+            yield list_rows
+            list_rows = []
+
+    if list_rows:
+        yield list_rows
+
+
+def parse_price_row(date, price):
+    """
+    Convert the date and the price of a row
+    :param date: date as string (YYYY-MM-DD, a time may follow)
+    :param price: price as string
+    :return: tuple (datetime, float)
+    """
+
+    valid_from = datetime.datetime.fromisoformat(date)
+    share_price = float(price)
+
+    if not math.isfinite(share_price) or share_price <= 0:
+        raise ValueError("price has to be a positive number")
+
+    return valid_from, share_price
+
+
+class ShareIdMap:
+    """
+    In-memory map ISIN -> share ID, unknown ISINs are resolved once per chunk by a single query
+    """
+
+    def __init__(self, db_connection):
+        """
+        :param db_connection: psycopg2 connection to database
+        """
+
+        self.db_connection = db_connection
+
+        # ISINs not found in entities.shares are kept as None, so they are not queried again
+        self._share_ids = {}
+
+    def resolve(self, isins):
+        """
+        Query the share IDs of all ISINs not yet known
+        :param isins: iterable of ISINs in upper case
+        :return: None
+        """
+
+        set_unknown_isins = {isin for isin in isins if isin not in self._share_ids}
+
+        if not set_unknown_isins:
+            return
+
+        with self.db_connection.cursor() as sql_cursor:
+            dict_share_ids = DB_Communication.get_share_ids_for_isins(sql_cursor, set_unknown_isins)
+
+        # the lookup only reads, so the transaction of the next merge starts clean
+        self.db_connection.rollback()
+
+        for isin in set_unknown_isins:
+            self._share_ids[isin] = dict_share_ids.get(isin)
+
+    def get(self, isin):
+        return self._share_ids.get(isin)
+
+
+class Checkpoint:
+    """
+    Position of the import in every file, stored as JSON after every merged chunk
+    """
+
+    def __init__(self, file_path, restart=False):
+        """
+        :param file_path: path of the JSON file, None disables the checkpoint
+        :param restart: ignore an existing checkpoint
+        """
+
+        self.file_path = file_path
+
+        # absolute path of a file -> dictionary with its size, modification time and last imported line
+        self._files = {}
+
+        if file_path is not None and not restart and os.path.exists(file_path):
+            with open(file_path, 'r', encoding='utf-8') as F:
+                self._files = json.load(F)["files"]
+
+    @staticmethod
+    def get_file_state(file_path):
+        file_stat = os.stat(file_path)
+        return {"size": file_stat.st_size, "modified": file_stat.st_mtime_ns}
+
+    def get_start_line(self, file_path):
+        """
+        :param file_path: path of a price file
+        :return: last line of the file merged by a previous run, 0 in case the file was not imported yet
+        """
+
+        file_entry = self._files.get(os.path.abspath(file_path))
+
+        if file_entry is None:
+            return 0
+
+        if file_entry["state"] != self.get_file_state(file_path):
+            raise ValueError("File " + file_path + " changed since the checkpoint was written, use --restart to "
+                                                   "import it again")
+
+        return file_entry["line"]
+
+    def update(self, file_path, line_number):
+        """
+        Store the last merged line of a file, the file is replaced atomically
+        :param file_path: path of a price file
+        :param line_number: last line merged
+        :return: None
+        """
+
+        self._files[os.path.abspath(file_path)] = {"state": self.get_file_state(file_path), "line": line_number}
+
+        if self.file_path is None:
+            return
+
+        temporary_path = self.file_path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as F:
+            json.dump({"files": self._files}, F, indent=1)
+
+        os.replace(temporary_path, self.file_path)
+
+    def remove(self):
+        if self.file_path is not None and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+
+def import_files(arguments, report_file):
+    """
+    Import all files and write the report of rejected rows
+    :param arguments: parsed arguments, see parse_arguments
+    :param report_file: opened file the CSV report is written to
+    :return: dictionary with the number of processed rows, of each issue, of the changed versions and of the new
+             versions of the derived ratios
+    """
+
+    report_writer = csv.writer(report_file)
+    report_writer.writerow(REPORT_HEADER)
+
+    dict_summary = collections.Counter()
+
+    def report_issue(file_path, line_number, isin, issue, detail=""):
+        report_writer.writerow([file_path, line_number, isin, issue, detail])
+        dict_summary[issue] += 1
+
+    checkpoint = Checkpoint(arguments.checkpoint, arguments.restart)
+    list_columns = [arguments.isin_column, arguments.date_column, arguments.price_column]
+
+    # the start lines are checked first, so a changed file is noticed before anything is imported
+    dict_start_lines = {each_file: checkpoint.get_start_line(each_file) for each_file in arguments.files}
+
+    db_pool = DB_Communication.create_connection_pool(min_size=1, max_size=1)
+
+    if db_pool is None:
+        raise ConnectionError("Connection to database " + DB_Communication.get_db_name() + " failed")
+
+    progress_reporter = ProgressReporter(arguments.progress_interval, unit="prices")
+    number_of_rows = 0
+
+    try:
+        with db_pool.connection() as db_connection:
+
+            share_id_map = ShareIdMap(db_connection)
+
+            for each_file in arguments.files:
+
+                for list_rows in read_chunks(each_file, list_columns, arguments.chunk_size, arguments.delimiter,
+                                             dict_start_lines[each_file]):
+
+                    share_id_map.resolve({isin.upper() for line_number, isin, date, price in list_rows if isin})
+
+                    # share ID and date -> price, a later row of the same share and date replaces the earlier one
+                    dict_prices = {}
+
+                    for line_number, isin, date, price in list_rows:
+
+                        if not isin:
+                            report_issue(each_file, line_number, isin, "malformed", "missing ISIN")
+                            continue
+
+                        share_id = share_id_map.get(isin.upper())
+                        if share_id is None:
+                            report_issue(each_file, line_number, isin, "unknown", "not found in entities.shares")
+                            continue
+
+                        try:
+                            valid_from, share_price = parse_price_row(date, price)
+                        except ValueError as error:
+                            report_issue(each_file, line_number, isin, "malformed", str(error))
+                            continue
+
+                        dict_prices[(share_id, valid_from)] = share_price
+
+                    if dict_prices:
+                        number_of_changed, number_of_new = DB_Communication.merge_share_prices(
+                            db_connection, [key + (share_price,) for key, share_price in dict_prices.items()])
+
+                        dict_summary["changed versions"] += number_of_changed
+                        dict_summary["new versions"] += number_of_new
+
+                    checkpoint.update(each_file, list_rows[-1][0])
+
+                    number_of_rows += len(list_rows)
+                    progress_reporter.update(number_of_rows)
+
+            # the merged prices queued the years of the derived ratios (PERs, dividendReturns) they are in effect
+            # at the end of, plus the current and future years for new latest prices, so a daily file does not
+            # recompute the ratios of all historical years (see migration 0007)
+            dict_ratio_results = DB_Communication.refresh_derived_ratios(db_connection)
+
+            dict_summary["ratio versions"] += sum(number_of_new for number_of_closed, number_of_new
+                                                  in dict_ratio_results.values())
+
+            # every merged version is logged for the local snapshots, imports are the largest source of entries
+            DB_Communication.prune_data_change_log(db_connection)
+
+    finally:
+        db_pool.close_all()
+
+    checkpoint.remove()
+
+    progress_reporter.update(number_of_rows, force=True)
+
+    dict_summary["processed"] = number_of_rows
+
+    return dict_summary
+
+
+def main(list_arguments=None):
+    """
+    Entry point of the command line tool
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: exit code, 0 in case all rows were imported, 1 in case rows were rejected, 2 in case of an error
+    """
+
+    arguments = parse_arguments(list_arguments)
+
+    try:
+        if arguments.report is None:
+            dict_summary = import_files(arguments, sys.stdout)
+        else:
+            with open(arguments.report, 'w', encoding='utf-8', newline='') as report_file:
+                dict_summary = import_files(arguments, report_file)
+
+    except (OSError, ValueError, psycopg2.Error) as error:
+        print("Error while importing: " + str(error), file=sys.stderr)
+        return 2
+
+    print(", ".join(key + ": " + "{:,}".format(dict_summary[key])
+                    for key in ("processed", "new versions", "changed versions", "ratio versions", "malformed",
+                                "unknown")
+                    if key in dict_summary or key in ("processed", "new versions", "changed versions",
+                                                      "ratio versions")),
+          file=sys.stderr)
+
+    number_of_issues = sum(dict_summary[key] for key in ("malformed", "unknown"))
+
+    return 1 if number_of_issues > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,453 @@
+import datetime
+import hashlib
+import json
+import os
+import numpy as np
+import DB_Snapshot_Cache
+"""
+    This python file implements a store of the share prices as dense matrix (shares x trading days) beside
+    data."sharePrices". The prices are kept in a raw float64 file which is memory-mapped read-only by any number of
+    processes, the share IDs and the dates are kept in index files. The price of a share on a day is the latest
+    price valid from that day or before, days before the first price of a share are NaN.
+    The trading days are the days prices are valid from. The file is stored day by day, so new days are appended
+    to the file without rewriting it; a refresh only transfers the price versions changed since the last refresh
+    (the watermark of DB_Snapshot_Cache).
+
+    e.g. refresh_price_matrix(db_pool)
+         price_matrix = load_price_matrix(db_pool)
+         price_matrix.get_prices(42, "2020-01-01", "2020-12-31")
+"""
+
+# directory of the stores, every database gets a subdirectory
+PRICE_MATRIX_DIRECTORY = './data/price_matrix/'
+
+# the number of share columns of the file is a multiple of this, new shares fill the free columns
+SHARE_CAPACITY_STEP = 1024
+
+# number of share columns forward-filled at once when the matrix is built
+FILL_BLOCK_SIZE = 256
+
+
+class PriceMatrix:
+    """
+    Read-only view of a store, the prices are a memory-mapped array (shares x days)
+    """
+
+    def __init__(self, values, share_ids, dates, meta):
+        """
+        :param values: array of the file (days x share capacity)
+        :param share_ids: array of the share ids along the shares axis
+        :param dates: sorted array of the trading days (datetime64[D])
+        :param meta: dictionary of the store (see save_meta)
+        """
+
+        self.share_ids = share_ids
+        self.dates = dates
+        self.meta = meta
+
+        # the transposed view of the columns in use, nothing is copied
+        self.prices = values[:len(dates), :len(share_ids)].T
+
+        self._share_positions = {int(each_id): position for position, each_id in enumerate(share_ids.tolist())}
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    def get_share_position(self, share_id):
+        return self._share_positions[int(share_id)]
+
+    def get_date_slice(self, date_from=None, date_to=None):
+        """
+        :param date_from: first day (inclusive), the first trading day in case of None
+        :param date_to: last day (inclusive), the last trading day in case of None
+        :return: slice of the days axis
+        """
+
+        start = 0 if date_from is None else int(np.searchsorted(self.dates, np.datetime64(date_from, "D"), "left"))
+        stop = len(self.dates) if date_to is None else int(np.searchsorted(self.dates, np.datetime64(date_to, "D"),
+                                                                          "right"))
+
+        return slice(start, stop)
+
+    def get_prices(self, share_id=None, date_from=None, date_to=None):
+        """
+        Slice the prices by share and date range, the result is a view of the mapped file
+        :param share_id: id of a share, all shares in case of None
+        :param date_from: first day (inclusive, datetime or string), the first trading day in case of None
+        :param date_to: last day (inclusive, datetime or string), the last trading day in case of None
+        :return: array of the days in range (one share) or array shares x days in range
+        """
+
+        date_slice = self.get_date_slice(date_from, date_to)
+
+        if share_id is None:
+            return self.prices[:, date_slice]
+
+        return self.prices[self.get_share_position(share_id), date_slice]
+
+
+def get_store_directory(db_pool, directory=PRICE_MATRIX_DIRECTORY):
+    """
+    Every database has a store of its own
+    :param db_pool: ConnectionPool of the database
+    :param directory: directory of all stores
+    :return: path of the store of the database
+    """
+
+    key = json.dumps([db_pool.connection_params.get("host"), db_pool.connection_params.get("dbname")])
+
+    return os.path.join(directory, "prices_" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+
+
+def get_file_path(store_directory, name, generation):
+    return os.path.join(store_directory, name + "." + str(generation))
+
+
+def read_meta(store_directory):
+    """
+    :param store_directory: directory of the store
+    :return: dictionary of the store, None in case the store does not exist yet
+    """
+
+    try:
+        with open(os.path.join(store_directory, "meta.json"), 'r', encoding='utf-8') as F:
+            return json.load(F)
+
+    except FileNotFoundError:
+        return None
+
+
+def save_meta(store_directory, meta):
+    """
+    Replace the meta file atomically, readers see the new days and shares from now on
+    :param store_directory: directory of the store
+    :param meta: dictionary with the generation of the files, the number of days and shares, the share capacity,
+                 the watermark and the last day with a price of every share
+    :return: None
+    """
+
+    meta["refreshed_at"] = datetime.datetime.now().isoformat()
+
+    temporary_path = os.path.join(store_directory, "meta.json.tmp")
+    with open(temporary_path, 'w', encoding='utf-8') as F:
+        json.dump(meta, F)
+
+    os.replace(temporary_path, os.path.join(store_directory, "meta.json"))
+
+
+def save_index(file_path, values):
+    """
+    Replace an index file atomically, existing entries keep their position, so readers of an older meta file
+    still find their prefix
+    :param file_path: path of the file (without .npy)
+    :param values: array
+    :return: None
+    """
+
+    temporary_path = file_path + ".tmp.npy"
+    np.save(temporary_path, values, allow_pickle=False)
+    os.replace(temporary_path, file_path + ".npy")
+
+
+def map_values(store_directory, meta, number_of_days, mode="r"):
+    """
+    :param store_directory: directory of the store
+    :param meta: dictionary of the store
+    :param number_of_days: number of days (rows) mapped
+    :param mode: mode of numpy.memmap, r for readers
+    :return: memory-mapped array (days x share capacity)
+    """
+
+    return np.memmap(get_file_path(store_directory, "prices", meta["generation"]) + ".f64", dtype="float64",
+                     mode=mode, shape=(number_of_days, meta["share_capacity"]))
+
+
+def load_price_matrix(db_pool, directory=PRICE_MATRIX_DIRECTORY):
+    """
+    Map the store of the database read-only without querying the database
+    :param db_pool: ConnectionPool of the database (only used to find its store)
+    :param directory: directory of all stores
+    :return: PriceMatrix, None in case the store does not exist yet
+    """
+
+    store_directory = get_store_directory(db_pool, directory)
+    meta = read_meta(store_directory)
+
+    if meta is None:
+        return None
+
+    share_ids = np.load(get_file_path(store_directory, "share_ids", meta["generation"]) + ".npy")[:meta["shares"]]
+    dates = np.load(get_file_path(store_directory, "dates", meta["generation"]) + ".npy")[:meta["days"]]
+
+    # an empty file cannot be mapped
+    values = map_values(store_directory, meta, meta["days"]) if meta["days"] > 0 \
+        else np.empty((0, meta["share_capacity"]))
+
+    return PriceMatrix(values, share_ids, dates, meta)
+
+
+def get_observations(dict_versions, share_ids, dates):
+    """
+    Find the cells of the price versions, of several versions of a share on the same day the latest one is kept
+    :param dict_versions: dictionary column name -> array of the versions (see DB_Snapshot_Cache.fetch_all_versions)
+    :param share_ids: sorted array of the share ids the positions refer to
+    :param dates: sorted array of the days the positions refer to
+    :return: tuple of arrays (share positions, day positions, prices)
+    """
+
+    array_days = dict_versions["valid_from"].astype("datetime64[D]")
+
+    # sorted by share and point in time, the last version of a share and day is the latest one
+    order = np.lexsort((dict_versions["ID"], dict_versions["valid_from"], dict_versions["share_ID"]))
+
+    array_share_positions = np.searchsorted(share_ids, dict_versions["share_ID"][order])
+    array_day_positions = np.searchsorted(dates, array_days[order])
+
+    is_last = np.ones(len(order), dtype=bool)
+    is_last[:-1] = (array_share_positions[1:] != array_share_positions[:-1]) | \
+                   (array_day_positions[1:] != array_day_positions[:-1])
+
+    return array_share_positions[is_last], array_day_positions[is_last], dict_versions["share_price"][order][is_last]
+
+
+def get_valid_versions(dict_versions):
+    """
+    :param dict_versions: dictionary column name -> array of price versions
+    :return: the versions without those closed on the day they start (replaced prices, valid_to = valid_from)
+    """
+
+    is_valid = dict_versions["valid_to"] > dict_versions["valid_from"]
+
+    return {column: values[is_valid] for column, values in dict_versions.items()}
+
+
+def forward_fill(block, seed=None):
+    """
+    Replace the NaN of every column by the last value above, in place
+    :param block: array (days x shares)
+    :param seed: array of values above the first row, NaN in case of None
+    :return: None
+    """
+
+    if seed is not None:
+        block[0] = np.where(np.isnan(block[0]), seed, block[0])
+
+    array_positions = np.where(np.isnan(block), 0, np.arange(block.shape[0])[:, np.newaxis])
+    np.maximum.accumulate(array_positions, axis=0, out=array_positions)
+
+    block[:] = np.take_along_axis(block, array_positions, axis=0)
+
+
+def build_price_matrix(store_directory, dict_versions, watermark):
+    """
+    Write a new generation of the store from all versions of data."sharePrices"
+    :param store_directory: directory of the store
+    :param dict_versions: dictionary column name -> array of all versions
+    :param watermark: snapshot of the database the versions were read in (see DB_Snapshot_Cache.get_change_watermark)
+    :return: dictionary of the store
+    """
+
+    os.makedirs(store_directory, exist_ok=True)
+
+    dict_versions = get_valid_versions(dict_versions)
+
+    old_meta = read_meta(store_directory)
+    generation = 1 if old_meta is None else old_meta["generation"] + 1
+
+    share_ids = np.unique(dict_versions["share_ID"]).astype("int32")
+    dates = np.unique(dict_versions["valid_from"].astype("datetime64[D]"))
+
+    share_capacity = -(-max(len(share_ids), 1) // SHARE_CAPACITY_STEP) * SHARE_CAPACITY_STEP
+
+    meta = {"generation": generation, "days": len(dates), "shares": len(share_ids), "share_capacity": share_capacity,
+            "watermark": watermark}
+
+    array_share_positions, array_day_positions, array_prices = get_observations(dict_versions, share_ids, dates)
+
+    array_last_days = np.full(len(share_ids), -1, dtype="int64")
+    np.maximum.at(array_last_days, array_share_positions, array_day_positions)
+    meta["last_days"] = array_last_days.tolist()
+
+    values_path = get_file_path(store_directory, "prices", generation) + ".f64"
+    with open(values_path, 'wb') as F:
+        F.truncate(len(dates) * share_capacity * 8)
+
+    if len(dates) > 0:
+        values = map_values(store_directory, meta, len(dates), mode="r+")
+
+        for start in range(0, len(share_ids), FILL_BLOCK_SIZE):
+            stop = min(start + FILL_BLOCK_SIZE, len(share_ids))
+            is_in_block = (array_share_positions >= start) & (array_share_positions < stop)
+
+            block = np.full((len(dates), stop - start), np.nan)
+            block[array_day_positions[is_in_block], array_share_positions[is_in_block] - start] = \
+                array_prices[is_in_block]
+            forward_fill(block)
+
+            values[:, start:stop] = block
+
+        values.flush()
+        del values
+
+    save_index(get_file_path(store_directory, "share_ids", generation), share_ids)
+    save_index(get_file_path(store_directory, "dates", generation), dates)
+    save_meta(store_directory, meta)
+
+    # the previous generation may still be mapped by readers, older ones are removed
+    if old_meta is not None:
+        for each_name in os.listdir(store_directory):
+            each_generation = each_name.split(".")[1] if each_name.count(".") >= 2 else ""
+            if each_generation.isdigit() and int(each_generation) < old_meta["generation"]:
+                os.remove(os.path.join(store_directory, each_name))
+
+    return meta
+
+
+def append_price_versions(store_directory, meta, dict_versions, watermark):
+    """
+    Add new or changed price versions to the store in place, new days are appended to the file
+    The versions of a share have to start on or after its last day with a price, otherwise the store has to be
+    built again
+    :param store_directory: directory of the store
+    :param meta: dictionary of the store
+    :param dict_versions: dictionary column name -> array of the versions
+    :param watermark: snapshot of the database the versions were read in
+    :return: dictionary of the store, None in case the versions cannot be appended
+    """
+
+    dict_versions = get_valid_versions(dict_versions)
+
+    # only replaced prices, their replacements are part of the same changes
+    if len(dict_versions["ID"]) == 0:
+        meta = dict(meta, watermark=watermark)
+        save_meta(store_directory, meta)
+        return meta
+
+    generation = meta["generation"]
+    share_ids = np.load(get_file_path(store_directory, "share_ids", generation) + ".npy")[:meta["shares"]]
+    dates = np.load(get_file_path(store_directory, "dates", generation) + ".npy")[:meta["days"]]
+
+    array_new_days = np.unique(dict_versions["valid_from"].astype("datetime64[D]"))
+    array_new_days = array_new_days[~np.isin(array_new_days, dates)]
+
+    array_new_shares = np.unique(dict_versions["share_ID"])
+    array_new_shares = array_new_shares[~np.isin(array_new_shares, share_ids)].astype("int32")
+
+    # days can only be appended, the new shares have to fit into the free columns
+    if (len(dates) > 0 and len(array_new_days) > 0 and array_new_days[0] <= dates[-1]) \
+            or len(share_ids) + len(array_new_shares) > meta["share_capacity"]:
+        return None
+
+    # the new shares take the next columns, so the positions of the shares are not sorted by id anymore
+    all_share_ids = np.concatenate([share_ids, array_new_shares])
+    all_dates = np.concatenate([dates, array_new_days])
+
+    order = np.argsort(all_share_ids, kind="stable")
+    array_share_positions, array_day_positions, array_prices = get_observations(dict_versions, all_share_ids[order],
+                                                                                all_dates)
+    array_share_positions = order[array_share_positions]
+
+    array_last_days = np.concatenate([np.array(meta["last_days"], dtype="int64"),
+                                      np.full(len(array_new_shares), -1, dtype="int64")])
+
+    # the first new day of every affected share, the prices before it are not changed
+    array_first_days = np.full(len(all_share_ids), len(all_dates), dtype="int64")
+    np.minimum.at(array_first_days, array_share_positions, array_day_positions)
+
+    array_affected = np.flatnonzero(array_first_days < len(all_dates))
+    if (array_first_days[array_affected] < array_last_days[array_affected]).any():
+        return None
+
+    number_of_days = len(all_dates)
+    old_number_of_days = len(dates)
+
+    values_path = get_file_path(store_directory, "prices", generation) + ".f64"
+    with open(values_path, 'r+b') as F:
+        F.truncate(number_of_days * meta["share_capacity"] * 8)
+
+    values = map_values(store_directory, meta, number_of_days, mode="r+")
+
+    # the columns of the new shares may contain anything
+    values[:old_number_of_days, len(share_ids):len(all_share_ids)] = np.nan
+
+    # the current prices stay valid on the new days until a new version starts
+    if old_number_of_days > 0:
+        values[old_number_of_days:, :len(share_ids)] = values[old_number_of_days - 1, :len(share_ids)]
+    values[old_number_of_days:, len(share_ids):len(all_share_ids)] = np.nan
+
+    # the affected shares are filled again from their first new day on
+    first_day = int(array_first_days[array_affected].min())
+    block = values[first_day:, array_affected]
+
+    block[np.arange(number_of_days - first_day)[:, np.newaxis] >= (array_first_days[array_affected] - first_day)] = \
+        np.nan
+
+    dict_columns = {position: column for column, position in enumerate(array_affected.tolist())}
+    block[array_day_positions - first_day, [dict_columns[position] for position in array_share_positions.tolist()]] = \
+        array_prices
+
+    forward_fill(block, None if first_day == 0 else values[first_day - 1, array_affected])
+    values[first_day:, array_affected] = block
+
+    values.flush()
+    del values
+
+    np.maximum.at(array_last_days, array_share_positions, array_day_positions)
+
+    meta = dict(meta, days=number_of_days, shares=len(all_share_ids), last_days=array_last_days.tolist(),
+                watermark=watermark)
+
+    save_index(get_file_path(store_directory, "share_ids", generation), all_share_ids)
+    save_index(get_file_path(store_directory, "dates", generation), all_dates)
+    save_meta(store_directory, meta)
+
+    return meta
+
+
+def refresh_price_matrix(db_pool, directory=PRICE_MATRIX_DIRECTORY, full=False):
+    """
+    Bring the store up to date, only the price versions changed since the last refresh are transferred. The store
+    is built again in case the changed versions do not start after the prices of their share (e.g. an imported
+    history or a replaced price), in case versions have been deleted or the changes have been pruned from the log
+    :param db_pool: ConnectionPool of the database
+    :param directory: directory of all stores
+    :param full: build the store from all versions
+    :return: tuple (number of transferred versions, number of days, whether the store has been built again)
+    """
+
+    store_directory = get_store_directory(db_pool, directory)
+    meta = None if full else read_meta(store_directory)
+
+    with db_pool.connection() as db_connection:
+
+        try:
+            with db_connection.cursor() as sql_cursor:
+                sql_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+
+                watermark, is_complete = DB_Snapshot_Cache.get_change_watermark(
+                    sql_cursor, None if meta is None else meta.get("watermark"))
+
+                if is_complete:
+                    array_changed_ids, dict_versions = DB_Snapshot_Cache.fetch_changed_versions(
+                        sql_cursor, "sharePrices", meta["watermark"])
+
+                    if len(array_changed_ids) == 0:
+                        save_meta(store_directory, dict(meta, watermark=watermark))
+                        return 0, meta["days"], False
+
+                    # deleted versions leave gaps which only a new build closes
+                    if len(dict_versions["ID"]) == len(array_changed_ids):
+                        new_meta = append_price_versions(store_directory, meta, dict_versions, watermark)
+                        if new_meta is not None:
+                            return len(dict_versions["ID"]), new_meta["days"], False
+
+                dict_versions = DB_Snapshot_Cache.fetch_all_versions(sql_cursor, "sharePrices")
+
+        finally:
+            # nothing has been written, the transaction only ends the snapshot of the database
+            db_connection.rollback()
+
+    meta = build_price_matrix(store_directory, dict_versions, watermark)
+
+    return len(dict_versions["ID"]), meta["days"], True
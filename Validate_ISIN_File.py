@@ -0,0 +1,409 @@
+import argparse
+import collections
+import csv
+import multiprocessing
+import os
+import sys
+import time
+import psycopg2
+import ISIN_Validator
+import DB_Communication
+"""
+    This python script validates the ISINs of large CSV or text files from the command line.
+    The files are streamed in chunks, which are validated in parallel by a pool of processes,
+    so the memory usage does not depend on the size of the files. Malformed, invalid and duplicate
+    entries are written to a CSV report, optionally the ISINs are checked for existence in entities.shares.
+
+    e.g. python Validate_ISIN_File.py vendor_isins.csv --column isin --report report.csv --check-db
+"""
+
+# columns of the report
+REPORT_HEADER = ["file", "line", "isin", "issue", "detail"]
+
+# chunks submitted to the pool, but not yet processed, per process (limits the memory usage)
+PENDING_CHUNKS_PER_PROCESS = 2
+
+
+def parse_arguments(list_arguments=None):
+    """
+    Parse the arguments of the command line
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description="Validate the ISINs of CSV or text files.")
+
+    parser.add_argument("files", nargs="+", help="CSV or text files containing the ISINs")
+    parser.add_argument("--column", default=None,
+                        help="name (requires a header) or zero-based index of the column containing the ISINs in "
+                             "CSV files, defaults to a column named isin or the first column, a first line without "
+                             "a well-formed ISIN in the column is skipped as header")
+    parser.add_argument("--delimiter", default=",", help="delimiter of CSV files (default: ,)")
+    parser.add_argument("--report", default=None, help="path of the CSV report, defaults to stdout")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="number of ISINs per chunk (default: 50000)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes, 1 validates in this process (default: number of CPUs)")
+    parser.add_argument("--check-db", action="store_true",
+                        help="report valid ISINs which do not exist in entities.shares")
+    parser.add_argument("--db-batch-size", type=int, default=10000,
+                        help="number of ISINs per existence query (default: 10000)")
+    parser.add_argument("--progress-interval", type=float, default=2.0,
+                        help="seconds between progress messages on stderr, 0 disables them (default: 2)")
+
+    arguments = parser.parse_args(list_arguments)
+
+    if arguments.chunk_size < 1 or arguments.processes < 1 or arguments.db_batch_size < 1:
+        parser.error("--chunk-size, --processes and --db-batch-size have to be positive")
+
+    return arguments
+
+
+def is_csv_file(file_path):
+    return os.path.splitext(file_path)[1].lower() in (".csv", ".tsv")
+
+
+def is_header_cell(value):
+    """
+    :param value: cell of the first line of a CSV file
+    :return: whether the cell is a column name, i.e. not a well-formed ISIN
+    """
+
+    array_status, array_check_digits = ISIN_Validator.validate_isin_batch([value.strip()])
+
+    return bool(array_status[0] == ISIN_Validator.ISIN_FORMAT_ERROR)
+
+
+def get_column_index(header, column):
+    """
+    Find the index of the ISIN column
+    :param header: list of cells of the first line
+    :param column: name or zero-based index of the column, None to detect it
+    :return: tuple of column index and whether the first line is a header
+    """
+
+    # a first line without a well-formed ISIN in the column is a header
+    if column is not None and column.isdigit():
+        column_index = int(column)
+        return column_index, len(header) > column_index and is_header_cell(header[column_index])
+
+    list_names = [each_name.strip().lower() for each_name in header]
+
+    if column is not None:
+        if column.strip().lower() not in list_names:
+            raise ValueError("Column " + column + " not found in header " + str(header))
+        return list_names.index(column.strip().lower()), True
+
+    if "isin" in list_names:
+        return list_names.index("isin"), True
+
+    # the ISINs are in the first column
+    return 0, len(header) > 0 and is_header_cell(header[0])
+
+
+def read_isins(file_path, column=None, delimiter=","):
+    """
+    Generator yielding the ISINs of a file line by line, the file is never loaded completely
+    CSV files (.csv, .tsv) are parsed with the csv module, every other file is read as one ISIN per line
+    :param file_path: path of the file
+    :param column: name or zero-based index of the ISIN column of CSV files
+    :param delimiter: delimiter of CSV files
+    :return: generator of tuples (line number, ISIN)
+    """
+
+    # utf-8-sig removes the byte order mark written by many spreadsheet programs
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as F:
+
+        if not is_csv_file(file_path):
+            for line_number, each_line in enumerate(F, start=1):
+                each_line = each_line.strip()
+                if each_line:
+                    yield line_number, each_line
+            return
+
+        csv_reader = csv.reader(F, delimiter="\t" if file_path.lower().endswith(".tsv") else delimiter)
+
+        first_row = next(csv_reader, None)
+        if first_row is None:
+            return
+
+        column_index, has_header = get_column_index(first_row, column)
+
+        # without a header the first line contains an ISIN already
+        if not has_header and len(first_row) > column_index and first_row[column_index].strip():
+            yield csv_reader.line_num, first_row[column_index].strip()
+
+        for each_row in csv_reader:
+            # line_num counts physical lines, so quoted line breaks do not shift the reported lines
+            if len(each_row) > column_index and each_row[column_index].strip():
+                yield csv_reader.line_num, each_row[column_index].strip()
+
+
+def read_chunks(list_files, chunk_size, column=None, delimiter=","):
+    """
+    Generator combining the ISINs of all files to chunks
+    :param list_files: list of file paths
+    :param chunk_size: maximum number of ISINs per chunk
+    :param column: name or zero-based index of the ISIN column of CSV files
+    :param delimiter: delimiter of CSV files
+    :return: generator of tuples (list of locations (file, line), list of ISINs)
+    """
+
+    list_locations = []
+    list_isins = []
+
+    for each_file in list_files:
+
+        for line_number, isin in read_isins(each_file, column, delimiter):
+
+            list_locations.append((each_file, line_number))
+            list_isins.append(isin)
+
+            if len(list_isins) >= chunk_size:
+                yield list_locations, list_isins
+                list_locations = []
+                list_isins = []
+
+    if list_isins:
+        yield list_locations, list_isins
+
+
+def validate_chunk(list_isins):
+    """
+    Validate a chunk of ISINs, executed in the worker processes
+    :param list_isins: list of ISINs
+    :return: tuple of numpy arrays (status codes, expected check digits)
+    """
+    return ISIN_Validator.validate_isin_batch(list_isins)
+
+
+def iterate_validated_chunks(chunks, number_of_processes):
+    """
+    Validate chunks in a pool of processes, the results are returned in the order of the chunks
+    Only a limited number of chunks is submitted ahead, so the files are read as fast as they are validated
+    :param chunks: iterable of tuples (list of locations, list of ISINs)
+    :param number_of_processes: number of worker processes, 1 validates in the current process
+    :return: generator of tuples (list of locations, list of ISINs, status codes, expected check digits)
+    """
+
+    if number_of_processes == 1:
+        for list_locations, list_isins in chunks:
+            yield (list_locations, list_isins) + validate_chunk(list_isins)
+        return
+
+    with multiprocessing.Pool(number_of_processes) as pool:
+
+        # Pool.imap would consume the whole generator ahead, so the submission is bounded manually
+        pending_chunks = collections.deque()
+
+        for list_locations, list_isins in chunks:
+
+            pending_chunks.append((list_locations, list_isins, pool.apply_async(validate_chunk, (list_isins,))))
+
+            if len(pending_chunks) >= number_of_processes * PENDING_CHUNKS_PER_PROCESS:
+                list_locations, list_isins, result = pending_chunks.popleft()
+                yield (list_locations, list_isins) + result.get()
+
+        while pending_chunks:
+            list_locations, list_isins, result = pending_chunks.popleft()
+            yield (list_locations, list_isins) + result.get()
+
+
+class ExistenceChecker:
+    """
+    Collects valid ISINs and checks them in batches for existence in entities.shares
+    """
+
+    def __init__(self, db_pool, batch_size, report_issue):
+        """
+        :param db_pool: ConnectionPool of the database
+        :param batch_size: number of ISINs per query
+        :param report_issue: function(location, isin, issue, detail) called for every unknown ISIN
+        """
+
+        self.db_pool = db_pool
+        self.batch_size = batch_size
+        self.report_issue = report_issue
+
+        self.number_of_unknown = 0
+
+        # list of tuples (location, ISIN) not yet checked
+        self._pending = []
+
+    def add(self, location, isin):
+        self._pending.append((location, isin))
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Check all pending ISINs
+        :return: None
+        """
+
+        if not self._pending:
+            return
+
+        with self.db_pool.cursor() as sql_cursor:
+            set_existing_isins = DB_Communication.get_existing_isins(sql_cursor, [isin for location, isin
+                                                                                  in self._pending],
+                                                                     batch_size=self.batch_size)
+
+        for location, isin in self._pending:
+            if isin not in set_existing_isins:
+                self.number_of_unknown += 1
+                self.report_issue(location, isin, "unknown", "not found in entities.shares")
+
+        self._pending = []
+
+
+class ProgressReporter:
+    """
+    Writes the number of processed items and the throughput to stderr in regular intervals
+    """
+
+    def __init__(self, interval, unit="ISINs"):
+        """
+        :param interval: seconds between two messages, 0 disables the messages
+        :param unit: name of the processed items used in the messages
+        """
+        self.interval = interval
+        self.unit = unit
+        self.start_time = time.perf_counter()
+        self._last_report = self.start_time
+
+    def update(self, number_of_items, force=False):
+        """
+        :param number_of_items: number of items processed so far
+        :param force: write the message regardless of the interval
+        :return: None
+        """
+
+        now = time.perf_counter()
+
+        if not force and (self.interval <= 0 or now - self._last_report < self.interval):
+            return
+
+        self._last_report = now
+        elapsed_time = max(now - self.start_time, 1e-9)
+
+        print("{:,} {} processed in {:.1f} s ({:,.0f} {}/s)".format(number_of_items, self.unit, elapsed_time,
+                                                                    number_of_items / elapsed_time, self.unit),
+              file=sys.stderr)
+
+
+def validate_files(arguments, report_file):
+    """
+    Validate all files and write the report
+    :param arguments: parsed arguments, see parse_arguments
+    :param report_file: opened file the CSV report is written to
+    :return: dictionary with the number of processed ISINs and of each issue
+    """
+
+    report_writer = csv.writer(report_file)
+    report_writer.writerow(REPORT_HEADER)
+
+    dict_summary = collections.Counter()
+
+    def report_issue(location, isin, issue, detail=""):
+        report_writer.writerow([location[0], location[1], isin, issue, detail])
+        dict_summary[issue] += 1
+
+    db_pool = None
+    existence_checker = None
+
+    if arguments.check_db:
+        db_pool = DB_Communication.create_connection_pool(min_size=1, max_size=1)
+
+        if db_pool is None:
+            raise ConnectionError("Connection to database " + DB_Communication.get_db_name() + " failed")
+
+        existence_checker = ExistenceChecker(db_pool, arguments.db_batch_size, report_issue)
+
+    # first location of every ISIN, used to find duplicates (ISINs are compared in upper case)
+    dict_first_locations = {}
+
+    progress_reporter = ProgressReporter(arguments.progress_interval)
+    number_of_isins = 0
+
+    try:
+        chunks = read_chunks(arguments.files, arguments.chunk_size, arguments.column, arguments.delimiter)
+
+        for list_locations, list_isins, array_status, array_check_digits in iterate_validated_chunks(
+                chunks, arguments.processes):
+
+            for location, isin, status, check_digit in zip(list_locations, list_isins, array_status.tolist(),
+                                                           array_check_digits.tolist()):
+
+                if status == ISIN_Validator.ISIN_FORMAT_ERROR:
+                    report_issue(location, isin, "malformed", "not 12 alphanumeric characters starting with two "
+                                                              "letters and ending with a digit")
+                    continue
+
+                if status == ISIN_Validator.ISIN_INVALID_CHECKSUM:
+                    report_issue(location, isin, "invalid", "expected check digit " + str(check_digit))
+                    continue
+
+                normalized_isin = isin.upper()
+
+                if normalized_isin in dict_first_locations:
+                    first_location = dict_first_locations[normalized_isin]
+                    report_issue(location, isin, "duplicate", "first seen in " + first_location[0] + " line " +
+                                 str(first_location[1]))
+                    continue
+
+                dict_first_locations[normalized_isin] = location
+
+                if existence_checker is not None:
+                    existence_checker.add(location, normalized_isin)
+
+            number_of_isins += len(list_isins)
+            progress_reporter.update(number_of_isins)
+
+        if existence_checker is not None:
+            existence_checker.flush()
+
+    finally:
+        if db_pool is not None:
+            db_pool.close_all()
+
+    progress_reporter.update(number_of_isins, force=True)
+
+    dict_summary["processed"] = number_of_isins
+    dict_summary["unique valid"] = len(dict_first_locations)
+
+    return dict_summary
+
+
+def main(list_arguments=None):
+    """
+    Entry point of the command line tool
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: exit code, 0 in case all ISINs are valid, 1 in case issues were found, 2 in case of an error
+    """
+
+    arguments = parse_arguments(list_arguments)
+
+    try:
+        if arguments.report is None:
+            dict_summary = validate_files(arguments, sys.stdout)
+        else:
+            with open(arguments.report, 'w', encoding='utf-8', newline='') as report_file:
+                dict_summary = validate_files(arguments, report_file)
+
+    except (OSError, ValueError, psycopg2.Error) as error:
+        print("Error while validating: " + str(error), file=sys.stderr)
+        return 2
+
+    print(", ".join(key + ": " + "{:,}".format(dict_summary[key])
+                    for key in ("processed", "unique valid", "malformed", "invalid", "duplicate", "unknown")
+                    if key in dict_summary or key in ("processed", "unique valid")),
+          file=sys.stderr)
+
+    number_of_issues = sum(dict_summary[key] for key in ("malformed", "invalid", "duplicate", "unknown"))
+
+    return 1 if number_of_issues > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+DELETE FROM
+	public.derived_ratio_queue
+RETURNING
+	"share_ID",
+	year
\ No newline at end of file
@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS public.schema_migrations
+(
+	name text COLLATE pg_catalog."default" NOT NULL,
+	checksum text COLLATE pg_catalog."default" NOT NULL,
+	applied_at timestamp(4) without time zone NOT NULL DEFAULT now(),
+	execution_time double precision NOT NULL,
+	CONSTRAINT schema_migrations_pkey PRIMARY KEY (name)
+)
\ No newline at end of file
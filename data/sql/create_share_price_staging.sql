@@ -0,0 +1,9 @@
+-- staging table receiving the share prices of one chunk via COPY, it exists per connection and is emptied by
+-- every commit, so each chunk is merged in its own transaction
+CREATE TEMPORARY TABLE IF NOT EXISTS share_price_staging
+(
+	"share_ID" integer NOT NULL,
+	valid_from timestamp(4) without time zone NOT NULL,
+	share_price double precision NOT NULL
+)
+ON COMMIT DELETE ROWS
\ No newline at end of file
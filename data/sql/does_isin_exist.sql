@@ -0,0 +1,8 @@
+SELECT EXISTS (
+	SELECT
+		1
+	FROM
+		entities.shares share
+	WHERE
+		share.isin = %s
+)
\ No newline at end of file
@@ -0,0 +1,8 @@
+SELECT
+	tab."ID",
+	tab.category_name
+
+FROM
+	param.categories tab
+ORDER BY
+	tab.category_name ASC
\ No newline at end of file
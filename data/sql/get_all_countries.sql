@@ -0,0 +1,8 @@
+SELECT
+	tab."ID",
+	tab.country_name
+
+FROM
+	param.countries tab
+ORDER BY
+	tab.country_name ASC
\ No newline at end of file
@@ -0,0 +1,8 @@
+SELECT
+	tab."ID",
+	tab.currency_name
+
+FROM
+	param.currencies tab
+ORDER BY
+	tab.currency_name ASC
\ No newline at end of file
@@ -0,0 +1,5 @@
+SELECT
+	share.isin
+
+FROM
+	entities.shares share
\ No newline at end of file
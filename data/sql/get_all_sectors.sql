@@ -0,0 +1,8 @@
+SELECT
+	tab."ID",
+	tab.sector_name
+
+FROM
+	param.sectors tab
+ORDER BY
+	tab.sector_name ASC
\ No newline at end of file
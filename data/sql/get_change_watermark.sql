@@ -0,0 +1,9 @@
+-- snapshot of the transaction as watermark of a refresh, the versions changed by transactions not visible in it
+-- are found in public.data_change_log by the next refresh. The changes since a previous watermark are complete in
+-- case no entry of a transaction the previous snapshot could not see has been pruned
+SELECT
+	txid_current_snapshot()::text AS watermark,
+	%s::txid_snapshot IS NOT NULL AND txid_snapshot_xmin(%s::txid_snapshot) > horizon.pruned_through AS is_complete
+
+FROM
+	public.data_change_log_horizon horizon
\ No newline at end of file
@@ -1,3 +0,0 @@
-SELECT column_name
-FROM information_schema.columns
-WHERE table_name = 
\ No newline at end of file
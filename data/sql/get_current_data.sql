@@ -0,0 +1,14 @@
+SELECT DISTINCT ON (tab."share_ID", tab.year)
+	%s::integer AS value_position,
+	tab."share_ID",
+	tab.year,
+	tab.{value_column}::double precision AS value
+
+FROM
+	{table} tab
+WHERE
+	tab."share_ID" = ANY(%s)
+	AND tab.year BETWEEN %s AND %s
+	AND tab.valid_to = %s
+ORDER BY
+	tab."share_ID", tab.year, tab.valid_from DESC
\ No newline at end of file
@@ -0,0 +1,14 @@
+SELECT DISTINCT ON (tab."share_ID")
+	%s::integer AS value_position,
+	tab."share_ID",
+	NULL::integer AS year,
+	tab.{value_column}::double precision AS value
+
+FROM
+	{table} tab
+WHERE
+	tab."share_ID" = ANY(%s)
+	AND tab.valid_from <= %s
+	AND tab.valid_to > %s
+ORDER BY
+	tab."share_ID", tab.valid_from DESC
\ No newline at end of file
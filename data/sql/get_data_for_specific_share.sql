@@ -0,0 +1,9 @@
+SELECT
+	tab.year,
+	tab.{value_column}
+
+FROM
+	{table} tab
+WHERE
+	tab."share_ID" = %s
+	AND tab.valid_to = %s
\ No newline at end of file
@@ -0,0 +1,7 @@
+SELECT
+	share.isin
+
+FROM
+	entities.shares share
+WHERE
+	share.isin = ANY(%s)
\ No newline at end of file
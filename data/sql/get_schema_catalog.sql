@@ -0,0 +1,12 @@
+SELECT
+	col.table_schema,
+	col.table_name,
+	col.column_name,
+	col.data_type
+
+FROM
+	information_schema.columns col
+WHERE
+	col.table_schema IN ('data', 'entities', 'param')
+ORDER BY
+	col.table_schema, col.table_name, col.ordinal_position
\ No newline at end of file
@@ -0,0 +1,10 @@
+SELECT
+	mig.name,
+	mig.checksum,
+	mig.applied_at,
+	mig.execution_time
+
+FROM
+	public.schema_migrations mig
+ORDER BY
+	mig.name
\ No newline at end of file
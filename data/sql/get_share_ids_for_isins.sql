@@ -0,0 +1,8 @@
+SELECT
+	share.isin,
+	share."ID"
+
+FROM
+	entities.shares share
+WHERE
+	share.isin = ANY(%s)
\ No newline at end of file
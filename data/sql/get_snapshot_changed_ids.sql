@@ -0,0 +1,12 @@
+-- IDs of the versions of a data table changed by transactions not visible in the watermark of the last refresh
+SELECT DISTINCT
+	changes."ID"
+
+FROM
+	public.data_change_log changes
+WHERE
+	changes.table_name = %s
+	AND changes.txid >= txid_snapshot_xmin(%s::txid_snapshot)
+	AND NOT txid_visible_in_snapshot(changes.txid, %s::txid_snapshot)
+ORDER BY
+	changes."ID"
\ No newline at end of file
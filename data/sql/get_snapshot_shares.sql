@@ -0,0 +1,18 @@
+SELECT
+	share."ID" AS "share_ID",
+	share.isin,
+	company.company_name,
+	sector.sector_name,
+	country.country_name,
+	category.category_name,
+	currency.currency_name
+
+FROM
+	entities.shares share
+	JOIN entities.companies company ON company."ID" = share."company_ID"
+	JOIN param.sectors sector ON sector."ID" = company."sector_ID"
+	JOIN param.countries country ON country."ID" = company."country_ID"
+	JOIN param.categories category ON category."ID" = share."category_ID"
+	JOIN param.currencies currency ON currency."ID" = share."currency_ID"
+ORDER BY
+	share."ID"
\ No newline at end of file
@@ -0,0 +1,15 @@
+-- versions of a data table beyond an ID, ordered by ID so all versions are fetched in batches
+-- missing values are sent as NaN, so every row of the binary COPY output has the same length
+SELECT
+	{key_columns},
+	{value_columns},
+	valid_from,
+	valid_to
+
+FROM
+	{table}
+WHERE
+	"ID" > %s
+ORDER BY
+	"ID"
+LIMIT %s
\ No newline at end of file
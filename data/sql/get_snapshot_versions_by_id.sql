@@ -0,0 +1,13 @@
+-- versions of a data table by their IDs, see get_snapshot_versions
+SELECT
+	{key_columns},
+	{value_columns},
+	valid_from,
+	valid_to
+
+FROM
+	{table}
+WHERE
+	"ID" = ANY(%s::integer[])
+ORDER BY
+	"ID"
\ No newline at end of file
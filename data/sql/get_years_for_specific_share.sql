@@ -0,0 +1,8 @@
+SELECT
+	tab.year
+
+FROM
+	{table} tab
+WHERE
+	tab."share_ID" = %s
+	AND tab.valid_to = %s
\ No newline at end of file
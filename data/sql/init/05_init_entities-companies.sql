@@ -1,16 +1,16 @@
 CREATE TABLE entities.companies
 (
 	company_name text COLLATE pg_catalog."default" NOT NULL,
-	country_ID integer NOT NULL,
+	"country_ID" integer NOT NULL,
 	"ID" SERIAL NOT NULL,
-	sector_ID integer NOT NULL,
+	"sector_ID" integer NOT NULL,
 	CONSTRAINT companies_pkey PRIMARY KEY ("ID"),
-	CONSTRAINT companies_country_fkey FOREIGN KEY (country)
+	CONSTRAINT companies_country_fkey FOREIGN KEY ("country_ID")
 		REFERENCES param.countries("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
 		NOT VALID,
-	CONSTRAINT companies_sector_fkey FOREIGN KEY (sector)
+	CONSTRAINT companies_sector_fkey FOREIGN KEY ("sector_ID")
 		REFERENCES param.sectors("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
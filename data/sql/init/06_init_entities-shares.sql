@@ -1,25 +1,25 @@
 CREATE TABLE entities.shares
 (
 	"ID" SERIAL NOT NULL,
-	company_ID integer NOT NULL,
+	"company_ID" integer NOT NULL,
 	isin text COLLATE pg_catalog."default" NOT NULL,
-	category_ID integer NOT NULL,
+	"category_ID" integer NOT NULL,
 	comment text COLLATE pg_catalog."default",
-	currency_ID integer NOT NULL,
+	"currency_ID" integer NOT NULL,
 	CONSTRAINT shares_pkey PRIMARY KEY ("ID"),
 	CONSTRAINT companies_isin_unique UNIQUE (isin),
 
-	CONSTRAINT shares_category_fkey FOREIGN KEY (category)
+	CONSTRAINT shares_category_fkey FOREIGN KEY ("category_ID")
 		REFERENCES param.categories ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
 		NOT VALID,
-	CONSTRAINT shares_company_fkey FOREIGN KEY (company)
+	CONSTRAINT shares_company_fkey FOREIGN KEY ("company_ID")
 		REFERENCES entities.companies ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION			
 		ON DELETE NO ACTION
 		NOT VALID,
-	CONSTRAINT shares_currency_fkey FOREIGN KEY (currency)
+	CONSTRAINT shares_currency_fkey FOREIGN KEY ("currency_ID")
 		REFERENCES param.currencies ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
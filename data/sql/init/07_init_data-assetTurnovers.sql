@@ -1,13 +1,13 @@
 CREATE TABLE data."assetTurnovers"
 (
 	"ID" SERIAL NOT NULL,
-	share_ID integer NOT NULL,
+	"share_ID" integer NOT NULL,
 	year integer NOT NULL,
 	asset_turnover double precision NOT NULL,
 	valid_from timestamp(4) without time zone NOT NULL,
 	valid_to timestamp(4) without time zone NOT NULL,
 	CONSTRAINT "assetTurnovers_pkey" PRIMARY KEY ("ID"),
-	CONSTRAINT "assetTurnovers_share_fkey" FOREIGN KEY (share)
+	CONSTRAINT "assetTurnovers_share_fkey" FOREIGN KEY ("share_ID")
 		REFERENCES entities.shares("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
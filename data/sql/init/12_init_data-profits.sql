@@ -2,12 +2,12 @@ CREATE TABLE data.profits
 (
 	"ID" SERIAL NOT NULL,
 	year integer NOT NULL,
-	share_ID integer NOT NULL,
+	"share_ID" integer NOT NULL,
 	profit double precision NOT NULL,
 	valid_from timestamp(4) without time zone NOT NULL,
 	valid_to timestamp(4) without time zone NOT NULL,
 	CONSTRAINT profits_pkey PRIMARY KEY ("ID"),
-	CONSTRAINT profits_share_fkey FOREIGN KEY (share)
+	CONSTRAINT profits_share_fkey FOREIGN KEY ("share_ID")
 		REFERENCES entities.shares ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
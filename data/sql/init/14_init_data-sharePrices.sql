@@ -1,12 +1,12 @@
 CREATE TABLE data."sharePrices"
 (
 	"ID" SERIAL NOT NULL,
-	share_ID integer NOT NULL,
+	"share_ID" integer NOT NULL,
 	share_price double precision NOT NULL,
 	valid_from timestamp(4) without time zone NOT NULL,
 	valid_to timestamp(4) without time zone NOT NULL,
 	CONSTRAINT "sharePrices_pkey" PRIMARY KEY ("ID"),
-	CONSTRAINT "sharePrices_share_fkey" FOREIGN KEY (share)
+	CONSTRAINT "sharePrices_share_fkey" FOREIGN KEY ("share_ID")
 		REFERENCES entities.shares ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
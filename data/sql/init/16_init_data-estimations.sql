@@ -1,14 +1,14 @@
 CREATE TABLE data.estimations
 (
 	"ID" SERIAL NOT NULL,
-	share_ID integer NOT NULL,
+	"share_ID" integer NOT NULL,
 	year integer NOT NULL,
 	profit_per_share double precision NOT NULL,
 	dividend double precision NOT NULL,
 	valid_from timestamp(4) without time zone NOT NULL,
 	valid_to timestamp(4) without time zone NOT NULL,
 	CONSTRAINT estimations_pkey PRIMARY KEY ("ID"),
-	CONSTRAINT estimations_share_fkey FOREIGN KEY (share)
+	CONSTRAINT estimations_share_fkey FOREIGN KEY ("share_ID")
 		REFERENCES entities.shares ("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
@@ -5,9 +5,9 @@ CREATE TABLE data."dividendReturns"
 	dividend_return double precision NOT NULL,
 	valid_from timestamp(4) without time zone NOT NULL,
 	valid_to timestamp(4) without time zone NOT NULL,
-	share_ID integer NOT NULL,
+	"share_ID" integer NOT NULL,
 	CONSTRAINT "dividendReturns_pkey" PRIMARY KEY ("ID"),
-	CONSTRAINT "dividendReturns_share_fkey" FOREIGN KEY (share)
+	CONSTRAINT "dividendReturns_share_fkey" FOREIGN KEY ("share_ID")
 		REFERENCES entities.shares("ID") MATCH SIMPLE
 		ON UPDATE NO ACTION
 		ON DELETE NO ACTION
@@ -0,0 +1,132 @@
+-- merge the staged share prices into the price histories, a price is valid from its date until the date of the
+-- next price of the share, the latest price is the current version
+-- a changed price of an existing date closes that version (valid_to = valid_from, like a versioned update) and is
+-- inserted as a new version, so the previous price is kept
+-- only the versions between the first and the last staged date of a share and the version preceding them are
+-- compared, so the merge does not depend on the length of the histories, closed versions (valid_to = valid_from)
+-- are never compared again
+WITH params AS (
+	SELECT
+		%s::timestamp AS open_end
+),
+bounds AS MATERIALIZED (
+	SELECT
+		stage."share_ID",
+		stage.first_valid_from,
+		stage.last_valid_from,
+		following.valid_from AS next_valid_from
+
+	FROM
+		(
+			SELECT
+				staged."share_ID",
+				min(staged.valid_from) AS first_valid_from,
+				max(staged.valid_from) AS last_valid_from
+
+			FROM
+				pg_temp.share_price_staging staged
+			GROUP BY
+				staged."share_ID"
+		) stage
+		-- first version after the staged dates, the last staged price is valid until its date
+		LEFT JOIN LATERAL (
+			SELECT
+				price.valid_from
+
+			FROM
+				data."sharePrices" price
+			WHERE
+				price."share_ID" = stage."share_ID"
+				AND price.valid_to > stage.last_valid_from
+				AND price.valid_from > stage.last_valid_from
+				AND price.valid_to > price.valid_from
+			ORDER BY
+				price.valid_to
+			LIMIT 1
+		) following ON TRUE
+),
+existing AS MATERIALIZED (
+	SELECT
+		price."ID",
+		price."share_ID",
+		price.valid_from,
+		price.valid_to,
+		price.share_price
+
+	FROM
+		bounds
+		-- the lateral subquery looks up the versions per share by the index on share_ID and valid_to
+		CROSS JOIN LATERAL (
+			SELECT
+				cur."ID",
+				cur."share_ID",
+				cur.valid_from,
+				cur.valid_to,
+				cur.share_price
+
+			FROM
+				data."sharePrices" cur
+			WHERE
+				cur."share_ID" = bounds."share_ID"
+				AND cur.valid_to > bounds.first_valid_from
+				AND cur.valid_from <= bounds.last_valid_from
+				AND cur.valid_to > cur.valid_from
+			-- keeps the subquery from being flattened into a join over all prices
+			OFFSET 0
+		) price
+),
+merged_history AS (
+	SELECT
+		ex."ID",
+		COALESCE(staged."share_ID", ex."share_ID") AS "share_ID",
+		COALESCE(staged.valid_from, ex.valid_from) AS valid_from,
+		COALESCE(staged.share_price, ex.share_price) AS share_price,
+		ex.valid_to AS old_valid_to,
+		-- the version is replaced by a new one, in case its price changed
+		ex."ID" IS NOT NULL AND staged."share_ID" IS NOT NULL AND staged.share_price <> ex.share_price AS is_replaced,
+		LEAD(COALESCE(staged.valid_from, ex.valid_from), 1, COALESCE(bounds.next_valid_from, params.open_end)) OVER (
+			PARTITION BY COALESCE(staged."share_ID", ex."share_ID")
+			ORDER BY COALESCE(staged.valid_from, ex.valid_from), ex."ID") AS valid_to
+
+	FROM
+		existing ex
+		FULL JOIN pg_temp.share_price_staging staged ON staged."share_ID" = ex."share_ID"
+			AND staged.valid_from = ex.valid_from
+		JOIN bounds ON bounds."share_ID" = COALESCE(staged."share_ID", ex."share_ID")
+		CROSS JOIN params
+),
+updated_versions AS (
+	UPDATE
+		data."sharePrices" price
+	SET
+		valid_to = CASE WHEN hist.is_replaced THEN hist.valid_from ELSE hist.valid_to END
+	FROM
+		merged_history hist
+	WHERE
+		-- the array lets the existing versions be looked up by their ID instead of scanning all prices
+		price."ID" = ANY(ARRAY(SELECT ex."ID" FROM existing ex))
+		AND price."ID" = hist."ID"
+		AND (hist.valid_to <> hist.old_valid_to OR hist.is_replaced)
+	RETURNING
+		price."ID"
+),
+new_versions AS (
+	INSERT INTO data."sharePrices" ("share_ID", share_price, valid_from, valid_to)
+	SELECT
+		hist."share_ID",
+		hist.share_price,
+		hist.valid_from,
+		hist.valid_to
+
+	FROM
+		merged_history hist
+	WHERE
+		(hist."ID" IS NULL OR hist.is_replaced)
+		-- referencing the updated versions forces the current versions to be closed before the new ones are inserted
+		AND (SELECT count(*) FROM updated_versions) >= 0
+	RETURNING
+		"ID"
+)
+SELECT
+	(SELECT count(*) FROM updated_versions),
+	(SELECT count(*) FROM new_versions)
\ No newline at end of file
@@ -0,0 +1,38 @@
+-- current versions are looked up by valid_to = '9999-12-31 23:59:59', versions as of a point in time by
+-- valid_from <= t < valid_to, both are index range scans per share and year
+
+CREATE INDEX IF NOT EXISTS "assetTurnovers_share_year_valid_to_idx"
+	ON data."assetTurnovers" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "cashflows_share_year_valid_to_idx"
+	ON data."cashflows" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "dividendReturns_share_year_valid_to_idx"
+	ON data."dividendReturns" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "dividends_share_year_valid_to_idx"
+	ON data."dividends" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "estimations_share_year_valid_to_idx"
+	ON data."estimations" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "grossMargins_share_year_valid_to_idx"
+	ON data."grossMargins" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "leverages_share_year_valid_to_idx"
+	ON data."leverages" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "liquidities_share_year_valid_to_idx"
+	ON data."liquidities" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "PERs_share_year_valid_to_idx"
+	ON data."PERs" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "profits_share_year_valid_to_idx"
+	ON data."profits" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "ROAs_share_year_valid_to_idx"
+	ON data."ROAs" USING btree ("share_ID", year, valid_to);
+
+CREATE INDEX IF NOT EXISTS "sharePrices_share_valid_to_idx"
+	ON data."sharePrices" USING btree ("share_ID", valid_to);
\ No newline at end of file
@@ -0,0 +1,50 @@
+-- a share has at most one current version per year (per share for sharePrices), so concurrent versioned updates
+-- of the same values cannot both insert a new current version
+
+CREATE UNIQUE INDEX IF NOT EXISTS "assetTurnovers_share_year_current_key"
+	ON data."assetTurnovers" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "cashflows_share_year_current_key"
+	ON data."cashflows" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "dividendReturns_share_year_current_key"
+	ON data."dividendReturns" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "dividends_share_year_current_key"
+	ON data."dividends" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "estimations_share_year_current_key"
+	ON data."estimations" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "grossMargins_share_year_current_key"
+	ON data."grossMargins" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "leverages_share_year_current_key"
+	ON data."leverages" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "liquidities_share_year_current_key"
+	ON data."liquidities" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "PERs_share_year_current_key"
+	ON data."PERs" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "profits_share_year_current_key"
+	ON data."profits" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ROAs_share_year_current_key"
+	ON data."ROAs" USING btree ("share_ID", year)
+	WHERE valid_to = '9999-12-31 23:59:59';
+
+CREATE UNIQUE INDEX IF NOT EXISTS "sharePrices_share_current_key"
+	ON data."sharePrices" USING btree ("share_ID")
+	WHERE valid_to = '9999-12-31 23:59:59';
\ No newline at end of file
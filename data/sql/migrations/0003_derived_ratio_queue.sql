@@ -0,0 +1,93 @@
+-- share-years whose derived ratios (PERs, dividendReturns) have to be recomputed, filled by triggers on the
+-- source tables and emptied by DB_Communication.refresh_derived_ratios, a year of NULL stands for all years of
+-- the share (a share price is valid for all years)
+
+CREATE TABLE IF NOT EXISTS public.derived_ratio_queue
+(
+	"share_ID" integer NOT NULL,
+	year integer,
+	queued_at timestamp(4) without time zone NOT NULL DEFAULT now()
+);
+
+GRANT INSERT, SELECT, DELETE ON TABLE public.derived_ratio_queue TO db_tool_user;
+
+-- statement level triggers see all changed rows at once (transition table), so a bulk load queues each
+-- share-year once instead of firing per row
+CREATE OR REPLACE FUNCTION public.queue_derived_ratios()
+	RETURNS trigger
+	LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_TABLE_NAME = 'sharePrices' THEN
+		INSERT INTO public.derived_ratio_queue ("share_ID", year)
+		SELECT DISTINCT changed_rows."share_ID", NULL::integer FROM changed_rows;
+	ELSE
+		INSERT INTO public.derived_ratio_queue ("share_ID", year)
+		SELECT DISTINCT changed_rows."share_ID", changed_rows.year FROM changed_rows;
+	END IF;
+
+	RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION public.queue_derived_ratios()
+	OWNER TO postgres;
+
+-- transition tables are only available for triggers on a single event
+DROP TRIGGER IF EXISTS estimations_queue_inserted ON data.estimations;
+CREATE TRIGGER estimations_queue_inserted
+	AFTER INSERT ON data.estimations
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS estimations_queue_updated ON data.estimations;
+CREATE TRIGGER estimations_queue_updated
+	AFTER UPDATE ON data.estimations
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS estimations_queue_deleted ON data.estimations;
+CREATE TRIGGER estimations_queue_deleted
+	AFTER DELETE ON data.estimations
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS dividends_queue_inserted ON data.dividends;
+CREATE TRIGGER dividends_queue_inserted
+	AFTER INSERT ON data.dividends
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS dividends_queue_updated ON data.dividends;
+CREATE TRIGGER dividends_queue_updated
+	AFTER UPDATE ON data.dividends
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS dividends_queue_deleted ON data.dividends;
+CREATE TRIGGER dividends_queue_deleted
+	AFTER DELETE ON data.dividends
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_inserted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_inserted"
+	AFTER INSERT ON data."sharePrices"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_updated" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_updated"
+	AFTER UPDATE ON data."sharePrices"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_deleted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_deleted"
+	AFTER DELETE ON data."sharePrices"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_derived_ratios();
+
+-- the ratios of the existing data are computed by the first refresh
+INSERT INTO public.derived_ratio_queue ("share_ID", year)
+SELECT share."ID", NULL FROM entities.shares share;
\ No newline at end of file
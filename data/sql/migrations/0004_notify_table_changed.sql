@@ -0,0 +1,45 @@
+-- every change of a lookup table (param.*, entities.*) notifies the connected tools, so their lookup caches
+-- (DB_Lookup_Cache) and pages drop the stale data immediately instead of waiting for the TTL
+
+CREATE OR REPLACE FUNCTION param.notify_table_changed()
+	RETURNS trigger
+	LANGUAGE plpgsql
+AS $$
+BEGIN
+	PERFORM pg_notify('sharetool_table_changed', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME);
+	RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION param.notify_table_changed()
+	OWNER TO postgres;
+
+DROP TRIGGER IF EXISTS categories_notify_changed ON param.categories;
+CREATE TRIGGER categories_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON param.categories
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
+
+DROP TRIGGER IF EXISTS countries_notify_changed ON param.countries;
+CREATE TRIGGER countries_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON param.countries
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
+
+DROP TRIGGER IF EXISTS currencies_notify_changed ON param.currencies;
+CREATE TRIGGER currencies_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON param.currencies
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
+
+DROP TRIGGER IF EXISTS sectors_notify_changed ON param.sectors;
+CREATE TRIGGER sectors_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON param.sectors
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
+
+DROP TRIGGER IF EXISTS companies_notify_changed ON entities.companies;
+CREATE TRIGGER companies_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON entities.companies
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
+
+DROP TRIGGER IF EXISTS shares_notify_changed ON entities.shares;
+CREATE TRIGGER shares_notify_changed
+	AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON entities.shares
+	FOR EACH STATEMENT EXECUTE PROCEDURE param.notify_table_changed();
\ No newline at end of file
@@ -0,0 +1,264 @@
+-- IDs of the versions of the data tables changed (inserted, updated or deleted) by every transaction, filled by
+-- triggers on the data tables. Local copies of the data (DB_Snapshot_Cache, Price_Matrix_Store) keep the snapshot
+-- of their last refresh as watermark and transfer the versions of the transactions not visible in it, so changes
+-- of existing versions and transactions committing out of ID order are never missed
+
+CREATE TABLE IF NOT EXISTS public.data_change_log
+(
+	table_name text NOT NULL,
+	"ID" integer NOT NULL,
+	txid bigint NOT NULL DEFAULT txid_current(),
+	logged_at timestamp(4) without time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS data_change_log_table_txid_idx
+	ON public.data_change_log USING btree (table_name, txid);
+
+GRANT INSERT, SELECT, DELETE ON TABLE public.data_change_log TO db_tool_user;
+
+-- the entries of the transactions up to pruned_through have been removed from the log, a watermark older than that
+-- requires a complete transfer
+CREATE TABLE IF NOT EXISTS public.data_change_log_horizon
+(
+	pruned_through bigint NOT NULL
+);
+
+INSERT INTO public.data_change_log_horizon (pruned_through)
+SELECT 0 WHERE NOT EXISTS (SELECT FROM public.data_change_log_horizon);
+
+GRANT SELECT, UPDATE ON TABLE public.data_change_log_horizon TO db_tool_user;
+
+-- statement level triggers see all changed rows at once (transition table), like the triggers of the derived ratio
+-- queue
+CREATE OR REPLACE FUNCTION public.log_data_changes()
+	RETURNS trigger
+	LANGUAGE plpgsql
+AS $$
+BEGIN
+	INSERT INTO public.data_change_log (table_name, "ID")
+	SELECT TG_TABLE_NAME, changed_rows."ID" FROM changed_rows;
+
+	RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION public.log_data_changes()
+	OWNER TO postgres;
+
+-- transition tables are only available for triggers on a single event
+
+DROP TRIGGER IF EXISTS "assetTurnovers_log_inserted" ON data."assetTurnovers";
+CREATE TRIGGER "assetTurnovers_log_inserted"
+	AFTER INSERT ON data."assetTurnovers"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "assetTurnovers_log_updated" ON data."assetTurnovers";
+CREATE TRIGGER "assetTurnovers_log_updated"
+	AFTER UPDATE ON data."assetTurnovers"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "assetTurnovers_log_deleted" ON data."assetTurnovers";
+CREATE TRIGGER "assetTurnovers_log_deleted"
+	AFTER DELETE ON data."assetTurnovers"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS cashflows_log_inserted ON data.cashflows;
+CREATE TRIGGER cashflows_log_inserted
+	AFTER INSERT ON data.cashflows
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS cashflows_log_updated ON data.cashflows;
+CREATE TRIGGER cashflows_log_updated
+	AFTER UPDATE ON data.cashflows
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS cashflows_log_deleted ON data.cashflows;
+CREATE TRIGGER cashflows_log_deleted
+	AFTER DELETE ON data.cashflows
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "dividendReturns_log_inserted" ON data."dividendReturns";
+CREATE TRIGGER "dividendReturns_log_inserted"
+	AFTER INSERT ON data."dividendReturns"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "dividendReturns_log_updated" ON data."dividendReturns";
+CREATE TRIGGER "dividendReturns_log_updated"
+	AFTER UPDATE ON data."dividendReturns"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "dividendReturns_log_deleted" ON data."dividendReturns";
+CREATE TRIGGER "dividendReturns_log_deleted"
+	AFTER DELETE ON data."dividendReturns"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS dividends_log_inserted ON data.dividends;
+CREATE TRIGGER dividends_log_inserted
+	AFTER INSERT ON data.dividends
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS dividends_log_updated ON data.dividends;
+CREATE TRIGGER dividends_log_updated
+	AFTER UPDATE ON data.dividends
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS dividends_log_deleted ON data.dividends;
+CREATE TRIGGER dividends_log_deleted
+	AFTER DELETE ON data.dividends
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS estimations_log_inserted ON data.estimations;
+CREATE TRIGGER estimations_log_inserted
+	AFTER INSERT ON data.estimations
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS estimations_log_updated ON data.estimations;
+CREATE TRIGGER estimations_log_updated
+	AFTER UPDATE ON data.estimations
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS estimations_log_deleted ON data.estimations;
+CREATE TRIGGER estimations_log_deleted
+	AFTER DELETE ON data.estimations
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "grossMargins_log_inserted" ON data."grossMargins";
+CREATE TRIGGER "grossMargins_log_inserted"
+	AFTER INSERT ON data."grossMargins"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "grossMargins_log_updated" ON data."grossMargins";
+CREATE TRIGGER "grossMargins_log_updated"
+	AFTER UPDATE ON data."grossMargins"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "grossMargins_log_deleted" ON data."grossMargins";
+CREATE TRIGGER "grossMargins_log_deleted"
+	AFTER DELETE ON data."grossMargins"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS leverages_log_inserted ON data.leverages;
+CREATE TRIGGER leverages_log_inserted
+	AFTER INSERT ON data.leverages
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS leverages_log_updated ON data.leverages;
+CREATE TRIGGER leverages_log_updated
+	AFTER UPDATE ON data.leverages
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS leverages_log_deleted ON data.leverages;
+CREATE TRIGGER leverages_log_deleted
+	AFTER DELETE ON data.leverages
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS liquidities_log_inserted ON data.liquidities;
+CREATE TRIGGER liquidities_log_inserted
+	AFTER INSERT ON data.liquidities
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS liquidities_log_updated ON data.liquidities;
+CREATE TRIGGER liquidities_log_updated
+	AFTER UPDATE ON data.liquidities
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS liquidities_log_deleted ON data.liquidities;
+CREATE TRIGGER liquidities_log_deleted
+	AFTER DELETE ON data.liquidities
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "PERs_log_inserted" ON data."PERs";
+CREATE TRIGGER "PERs_log_inserted"
+	AFTER INSERT ON data."PERs"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "PERs_log_updated" ON data."PERs";
+CREATE TRIGGER "PERs_log_updated"
+	AFTER UPDATE ON data."PERs"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "PERs_log_deleted" ON data."PERs";
+CREATE TRIGGER "PERs_log_deleted"
+	AFTER DELETE ON data."PERs"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS profits_log_inserted ON data.profits;
+CREATE TRIGGER profits_log_inserted
+	AFTER INSERT ON data.profits
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS profits_log_updated ON data.profits;
+CREATE TRIGGER profits_log_updated
+	AFTER UPDATE ON data.profits
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS profits_log_deleted ON data.profits;
+CREATE TRIGGER profits_log_deleted
+	AFTER DELETE ON data.profits
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "ROAs_log_inserted" ON data."ROAs";
+CREATE TRIGGER "ROAs_log_inserted"
+	AFTER INSERT ON data."ROAs"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "ROAs_log_updated" ON data."ROAs";
+CREATE TRIGGER "ROAs_log_updated"
+	AFTER UPDATE ON data."ROAs"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "ROAs_log_deleted" ON data."ROAs";
+CREATE TRIGGER "ROAs_log_deleted"
+	AFTER DELETE ON data."ROAs"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "sharePrices_log_inserted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_log_inserted"
+	AFTER INSERT ON data."sharePrices"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "sharePrices_log_updated" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_log_updated"
+	AFTER UPDATE ON data."sharePrices"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
+
+DROP TRIGGER IF EXISTS "sharePrices_log_deleted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_log_deleted"
+	AFTER DELETE ON data."sharePrices"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.log_data_changes();
\ No newline at end of file
@@ -0,0 +1,5 @@
+-- the historical derived ratios (PERs, dividendReturns) are computed from the share price at the end of their year
+-- instead of the latest share price, the existing ratios are recomputed by the next refresh
+
+INSERT INTO public.derived_ratio_queue ("share_ID", year)
+SELECT share."ID", NULL FROM entities.shares share;
\ No newline at end of file
@@ -0,0 +1,105 @@
+-- a share price only affects the derived ratios (PERs, dividendReturns) of the years whose end falls into its
+-- version, the current and future years use the latest price and are queued by changes of the current version
+-- only, so a new daily price does not recompute the ratios of all historical years of the share
+
+-- share-years depending on a version of a share price, see refresh_PERs.sql and refresh_dividendReturns.sql
+CREATE OR REPLACE FUNCTION public.get_share_price_ratio_years(
+	version_share_id integer,
+	version_valid_from timestamp without time zone,
+	version_valid_to timestamp without time zone)
+	RETURNS TABLE ("share_ID" integer, year integer)
+	LANGUAGE sql
+	STABLE
+AS $$
+	WITH current_year AS (
+		SELECT date_part('year', now())::integer AS year
+	)
+	-- past years use the price in effect at their end (empty versions of replaced prices contain no year end)
+	SELECT version_share_id, past_year.year
+	FROM
+		current_year,
+		generate_series(date_part('year', version_valid_from)::integer,
+						LEAST(date_part('year', version_valid_to)::integer, current_year.year - 1)) AS past_year(year)
+	WHERE
+		make_timestamp(past_year.year, 12, 31, 23, 59, 59) >= version_valid_from
+		AND make_timestamp(past_year.year, 12, 31, 23, 59, 59) < version_valid_to
+	UNION
+	SELECT version_share_id, current_year.year
+	FROM current_year
+	WHERE version_valid_to = '9999-12-31 23:59:59'
+	UNION
+	SELECT est."share_ID", est.year
+	FROM current_year JOIN data.estimations est ON est.year > current_year.year
+	WHERE version_valid_to = '9999-12-31 23:59:59' AND est."share_ID" = version_share_id
+		AND est.valid_to = '9999-12-31 23:59:59'
+	UNION
+	SELECT div."share_ID", div.year
+	FROM current_year JOIN data.dividends div ON div.year > current_year.year
+	WHERE version_valid_to = '9999-12-31 23:59:59' AND div."share_ID" = version_share_id
+		AND div.valid_to = '9999-12-31 23:59:59'
+$$;
+
+ALTER FUNCTION public.get_share_price_ratio_years(integer, timestamp without time zone, timestamp without time zone)
+	OWNER TO postgres;
+
+-- an update can move a version away from a year end, so the old and the new versions are queued
+CREATE OR REPLACE FUNCTION public.queue_share_price_ratios()
+	RETURNS trigger
+	LANGUAGE plpgsql
+AS $$
+BEGIN
+	IF TG_OP = 'UPDATE' THEN
+		INSERT INTO public.derived_ratio_queue ("share_ID", year)
+		SELECT DISTINCT ratio_year."share_ID", ratio_year.year
+		FROM
+			(SELECT "share_ID", valid_from, valid_to FROM changed_rows
+			 UNION
+			 SELECT "share_ID", valid_from, valid_to FROM old_rows) AS version,
+			LATERAL public.get_share_price_ratio_years(version."share_ID", version.valid_from,
+													   version.valid_to) AS ratio_year;
+	ELSE
+		INSERT INTO public.derived_ratio_queue ("share_ID", year)
+		SELECT DISTINCT ratio_year."share_ID", ratio_year.year
+		FROM
+			(SELECT DISTINCT "share_ID", valid_from, valid_to FROM changed_rows) AS version,
+			LATERAL public.get_share_price_ratio_years(version."share_ID", version.valid_from,
+													   version.valid_to) AS ratio_year;
+	END IF;
+
+	RETURN NULL;
+END;
+$$;
+
+ALTER FUNCTION public.queue_share_price_ratios()
+	OWNER TO postgres;
+
+-- the estimations and dividends queue the changed share-years as before
+CREATE OR REPLACE FUNCTION public.queue_derived_ratios()
+	RETURNS trigger
+	LANGUAGE plpgsql
+AS $$
+BEGIN
+	INSERT INTO public.derived_ratio_queue ("share_ID", year)
+	SELECT DISTINCT changed_rows."share_ID", changed_rows.year FROM changed_rows;
+
+	RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_inserted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_inserted"
+	AFTER INSERT ON data."sharePrices"
+	REFERENCING NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_share_price_ratios();
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_updated" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_updated"
+	AFTER UPDATE ON data."sharePrices"
+	REFERENCING OLD TABLE AS old_rows NEW TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_share_price_ratios();
+
+DROP TRIGGER IF EXISTS "sharePrices_queue_deleted" ON data."sharePrices";
+CREATE TRIGGER "sharePrices_queue_deleted"
+	AFTER DELETE ON data."sharePrices"
+	REFERENCING OLD TABLE AS changed_rows
+	FOR EACH STATEMENT EXECUTE PROCEDURE public.queue_share_price_ratios();
\ No newline at end of file
@@ -0,0 +1,18 @@
+-- remove the entries older than the retention period, the horizon tells the refreshes whose watermark is older
+-- that they have to transfer the tables completely
+WITH pruned AS (
+	DELETE FROM
+		public.data_change_log
+	WHERE
+		logged_at < now() - %s::interval
+	RETURNING
+		txid
+)
+UPDATE
+	public.data_change_log_horizon
+SET
+	pruned_through = GREATEST(pruned_through, (SELECT max(pruned.txid) FROM pruned))
+WHERE
+	EXISTS (SELECT FROM pruned)
+RETURNING
+	(SELECT count(*) FROM pruned)
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- a year of NULL stands for all years of the share
+INSERT INTO public.derived_ratio_queue ("share_ID", year)
+SELECT
+	share."ID",
+	NULL
+
+FROM
+	entities.shares share
\ No newline at end of file
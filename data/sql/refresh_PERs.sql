@@ -0,0 +1,111 @@
+-- PE ratio of a share and year: share price at the end of the year divided by the estimated profit per share of
+-- the year, the current and future years use the latest share price
+-- (shares have no number of shares, so the absolute profits cannot be used)
+-- only the given share-years are recomputed, a year of NULL stands for all years of the share
+WITH params AS (
+	SELECT
+		%s::integer[] AS share_ids,
+		%s::integer[] AS years,
+		%s::timestamp AS valid_from,
+		%s::timestamp AS open_end
+),
+current_year AS (
+	SELECT date_part('year', params.valid_from)::integer AS year FROM params
+),
+queued AS (
+	SELECT DISTINCT
+		queue."share_ID",
+		queue.year
+
+	FROM
+		params,
+		unnest(params.share_ids, params.years) AS queue("share_ID", year)
+),
+affected AS (
+	SELECT queued."share_ID", queued.year FROM queued WHERE queued.year IS NOT NULL
+	UNION
+	SELECT est."share_ID", est.year
+	FROM queued JOIN data.estimations est ON est."share_ID" = queued."share_ID", params
+	WHERE queued.year IS NULL AND est.valid_to = params.open_end
+	UNION
+	SELECT per."share_ID", per.year
+	FROM queued JOIN data."PERs" per ON per."share_ID" = queued."share_ID", params
+	WHERE queued.year IS NULL AND per.valid_to = params.open_end
+),
+changed_values AS (
+	SELECT
+		aff."share_ID",
+		aff.year,
+		cur."ID" AS current_id,
+		calc."PE_ratio"
+
+	FROM
+		affected aff
+		CROSS JOIN params
+		LEFT JOIN data."PERs" cur
+			ON cur."share_ID" = aff."share_ID" AND cur.year = aff.year AND cur.valid_to = params.open_end
+		LEFT JOIN data.estimations est
+			ON est."share_ID" = aff."share_ID" AND est.year = aff.year AND est.valid_to = params.open_end
+		CROSS JOIN current_year
+		-- the price in effect at the end of the year is the first version ending after it, in case this version
+		-- starts before the end of the year (replaced prices are kept as empty versions, they are never in effect)
+		LEFT JOIN LATERAL (
+			SELECT latest.share_price
+			FROM data."sharePrices" latest
+			WHERE aff.year >= current_year.year AND latest."share_ID" = aff."share_ID"
+				AND latest.valid_to = params.open_end
+			UNION ALL
+			SELECT year_end.share_price
+			FROM (
+				SELECT following.share_price, following.valid_from
+				FROM data."sharePrices" following
+				WHERE aff.year < current_year.year AND following."share_ID" = aff."share_ID"
+					AND following.valid_to > make_timestamp(aff.year, 12, 31, 23, 59, 59)
+					AND following.valid_to > following.valid_from
+				ORDER BY following.valid_to
+				LIMIT 1
+			) year_end
+			WHERE year_end.valid_from <= make_timestamp(aff.year, 12, 31, 23, 59, 59)
+		) price ON TRUE
+		-- a loss has no meaningful PE ratio
+		CROSS JOIN LATERAL (SELECT CASE WHEN est.profit_per_share > 0 AND price.share_price > 0
+										THEN price.share_price / est.profit_per_share END AS "PE_ratio") calc
+	WHERE
+		-- unchanged values keep their version, values which cannot be computed anymore are closed
+		cur."PE_ratio" IS DISTINCT FROM calc."PE_ratio"
+),
+closed_versions AS (
+	UPDATE
+		data."PERs" tab
+	SET
+		valid_to = params.valid_from
+	FROM
+		changed_values val,
+		params
+	WHERE
+		tab."ID" = val.current_id
+	RETURNING
+		tab."ID"
+),
+new_versions AS (
+	INSERT INTO data."PERs" ("share_ID", year, "PE_ratio", valid_from, valid_to)
+	SELECT
+		val."share_ID",
+		val.year,
+		val."PE_ratio",
+		params.valid_from,
+		params.open_end
+
+	FROM
+		changed_values val,
+		params
+	WHERE
+		-- referencing the closed versions forces them to be closed before the new versions are inserted
+		(SELECT count(*) FROM closed_versions) >= 0
+		AND val."PE_ratio" IS NOT NULL
+	RETURNING
+		"ID"
+)
+SELECT
+	(SELECT count(*) FROM closed_versions),
+	(SELECT count(*) FROM new_versions)
\ No newline at end of file
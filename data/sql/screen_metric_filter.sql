@@ -0,0 +1,25 @@
+-- condition on the latest years of each share (up to a reference year), they have to be consecutive and all
+-- of them have to fulfil it, the current versions are read in the order of the index ("share_ID", year)
+SELECT
+	ranked."share_ID",
+	(array_agg(ranked.value ORDER BY ranked.year DESC))[1] AS value,
+	count(*) = %s AND max(ranked.year) - min(ranked.year) = %s - 1 AND bool_and(ranked.value {operator} %s)
+		AS is_fulfilled
+
+FROM (
+	SELECT
+		tab."share_ID",
+		tab.year,
+		tab.{value_column} AS value,
+		row_number() OVER (PARTITION BY tab."share_ID" ORDER BY tab.year DESC) AS position
+
+	FROM
+		{table} tab
+	WHERE
+		tab.valid_to = %s
+		AND tab.year <= %s
+) ranked
+WHERE
+	ranked.position <= %s
+GROUP BY
+	ranked."share_ID"
\ No newline at end of file
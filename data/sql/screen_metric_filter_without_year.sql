@@ -0,0 +1,9 @@
+SELECT
+	tab."share_ID",
+	tab.{value_column} AS value,
+	tab.{value_column} {operator} %s AS is_fulfilled
+
+FROM
+	{table} tab
+WHERE
+	tab.valid_to = %s
\ No newline at end of file
@@ -0,0 +1,20 @@
+{filter_ctes}SELECT
+	share."ID" AS "share_ID",
+	share.isin,
+	company.company_name,
+	sector.sector_name,
+	country.country_name,
+	category.category_name,
+	currency.currency_name{filter_columns}
+
+FROM
+	entities.shares share
+	JOIN entities.companies company ON company."ID" = share."company_ID"
+	JOIN param.sectors sector ON sector."ID" = company."sector_ID"
+	JOIN param.countries country ON country."ID" = company."country_ID"
+	JOIN param.categories category ON category."ID" = share."category_ID"
+	JOIN param.currencies currency ON currency."ID" = share."currency_ID"{filter_joins}
+WHERE
+	TRUE{filter_conditions}
+ORDER BY
+	company.company_name, share.isin
\ No newline at end of file
@@ -0,0 +1,40 @@
+WITH new_values AS (
+	SELECT
+		val."share_ID",
+		{value_columns}
+
+	FROM
+		json_populate_recordset(NULL::{table}, %s::json) val
+),
+closed_versions AS (
+	UPDATE
+		{table} tab
+	SET
+		valid_to = %s
+	FROM
+		new_values val
+	WHERE
+		tab."share_ID" = val."share_ID"
+		AND tab.valid_to = %s
+	RETURNING
+		tab."ID"
+),
+new_versions AS (
+	INSERT INTO {table} ("share_ID", {value_columns}, valid_from, valid_to)
+	SELECT
+		val."share_ID",
+		{value_columns},
+		%s,
+		%s
+
+	FROM
+		new_values val
+	WHERE
+		-- referencing the closed versions forces them to be closed before the new versions are inserted
+		(SELECT count(*) FROM closed_versions) >= 0
+	RETURNING
+		"ID"
+)
+SELECT
+	(SELECT count(*) FROM closed_versions),
+	(SELECT count(*) FROM new_versions)
\ No newline at end of file
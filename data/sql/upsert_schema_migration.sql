@@ -0,0 +1,6 @@
+INSERT INTO public.schema_migrations (name, checksum, applied_at, execution_time)
+VALUES (%s, %s, now(), %s)
+ON CONFLICT (name) DO UPDATE SET
+	checksum = EXCLUDED.checksum,
+	applied_at = EXCLUDED.applied_at,
+	execution_time = EXCLUDED.execution_time
\ No newline at end of file
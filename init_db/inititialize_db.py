@@ -1,68 +1,356 @@
-import DB_Communication
-import psycopg2
-from os import listdir
+import argparse
 import csv
-import pandas as pd
+import heapq
+import re
+import sys
+import time
+from os import listdir
+import psycopg2
+from psycopg2 import sql
+import DB_Communication
+import DB_Migrations
 
 """
     This python script initializes the db in the required structure.
-    Has to be executed only once.
+    The structure is created only once per database (e.g. a fresh test database), afterwards the migrations
+    of ./data/sql/migrations/ are applied (see DB_Migrations), so the script can be run again at any time.
+
+    The init files are ordered by the objects they create and reference (schemas, tables, functions), so a
+    file always runs after the files it depends on. All DDL and the import of the param tables from the csv
+    files run in one transaction: either the database is initialized completely or it is left untouched.
+    The csv files are bulk-loaded with COPY instead of one INSERT per row.
+
+    e.g. python init_db/inititialize_db.py --db-name sharetool_test
 """
 
-#initialize the connection to the specified data base (empty so far)
-connection_db = DB_Communication.connect_to_db()
+# directory of the sql files creating the structure of the database
+INIT_SQL_DIRECTORY = './data/sql/init/'
 
-cursor_db = connection_db.cursor()
+# directory of the csv files containing the values of the param tables (file name = table name)
+CSV_DIRECTORY = './data/'
 
-# create a list of all sql files required for the initialization
-list_sql_files = listdir('./data/sql/init/')
+# delimiter of the csv files
+CSV_DELIMITER = ';'
 
-# execute each sql file
-for each_file in list_sql_files:
+# name of an object, optionally qualified by its schema, each part optionally quoted
+_OBJECT_NAME = r'((?:"[^"]+"|\w+)(?:\s*\.\s*(?:"[^"]+"|\w+))?)'
 
-    try:
-        curr_sql_file = open('./data/sql/init/' + each_file, 'r')
-        cursor_db.execute(curr_sql_file.read())
-        curr_sql_file.close()
-        connection_db.commit()
-        print(each_file[8:-4] + ' created successfully in database ' + DB_Communication.get_db_name() + '.')
-
-    except (Exception, psycopg2.Error) as error:
-        print("Error while creating " + each_file[8:-4], error, sep="\n")
-     
-    
-"""
-Insert the values for the param tables from the corresponding csv files
-"""
-list_filenames = listdir('./data/')
-list_filenames_csv = [filename for filename in list_filenames if filename.endswith('csv')]
+# patterns of objects created by an init file
+_CREATED_OBJECT_PATTERNS = [
+    re.compile(r'\bCREATE\s+SCHEMA\s+(?:IF\s+NOT\s+EXISTS\s+)?' + _OBJECT_NAME, re.IGNORECASE),
+    re.compile(r'\bCREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?' + _OBJECT_NAME, re.IGNORECASE),
+    re.compile(r'\bCREATE\s+(?:OR\s+REPLACE\s+)?FUNCTION\s+' + _OBJECT_NAME, re.IGNORECASE)
+]
+
+# patterns of objects an init file depends on, besides the schemas of the objects it creates
+_REFERENCED_OBJECT_PATTERNS = [
+    re.compile(r'\bREFERENCES\s+' + _OBJECT_NAME, re.IGNORECASE),
+    re.compile(r'\bEXECUTE\s+(?:PROCEDURE|FUNCTION)\s+' + _OBJECT_NAME, re.IGNORECASE),
+    re.compile(r'\bON\s+(?:TABLE\s+)?' + _OBJECT_NAME, re.IGNORECASE)
+]
+
+
+def normalize_object_name(object_name):
+    """
+    Bring the name of an object into a comparable form: unquoted identifiers are case-insensitive, quoted are not
+    :param object_name: name as written in the sql file, e.g. data."PERs"
+    :return: tuple of the name parts, e.g. ('data', 'PERs')
+    """
+
+    return tuple(each_part[1:-1] if each_part.startswith('"') else each_part.lower()
+                 for each_part in re.split(r'\s*\.\s*', object_name.strip()))
+
+
+def parse_sql_dependencies(sql_text):
+    """
+    Find the objects an init file creates and the objects it requires
+    :param sql_text: content of the sql file
+    :return: tuple (set of created objects, set of required objects), objects as returned by normalize_object_name
+    """
+
+    # comments and function bodies can mention anything, they do not create dependencies
+    sql_text = re.sub(r'--[^\n]*', '', sql_text)
+    sql_text = re.sub(r'\$(\w*)\$.*?\$\1\$', '', sql_text, flags=re.DOTALL)
+
+    set_created = set()
+    set_required = set()
+
+    for each_pattern in _CREATED_OBJECT_PATTERNS:
+        for each_match in each_pattern.finditer(sql_text):
+            object_name = normalize_object_name(each_match.group(1))
+            set_created.add(object_name)
+
+            # the schema of a qualified object has to exist before
+            if len(object_name) == 2:
+                set_required.add(object_name[:1])
+
+    for each_pattern in _REFERENCED_OBJECT_PATTERNS:
+        for each_match in each_pattern.finditer(sql_text):
+            object_name = normalize_object_name(each_match.group(1))
+
+            # unqualified names after ON are keywords (e.g. ON UPDATE NO ACTION) or objects of the search path
+            if len(object_name) == 2:
+                set_required.add(object_name)
+                set_required.add(object_name[:1])
+
+    return set_created, set_required - set_created
+
+
+def order_sql_files(dict_sql_texts):
+    """
+    Order the init files topologically, so each file runs after the files creating the objects it requires
+    Files without a dependency between them keep the order of their names
+    :param dict_sql_texts: dictionary file name -> content of the file
+    :return: list of file names in execution order
+    """
+
+    dict_creators = {}
+    dict_requirements = {}
+
+    for each_file, sql_text in dict_sql_texts.items():
+        set_created, set_required = parse_sql_dependencies(sql_text)
+        dict_requirements[each_file] = set_required
+
+        for each_object in set_created:
+            dict_creators.setdefault(each_object, set()).add(each_file)
+
+    # objects not created by any of the files (e.g. pg_catalog) are expected to exist already
+    dict_dependencies = {each_file: {each_creator for each_object in set_required
+                                     for each_creator in dict_creators.get(each_object, ())
+                                     if each_creator != each_file}
+                         for each_file, set_required in dict_requirements.items()}
+
+    dict_dependents = {each_file: [] for each_file in dict_sql_texts}
+    for each_file, set_dependencies in dict_dependencies.items():
+        for each_dependency in set_dependencies:
+            dict_dependents[each_dependency].append(each_file)
+
+    dict_number_of_dependencies = {each_file: len(set_dependencies)
+                                   for each_file, set_dependencies in dict_dependencies.items()}
+
+    # Kahn's algorithm, the heap picks the smallest file name among all files ready to run
+    list_ready = [each_file for each_file, number in dict_number_of_dependencies.items() if number == 0]
+    heapq.heapify(list_ready)
+
+    list_ordered_files = []
+
+    while list_ready:
+        each_file = heapq.heappop(list_ready)
+        list_ordered_files.append(each_file)
+
+        for each_dependent in dict_dependents[each_file]:
+            dict_number_of_dependencies[each_dependent] -= 1
+
+            if dict_number_of_dependencies[each_dependent] == 0:
+                heapq.heappush(list_ready, each_dependent)
+
+    if len(list_ordered_files) < len(dict_sql_texts):
+        raise ValueError("Cyclic dependencies between the init files " +
+                         ", ".join(sorted(set(dict_sql_texts) - set(list_ordered_files))))
+
+    return list_ordered_files
+
+
+def read_sql_files(directory=INIT_SQL_DIRECTORY):
+    """
+    :param directory: directory containing the init files
+    :return: dictionary file name -> content of the file
+    """
+
+    dict_sql_texts = {}
+
+    for each_file in sorted(listdir(directory)):
+        if each_file.endswith('.sql'):
+            with open(directory + each_file, 'r', encoding='utf-8') as sql_file:
+                dict_sql_texts[each_file] = sql_file.read()
+
+    return dict_sql_texts
 
-for each_csv_file in list_filenames_csv:
+
+def copy_csv_into_table(sql_cursor, csv_path, table_name):
+    """
+    Bulk-load a csv file with header into a table, the columns of the file are mapped by position
+    :param sql_cursor: psycopg2 cursor
+    :param csv_path: path of the csv file
+    :param table_name: name of the table receiving the values
+    :return: number of loaded rows
+    """
+
+    column_names = DB_Communication.get_column_names_from_db_table(sql_cursor, table_name)
+
+    # utf-8-sig drops the byte order mark in front of the header
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as csv_file:
+
+        header = next(csv.reader(csv_file, delimiter=CSV_DELIMITER))
+
+        if len(header) != len(column_names):
+            raise ValueError(csv_path + " has " + str(len(header)) + " columns, table " + table_name + " has " +
+                             str(len(column_names)))
+
+        copy_statement = sql.SQL("COPY {}.{} ({}) FROM STDIN WITH (FORMAT csv, DELIMITER {})").format(
+            sql.Identifier(DB_Communication.table_schema_relation[table_name]),
+            sql.Identifier(table_name),
+            sql.SQL(", ").join(sql.Identifier(each_column) for each_column in column_names),
+            sql.Literal(CSV_DELIMITER))
+
+        # the header has already been consumed, COPY streams the remaining lines
+        sql_cursor.copy_expert(copy_statement, csv_file)
+
+    return sql_cursor.rowcount
+
+
+def reset_serial_sequence(sql_cursor, table_name):
+    """
+    Move the sequence of a serial ID column behind the loaded IDs, otherwise the next insert would reuse an ID
+    :param sql_cursor: psycopg2 cursor
+    :param table_name: name of the table
+    :return: None
+    """
+
+    qualified_table_name = sql.SQL("{}.{}").format(sql.Identifier(DB_Communication.table_schema_relation[table_name]),
+                                                   sql.Identifier(table_name))
+
+    sql_cursor.execute(sql.SQL("SELECT pg_get_serial_sequence(%s, 'ID')"),
+                       (qualified_table_name.as_string(sql_cursor),))
+    sequence_name = sql_cursor.fetchone()[0]
+
+    if sequence_name is not None:
+        sql_cursor.execute(sql.SQL('SELECT setval(%s, COALESCE(MAX("ID"), 0) + 1, false) FROM {}').format(
+            qualified_table_name), (sequence_name,))
+
+
+def initialize_db(connection_db, sql_directory=INIT_SQL_DIRECTORY, csv_directory=CSV_DIRECTORY):
+    """
+    Create the structure of the database and load the param tables in one transaction
+    :param connection_db: psycopg2 connection to the (empty) database
+    :param sql_directory: directory containing the init files
+    :param csv_directory: directory containing the csv files of the param tables
+    :return: list of tuples (step, seconds) with the duration of each step
+    """
+
+    list_timings = []
+
+    def run_step(step, function, *args):
+        start_time = time.perf_counter()
+        result = function(*args)
+        list_timings.append((step, time.perf_counter() - start_time))
+        print("{:<45} {:>9.1f} ms".format(step, list_timings[-1][1] * 1000))
+        return result
+
+    cursor_db = connection_db.cursor()
 
     try:
-        # open each csv file and encode it accordingly (due to umlauts
-        with open('./data/' + each_csv_file, 'r', encoding='utf-8') as f:
-            csv_reader = csv.reader(f, delimiter=';')
+        dict_sql_texts = run_step("parse init files", read_sql_files, sql_directory)
+        list_ordered_files = run_step("order init files", order_sql_files, dict_sql_texts)
+
+        for each_file in list_ordered_files:
+            run_step("create " + each_file[8:-4], cursor_db.execute, dict_sql_texts[each_file])
+
+        # the tables have just been created, so the cached column metadata has to be reloaded
+        run_step("reload schema metadata", DB_Communication.reload_schema_metadata, cursor_db)
+
+        # the csv files are named after their tables, other files are ignored
+        list_tables_csv = [filename[:-4] for filename in sorted(listdir(csv_directory))
+                           if filename.endswith('.csv') and filename[:-4] in DB_Communication.table_schema_relation]
+
+        for each_table in list_tables_csv:
+            number_of_rows = run_step("copy " + each_table, copy_csv_into_table, cursor_db,
+                                      csv_directory + each_table + '.csv', each_table)
+            run_step("reset sequence " + each_table + " (" + str(number_of_rows) + " rows)", reset_serial_sequence,
+                     cursor_db, each_table)
+
+        run_step("commit", connection_db.commit)
+
+    except BaseException:
+        # nothing of a failed initialization is kept, so it can simply be repeated
+        connection_db.rollback()
+
+        # the catalog might contain tables which do not exist anymore
+        DB_Communication.get_schema_catalog(connection_db).invalidate()
+        raise
+
+    finally:
+        cursor_db.close()
+
+    return list_timings
+
+
+def parse_arguments(list_arguments=None):
+    """
+    Parse the arguments of the command line
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(description="Initialize the structure and the param tables of the database.")
+
+    parser.add_argument("--db-name", default=None, help="name of the database, defaults to the config file")
+    parser.add_argument("--host", default=None, help="host of the database, defaults to the config file")
+    parser.add_argument("--user", default=None, help="user of the database, defaults to the config file")
+    parser.add_argument("--password", default=None, help="password of the user, defaults to the config file")
+
+    return parser.parse_args(list_arguments)
+
+
+def main(list_arguments=None):
+    """
+    Entry point of the script
+    :param list_arguments: list of arguments, defaults to sys.argv
+    :return: exit code, 0 in case of success, 2 in case of an error
+    """
+
+    arguments = parse_arguments(list_arguments)
+
+    # one connection is sufficient for the script
+    db_pool = DB_Communication.create_connection_pool(arguments.db_name, arguments.host, arguments.user,
+                                                      arguments.password, min_size=1, max_size=1)
+
+    if db_pool is None:
+        print("Error while connecting to the database", file=sys.stderr)
+        return 2
+
+    db_name = arguments.db_name if arguments.db_name is not None else DB_Communication.get_db_name()
+
+    with db_pool, db_pool.connection() as connection_db:
+
+        # the pool has loaded the structure of the database already, an initialized database has tables
+        if DB_Communication.get_schema_catalog(connection_db).get_table_schemas():
+            print("Database " + db_name + " is already initialized.")
+
+        else:
+            try:
+                list_timings = initialize_db(connection_db)
+
+            except (OSError, ValueError, KeyError, psycopg2.Error) as error:
+                print("Error while initializing database " + db_name + ", nothing has been created", error,
+                      sep="\n", file=sys.stderr)
+                return 2
+
+            print("Database " + db_name + " initialized successfully in " +
+                  "{:.1f} ms".format(sum(seconds for step, seconds in list_timings) * 1000) + ".")
+
+        try:
+            DB_Migrations.apply_migrations(connection_db)
 
-            # skip header
-            next(csv_reader)
+        except (OSError, psycopg2.Error) as error:
+            print("Error while migrating database " + db_name, error, sep="\n", file=sys.stderr)
+            return 2
 
-            # craete data frame representation of each file
-            df = pd.read_csv('./data/' + each_csv_file, sep=';')
-            df.columns = DB_Communication.get_column_names_from_db_table(cursor_db, each_csv_file[:-4])
+        # the ratios of loaded or migrated data are queued, but not computed yet
+        try:
+            dict_results = DB_Communication.refresh_derived_ratios(connection_db)
 
-            for each_row in csv_reader:
+        except psycopg2.Error as error:
+            print("Error while computing the derived ratios of database " + db_name, error, sep="\n",
+                  file=sys.stderr)
+            return 2
 
-                # insert each row into the db
-                cursor_db.execute(
-                    DB_Communication.create_insert_into_statement_for_df(df, each_csv_file[:-4]),
-                    each_row
-                )
+        for table_name, (number_of_closed_versions, number_of_new_versions) in dict_results.items():
+            print(table_name + ": " + str(number_of_new_versions) + " new versions, " +
+                  str(number_of_closed_versions) + " closed versions")
 
-             #commit the sql statements
-            connection_db.commit()
+    return 0
 
-        print('Data from ' + each_csv_file + ' inserted successfully in table ' + each_csv_file[:-4] + '.')
 
-    except (Exception, psycopg2.Error) as error:
-        print("Error while inserting values of " + each_csv_file, error, sep="\n")
+if __name__ == "__main__":
+    sys.exit(main())